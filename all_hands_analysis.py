@@ -1,7 +1,24 @@
-from functools import partial
-from itertools import combinations, product
+import argparse
+import bz2
+from collections import Counter, deque
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+from itertools import combinations, islice, permutations, product
 import json
-from vp_analyzer import HandAnalyzer
+import lzma
+from math import factorial
+import os
+import numpy as np
+from batch_analyzer import HOLDS, best_holds
+from vp_analyzer import (DEFAULT_PAYOUTS, DeucesWildValue, DiscardValue, HandAnalyzer,
+                         JOKER, JokerPokerValue, PAYTABLES, RANKS, SUITS,
+                         WILD_PAYTABLES, card_id, is_joker_poker)
+import strategy_table
+import subset_analyzer
+import sys
 import time
 import multiprocessing
 
@@ -10,14 +27,32 @@ Script to generate a series of files that together contain all ~2.6M five-card
 poker hands and the optimal discard for a given video poker payout table, along
 with the expected value of that play.
 
-Written to be run in parallel across multiple cores via multiprocessing.
+Written to be run in parallel across multiple cores via multiprocessing, and
+across machines by splitting the hands into shards (see save_shard), e.g.:
+
+    python all_hands_analysis.py run out/job_ --canonical --shard 0/4
+    ...
+    python all_hands_analysis.py run out/job_ --canonical --shard 3/4
+    python all_hands_analysis.py merge out/job_ job.vpst
 """
 
-def all_hands_gen():
+#number of suit isomorphism classes (see canonical_hands_gen) of the 52 card
+#hands, and of the 53 card Joker Poker hands
+NUM_CLASSES = 134459
+NUM_JOKER_CLASSES = 150891
+#chunks canonicalized and sent to the pool ahead of the one being written, see
+#_run_canonical
+CANONICAL_LOOKAHEAD = 2
+
+def all_hands_gen(joker = False):
     ranks = 'A23456789TJQK'
     suits = 'cdhs'
 
-    deck = product(ranks, suits)
+    deck = list(product(ranks, suits))
+    if joker:
+        #Joker Poker, the joker is the last card of the 53 card deck, so there
+        #are 2,869,685 hands
+        deck.append(tuple(JOKER))
     return combinations(deck, 5)
 
 def hand2str(hand_tup):
@@ -26,6 +61,145 @@ def hand2str(hand_tup):
         hstr += r + s
     return hstr
 
+def canonicalize(handstr):
+    """
+    Relabel the suits of a hand so that every hand that differs from it only by
+    a permutation of suits maps to the same canonical hand. Suits are ordered by
+    the number of cards held in them (then by their ranks) and renamed c, d, h, s
+    in that order. The canonical hand's cards are sorted in the order of
+    all_hands_gen(), so the canonical hand is itself one of those hands. A
+    joker has no suit, it stays the last card.
+
+    INPUT:
+    handstr: (str) 10-char string of a poker hand, e.g. 'Qd9c8d5c2c'
+
+    OUTPUT: (tuple) canonical hand string and a dict mapping each suit char of
+        handstr to its suit char in the canonical hand, e.g.:
+        ('2c5c8d9cQd', {'c': 'c', 'd': 'd', 'h': 'h', 's': 's'})
+    """
+    suit_ranks = _suit_ranks(handstr)
+    order = sorted(SUITS, key=lambda s: (-len(suit_ranks[s]), suit_ranks[s]))
+    suit_map = {s: SUITS[ind] for ind, s in enumerate(order)}
+
+    naturals, joker = _split_joker(handstr)
+    cards = sorted([(RANKS.index(r), SUITS.index(suit_map[s])) for r, s in naturals])
+    canon = ''.join([RANKS[r] + SUITS[s] for r, s in cards]) + joker
+    return canon, suit_map
+
+
+def class_multiplicity(handstr):
+    """
+    Number of distinct hands (including handstr) that are suit permutations
+    of handstr, i.e. the number of hands sharing its canonical form.
+    """
+    same_ranks = Counter([tuple(ranks) for ranks in _suit_ranks(handstr).values()])
+    denom = 1
+    for cnt in same_ranks.values():
+        denom *= factorial(cnt)
+    return factorial(len(SUITS)) // denom
+
+
+def _suit_ranks(handstr):
+    """Helper to collect the (sorted) rank indices held in each suit."""
+    suit_ranks = {s: [] for s in SUITS}
+    for r, s in _split_joker(handstr)[0]:
+        suit_ranks[s].append(RANKS.index(r))
+    for ranks in suit_ranks.values():
+        ranks.sort()
+    return suit_ranks
+
+
+def _split_joker(handstr):
+    """
+    Helper, list of the (rank char, suit char) tuples of the natural cards of a
+    hand string, and JOKER if the hand has the joker, else ''.
+    """
+    naturals, joker = [], ''
+    for ind in range(0, 10, 2):
+        card = handstr[ind].upper() + handstr[ind+1].lower()
+        if card == JOKER:
+            joker = JOKER
+        else:
+            naturals.append((card[0], card[1]))
+    return naturals, joker
+
+
+def canonical_hands_gen(joker = False):
+    """
+    Yield a (hand string, multiplicity) tuple for each of the 134,459 suit
+    isomorphism classes of five-card hands. The multiplicities sum to the
+    2,598,960 hands of all_hands_gen().
+
+    With joker, the classes of the 2,869,685 Joker Poker hands (see
+    all_hands_gen) instead, the 134,459 above plus those with the joker.
+    """
+    for hand_tup in all_hands_gen(joker = joker):
+        suits = [s for _, s in hand_tup if s in SUITS]
+        #cheap filter, a canonical hand has suit counts in the order c>=d>=h>=s
+        suit_cnts = [suits.count(s) for s in SUITS]
+        if suit_cnts != sorted(suit_cnts, reverse=True):
+            continue
+        hstr = hand2str(hand_tup)
+        if canonicalize(hstr)[0] == hstr:
+            yield hstr, class_multiplicity(hstr)
+
+
+def class_members(handstr):
+    """
+    Yield a (hand string, suit map) tuple for each distinct hand (cards in deck
+    order) that is a suit permutation of handstr, handstr included. The suit
+    map takes the member's suits to handstr's suits, as needed by remap_hold.
+    """
+    naturals, joker = _split_joker(handstr)
+    cards = [(RANKS.index(r), s) for r, s in naturals]
+    seen = set()
+    for perm in permutations(SUITS):
+        to_member = dict(zip(SUITS, perm))
+        member_cards = sorted([(r, SUITS.index(to_member[s])) for r, s in cards])
+        member = ''.join([RANKS[r] + SUITS[s] for r, s in member_cards]) + joker
+        if member not in seen:
+            seen.add(member)
+            yield member, {ms: s for s, ms in to_member.items()}
+
+
+def remap_hold(hold_str, handstr, suit_map):
+    """
+    Translate a discard strategy string for a canonical hand back to the
+    (non-canonical) hand it was derived from.
+
+    INPUT:
+    hold_str: (str) discard strategy of the canonical hand, e.g. 'XXXXXX8dQd'
+    handstr: (str) hand to translate the strategy to, e.g. 'Qc9d8c5d2d'
+    suit_map: (dict) suit map of handstr, as returned by canonicalize(handstr)
+
+    OUTPUT: (str) discard strategy of handstr, e.g. 'QcXX8cXXXX'
+    """
+    held = set([hold_str[ind:ind+2] for ind in range(0, 10, 2)])
+    remapped = ''
+    for ind in range(0, 10, 2):
+        card = handstr[ind].upper() + handstr[ind+1].lower()
+        #the joker has no suit to remap
+        if card[0] + suit_map.get(card[1], card[1]) in held:
+            remapped += card
+        else:
+            remapped += 'XX'
+    return remapped
+
+
+def remap_result(result, handstr, suit_map):
+    """
+    Translate the output of analyze_hand() for a canonical hand to the output
+    for handstr (see remap_hold).
+    """
+    if isinstance(result, dict):
+        (_, holds_d), = result.items()
+        (hold_str, cnts), = holds_d.items()
+        return {handstr: {remap_hold(hold_str, handstr, suit_map): cnts}}
+    else:
+        _, hold_str, ev = result.split(',')
+        return '{},{},{}'.format(handstr, remap_hold(hold_str, handstr, suit_map), ev)
+
+
 def analyze_hand(handstr, payouts = None, return_bestdisc_cnts = True):
     hand = HandAnalyzer(handstr, payouts=payouts)
     results = hand.analyze(return_full_analysis=False,
@@ -36,8 +210,59 @@ def analyze_hand(handstr, payouts = None, return_bestdisc_cnts = True):
         return '{},{},{}'.format(handstr, *results)
 
 
+def analyze_hands_subsets(hand_strs, payouts = None, return_bestdisc_cnts = True,
+                          batchsize = 1 << 14):
+    """
+    analyze_hand for many hands at once, with the inclusion-exclusion engine of
+    subset_analyzer (batchsize hands at a time, bounds memory use): list of
+    the same results, in the order of hand_strs. Not for the wild card games.
+    """
+    return [result for results in _subset_batches(hand_strs, payouts, return_bestdisc_cnts,
+                                                  batchsize)
+            for result in results]
+
+
+def _subset_batches(hand_strs, payouts = None, return_bestdisc_cnts = True,
+                    batchsize = 1 << 14):
+    """
+    Helper for analyze_hands_subsets, yield the list of results of each
+    batchsize hands of an iterable of hand strings.
+    """
+    if payouts is None:
+        payouts = DEFAULT_PAYOUTS
+    holds = HOLDS.tolist()
+    hand_iter = iter(hand_strs)
+    while True:
+        batch = list(islice(hand_iter, batchsize))
+        if not batch:
+            return
+        hands = [[hstr[ind].upper() + hstr[ind+1].lower() for ind in range(0, 10, 2)]
+                 for hstr in batch]
+        counts, evs = subset_analyzer.analyze_hands([[card_id(card) for card in hand]
+                                                     for hand in hands], payouts)
+        best = best_holds(evs)
+        rows = np.arange(len(hands))
+        best_evs = evs[rows, best].tolist()
+        best_cnts = {win: counts[win][rows, best].tolist() for win in payouts}
+
+        results = []
+        for ind, (handstr, hand) in enumerate(zip(batch, hands)):
+            hold_str = ''.join([card if held else 'XX'
+                                for card, held in zip(hand, holds[best[ind]])])
+            if return_bestdisc_cnts:
+                ways_to_win = {win: best_cnts[win][ind] for win in payouts}
+                ways_to_win['expected_val'] = best_evs[ind]
+                results.append({handstr: {hold_str: ways_to_win}})
+            else:
+                results.append('{},{},{}'.format(handstr, hold_str, best_evs[ind]))
+        yield results
+
+
 def save_chunks(hands_lst, filename_base, payouts = None, chunksize = 100000,
-                return_bestdisc_cnts = False):
+                return_bestdisc_cnts = False, canonical = False, resume = True,
+                batchsize = 64, procs = None, metrics = True,
+                live_progress = False, shard_info = None, ndjson = False,
+                compression = None, engine = 'hand'):
     """
     Wrapper func for spreading analysis work across available cores, and saving
     intermediate results rather than waiting to write out the results of all
@@ -48,9 +273,15 @@ def save_chunks(hands_lst, filename_base, payouts = None, chunksize = 100000,
     possible hands will likely take several hours.
 
     INPUT:
-    hands_lst: (list of str) List of 10-char strings of poker hands.
+    hands_lst: (list of str) List of 10-char strings of poker hands, or a
+        range of hand indices (see strategy_table.index_hand), e.g.
+        range(strategy_table.NUM_HANDS) for all hands in colex order (or
+        NUM_JOKER_HANDS for Joker Poker). With a range nothing is
+        materialized up front, and workers generate their hands from the
+        indices. Any other iterable is read into a list.
     filename_base: (str) base name of text files to be written. these will be
-        appended with the lowest count of chunksize and '.txt' or '.json'. e.g.
+        appended with the lowest count of chunksize and '.txt' or '.json'
+        (see ndjson and compression for other extensions). e.g.
         filename_base = "poker_hands_" writes out poker_hands_0.txt,
         poker_hands_100000.txt, etc. (if chunksize = default)
     payouts: (dict) Payout value of each winning hand.
@@ -62,35 +293,875 @@ def save_chunks(hands_lst, filename_base, payouts = None, chunksize = 100000,
         This returns a nested dict of {hand:{bestdiscstr:{win counts, exp val}}}
         for each hand, saved as a json. See vp_analyzer.HandAnalyzer.analyze
         for more info.
+    canonical: (bool) Only analyze one hand from each suit isomorphism class
+        (see canonicalize), and remap its best discard to the other hands of
+        the class when writing out results. Relabelling suits never changes
+        the expected value of a play, and all ~2.6M hands fall into 134,459
+        classes, so this cuts the work of a full run by a factor of ~19.
+    resume: (bool) Keep a run manifest (filename_base + 'manifest.json') that
+        records the run settings along with the offset and sha256 checksum of
+        each completed chunk. If a manifest from an earlier, interrupted run
+        with the same settings exists, skip the chunks whose files on disk still
+        match their checksums. Chunks are written to a temporary file and
+        renamed once complete, so a killed run never leaves a partial chunk
+        under its final name.
+    batchsize: (int) Number of hands sent to a worker process at a time.
+        All chunks are streamed through a single pool of workers (the payout
+        table is set once per worker), and results are written out as they
+        arrive.
+    procs: (int) Number of worker processes, default multiprocessing.cpu_count()
+    metrics: (bool) Append progress, throughput and timing records to
+        filename_base + 'metrics.jsonl' (see RunMetrics).
+    live_progress: (bool) Keep a live progress line (hands done, rate, ETA)
+        updated on stderr.
+    shard_info: (dict) Extra run settings recorded in the manifest, see
+        save_shard.
+    ndjson: (bool) With return_bestdisc_cnts, write one json dict per line
+        ('.ndjson') instead of a single json list, so that chunk files can be
+        read back as a stream.
+    compression: (str) Compress chunk files as they are written, one of
+        'gz', 'bz2' or 'xz' (appended to the file extension). None for plain
+        text.
+    engine: (str) 'hand': analyze hands one at a time in the worker pool
+        (see analyze_hand). 'subset': analyze each chunk at once with the
+        inclusion-exclusion engine of subset_analyzer (see
+        analyze_hands_subsets), in this process, which writes the same
+        files in minutes for all hands. Not for canonical runs (whose best
+        discards can differ in ties) or the wild card games.
 
     OUTPUT:
-    Files to disk: (text)
-
+    Files to disk: (text), the run manifest (json) and metrics (json lines)
+    Returns the run summary dict (see RunMetrics.summary), or None if every
+    chunk was already complete.
     """
-    procs = multiprocessing.cpu_count()
-    if payouts is None:
-        mapfunc = analyze_hand
+    if procs is None:
+        procs = multiprocessing.cpu_count()
+    if engine not in ('hand', 'subset'):
+        raise Exception("engine must be 'hand' or 'subset', got: {}".format(engine))
+    if engine == 'subset' and canonical:
+        raise Exception("The 'subset' engine analyzes every hand, canonical must be False")
+    if not isinstance(hands_lst, (list, tuple, range)):
+        hands_lst = list(hands_lst)
+
+    if return_bestdisc_cnts:
+        ext = '.ndjson' if ndjson else '.json'
     else:
-        kwargs = {'payouts': payouts, 'return_bestdisc_cnts': return_bestdisc_cnts}
-        mapfunc = partial(analyze_hand, **kwargs)
+        ext = '.txt'
+    if compression is not None:
+        if compression not in COMPRESSIONS:
+            exp = 'compression must be one of {}, got: {}'
+            raise Exception(exp.format(sorted(COMPRESSIONS), compression))
+        ext += '.' + compression
+    manifest_fname = filename_base + 'manifest.json'
+    run_info = {'payouts': payouts, 'chunksize': chunksize,
+                'return_bestdisc_cnts': return_bestdisc_cnts,
+                'canonical': canonical, 'output_format': ext,
+                'num_hands': len(hands_lst),
+                'hands_sha256': _hands_sha256(hands_lst)}
+    if shard_info is not None:
+        run_info['shard'] = shard_info
+    manifest = load_manifest(manifest_fname, run_info) if resume else None
+    if manifest is None:
+        manifest = dict(run_info, chunks = {})
 
+    chunk_inds = []
     for ind in range(0, len(hands_lst), chunksize):
+        if chunk_verified(manifest, ind, filename_base + str(ind) + ext):
+            print('Verified, skipping: {}'.format(filename_base + str(ind)))
+        else:
+            chunk_inds.append(ind)
+    if chunk_inds == []:
+        return None
+
+    run_metrics = RunMetrics(filename_base + 'metrics.jsonl' if metrics else None,
+                             live = live_progress)
+
+    def finish_chunk(ind, writer):
+        writer.close()
+        manifest['chunks'][str(ind)] = {'file': os.path.basename(writer.fname),
+                                        'num_hands': writer.num_hands,
+                                        'sha256': file_sha256(writer.fname)}
+        _write_json_atomic(manifest_fname, manifest)
+        run_metrics.chunk_done(ind, writer.num_hands)
+        print('Saved: {}'.format(filename_base + str(ind)))
+
+    if engine == 'subset':
+        _run_subsets(hands_lst, chunk_inds, chunksize, payouts, return_bestdisc_cnts,
+                     filename_base, ext, finish_chunk, run_metrics)
+        return run_metrics.finish()
 
-        pool = multiprocessing.Pool(processes = procs)
-        if ind+chunksize <= len(hands_lst):
-            hands_analysis = pool.map(mapfunc, hands_lst[ind:ind+chunksize])
+    initargs = ({'payouts': payouts,
+                 'return_bestdisc_cnts': return_bestdisc_cnts},)
+    with multiprocessing.Pool(processes = procs, initializer = _init_worker,
+                              initargs = initargs) as pool:
+        if canonical:
+            _run_canonical(pool, hands_lst, chunk_inds, chunksize, batchsize,
+                           filename_base, ext, finish_chunk, run_metrics)
         else:
-            hands_analysis = pool.map(mapfunc, hands_lst[ind:])
+            _run_hands(pool, hands_lst, chunk_inds, chunksize, batchsize,
+                       filename_base, ext, finish_chunk, run_metrics)
+    return run_metrics.finish()
+
+
+def _run_hands(pool, hands_lst, chunk_inds, chunksize, batchsize,
+               filename_base, ext, finish_chunk, run_metrics):
+    """
+    Helper for save_chunks, stream every hand of the given chunks through the
+    pool, appending results to each chunk's file as they arrive.
+    """
+    batches = []
+    for ind in chunk_inds:
+        chunk_end = min(ind + chunksize, len(hands_lst))
+        for start in range(ind, chunk_end, batchsize):
+            batches.append(hands_lst[start:min(start + batchsize, chunk_end)])
+    run_metrics.start(sum([len(batch) for batch in batches]))
+
+    chunk_iter = iter(chunk_inds)
+    writer = None
+    for results in _imap_in_order(pool, batches, run_metrics):
+        if writer is None:
+            ind = next(chunk_iter)
+            chunk_len = min(chunksize, len(hands_lst) - ind)
+            writer = _ChunkWriter(filename_base + str(ind) + ext)
+        writer.write(results)
+        if writer.num_hands == chunk_len:
+            finish_chunk(ind, writer)
+            writer = None
+
+
+def _run_canonical(pool, hands_lst, chunk_inds, chunksize, batchsize,
+                   filename_base, ext, finish_chunk, run_metrics):
+    """
+    Helper for save_chunks, stream the canonical forms of the given chunks'
+    hands through the pool (each canonical hand once, in order of first
+    appearance). Chunks are canonicalized as they are dispatched, at most
+    CANONICAL_LOOKAHEAD chunks ahead of the one being written, and a chunk's
+    canonical forms and suit maps are dropped once it is written, so memory
+    doesn't grow with the number of hands (only the results of the canonical
+    hands, at most NUM_JOKER_CLASSES, are kept).
+    """
+    interned = {}
+    canon_results = {}
+    pending = deque()
+    hands_left = sum([min(chunksize, len(hands_lst) - ind) for ind in chunk_inds])
+    #canonical hands dispatched so far, and the most there can be in all
+    num_todo, num_classes = [0], [NUM_CLASSES]
+    run_metrics.start(min(hands_left, NUM_CLASSES))
+
+    def dispatch(ind):
+        canons, suit_maps, todo = [], [], []
+        for hstr in _hand_strs(hands_lst[ind:ind+chunksize]):
+            canon, suit_map = canonicalize(hstr)
+            if canon not in interned:
+                interned[canon] = canon
+                todo.append(canon)
+                if JOKER in canon:
+                    num_classes[0] = NUM_JOKER_CLASSES
+            canons.append(interned[canon])
+            suit_key = tuple(sorted(suit_map.items()))
+            suit_maps.append(interned.setdefault(suit_key, suit_map))
+        batches = [todo[start:start+batchsize] for start in range(0, len(todo), batchsize)]
+        jobs = [(batch, pool.apply_async(_analyze_batch, ((seq, batch),)))
+                for seq, batch in enumerate(batches)]
+        pending.append((ind, canons, suit_maps, jobs))
+        num_todo[0] += len(todo)
+        #at most one more per hand left, or per class not seen yet
+        run_metrics.num_tasks = num_todo[0] + min(hands_left, num_classes[0] - num_todo[0])
+
+    def write_oldest():
+        ind, canons, suit_maps, jobs = pending.popleft()
+        for batch, job in jobs:
+            _, results, stats = job.get()
+            run_metrics.add_batch(stats)
+            canon_results.update(zip(batch, results))
+        writer = _ChunkWriter(filename_base + str(ind) + ext)
+        hands = _hand_strs(hands_lst[ind:ind+chunksize])
+        writer.write(remap_result(canon_results[canon], hstr, suit_map)
+                     for hstr, canon, suit_map in zip(hands, canons, suit_maps))
+        finish_chunk(ind, writer)
+
+    for ind in chunk_inds:
+        hands_left -= min(chunksize, len(hands_lst) - ind)
+        dispatch(ind)
+        if len(pending) > CANONICAL_LOOKAHEAD:
+            write_oldest()
+    while pending:
+        write_oldest()
+
+
+def _run_subsets(hands_lst, chunk_inds, chunksize, payouts, return_bestdisc_cnts,
+                 filename_base, ext, finish_chunk, run_metrics):
+    """
+    Helper for save_chunks, analyze the given chunks with the subset engine
+    in this process (see analyze_hands_subsets), writing each batch's results
+    out as they are produced.
+    """
+    run_metrics.start(sum([min(chunksize, len(hands_lst) - ind) for ind in chunk_inds]))
+    for ind in chunk_inds:
+        writer = _ChunkWriter(filename_base + str(ind) + ext)
+        batches = _subset_batches(_hand_strs(hands_lst[ind:ind+chunksize]), payouts,
+                                  return_bestdisc_cnts)
+        while True:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            results = next(batches, None)
+            if results is None:
+                break
+            run_metrics.add_batch({'pid': os.getpid(), 'num_hands': len(results),
+                                   'wall': time.perf_counter() - wall_start,
+                                   'cpu': time.process_time() - cpu_start,
+                                   'slowest': []})
+            writer.write(results)
+        finish_chunk(ind, writer)
+
+
+def _hand_strs(hands):
+    """Helper, hand strings of a list of hands or of a range of hand indices."""
+    if isinstance(hands, range):
+        return map(strategy_table.index_hand, hands)
+    return hands
+
+
+def _imap_in_order(pool, batches, run_metrics):
+    """
+    Helper, spread batches of hands over the pool with imap_unordered and yield
+    each batch's results as soon as it and all earlier batches are done. Unlike
+    pool.map, there's no barrier waiting for the slowest hand of a chunk before
+    the workers can move on.
+    """
+    pending = {}
+    next_seq = 0
+    for seq, results, stats in pool.imap_unordered(_analyze_batch, enumerate(batches)):
+        run_metrics.add_batch(stats)
+        pending[seq] = results
+        while next_seq in pending:
+            yield pending.pop(next_seq)
+            next_seq += 1
+
+
+_WORKER_KWARGS = {}
+_WORKER_FUNC = [analyze_hand]
+
+def _init_worker(kwargs, func = analyze_hand):
+    """
+    Pool initializer, set the function each hand is analyzed with (default
+    analyze_hand) and its kwargs once per worker process.
+    """
+    _WORKER_KWARGS.clear()
+    _WORKER_KWARGS.update(kwargs)
+    _WORKER_FUNC[0] = func
+
+
+def _analyze_batch(seq_batch):
+    """
+    Pool worker func, analyze a (sequence number, list of hands or range of
+    hand indices) batch. Also returns timing stats for the batch, see
+    RunMetrics.add_batch.
+    """
+    seq, batch = seq_batch
+    caches = [cache for cache in (DiscardValue.rank_cache, DeucesWildValue.rank_cache,
+                                  JokerPokerValue.rank_cache)
+              if cache is not None]
+    cache_start = (sum([cache.hits for cache in caches]),
+                   sum([cache.misses for cache in caches]))
+    cpu_start = time.process_time()
+    results, hand_secs = [], []
+    for hstr in _hand_strs(batch):
+        hand_start = time.perf_counter()
+        results.append(_WORKER_FUNC[0](hstr, **_WORKER_KWARGS))
+        hand_secs.append((time.perf_counter() - hand_start, hstr))
+    cache_end = (sum([cache.hits for cache in caches]),
+                 sum([cache.misses for cache in caches]))
+    stats = {'pid': os.getpid(), 'num_hands': len(batch),
+             'wall': sum([secs for secs, _ in hand_secs]),
+             'cpu': time.process_time() - cpu_start,
+             'cache_hits': cache_end[0] - cache_start[0],
+             'cache_misses': cache_end[1] - cache_start[1],
+             'slowest': heapq.nlargest(RunMetrics.num_slowest, hand_secs)}
+    return seq, results, stats
+
+
+class RunMetrics(object):
+    """
+    Progress, throughput and timing instrumentation for a save_chunks run.
+
+    Records are appended as json lines to fname, so several (resumed) runs can
+    share a file. Each record has an 'event' key:
+    'start': time, num_tasks (hands to be analyzed this run)
+    'chunk': chunk offset, hands written, hands analyzed, wall and worker cpu
+        seconds since the previous chunk, plus the progress fields below
+    'summary': the progress fields, plus the slowest hands analyzed
+    Progress fields: elapsed (s), hands_done, num_tasks, rate (hands/s),
+        eta (s), and per worker process: hands, busy seconds, cpu seconds,
+        utilization (busy seconds / elapsed), and rank cache hits and misses
+        (see vp_analyzer.RankCache)
+
+    INPUT:
+    fname: (str) json lines metrics file, None to skip writing one.
+    live: (bool) Keep a progress line updated on stderr (at most once per
+        live_interval seconds).
+    """
+    num_slowest = 10
+    live_interval = 1.0
+
+    def __init__(self, fname = None, live = False):
+        self.fname = fname
+        self.live = live
+        self.num_tasks = 0
+        self.hands_done = 0
+        self.workers = {}
+        self.slowest = [] #min heap of (secs, hand)
+        self.__start = self.__chunk_start = self.__last_live = time.perf_counter()
+        self.__chunk_cpu = 0
+        self.__chunk_hands = 0
+
+    def start(self, num_tasks):
+        """Set the number of hands to be analyzed and record the run start."""
+        self.num_tasks = num_tasks
+        self.__start = self.__chunk_start = time.perf_counter()
+        self._emit({'event': 'start', 'time': time.time(), 'num_tasks': num_tasks})
+
+    def add_batch(self, stats):
+        """
+        Account for a batch of analyzed hands. stats is a dict with keys:
+        pid, num_hands, wall and cpu (seconds spent in the worker),
+        cache_hits and cache_misses (optional, rank cache lookups) and
+        slowest: list of (seconds, hand) of the batch's slowest hands.
+        """
+        self.hands_done += stats['num_hands']
+        self.__chunk_hands += stats['num_hands']
+        self.__chunk_cpu += stats['cpu']
+        worker = self.workers.setdefault(stats['pid'], {'hands': 0, 'busy': 0, 'cpu': 0,
+                                                        'cache_hits': 0,
+                                                        'cache_misses': 0})
+        worker['hands'] += stats['num_hands']
+        worker['busy'] += stats['wall']
+        worker['cpu'] += stats['cpu']
+        worker['cache_hits'] += stats.get('cache_hits', 0)
+        worker['cache_misses'] += stats.get('cache_misses', 0)
+        for secs_hand in stats['slowest']:
+            if len(self.slowest) < self.num_slowest:
+                heapq.heappush(self.slowest, tuple(secs_hand))
+            else:
+                heapq.heappushpop(self.slowest, tuple(secs_hand))
+
+        if self.live and time.perf_counter() - self.__last_live >= self.live_interval:
+            self.__last_live = time.perf_counter()
+            prog = self.progress()
+            line = '\r{:,}/{:,} hands  {:,.1f} hands/s  ETA {}'.format(
+                   prog['hands_done'], prog['num_tasks'], prog['rate'],
+                   _format_secs(prog['eta']))
+            sys.stderr.write(line.ljust(70))
+            sys.stderr.flush()
+
+    def progress(self):
+        """Dict of the progress fields (see class docstring)."""
+        elapsed = time.perf_counter() - self.__start
+        rate = self.hands_done / elapsed if elapsed > 0 else 0.
+        remaining = self.num_tasks - self.hands_done
+        workers = {}
+        for pid, worker in self.workers.items():
+            workers[str(pid)] = dict(worker, utilization =
+                                     worker['busy'] / elapsed if elapsed > 0 else 0.)
+        return {'elapsed': elapsed, 'hands_done': self.hands_done,
+                'num_tasks': self.num_tasks, 'rate': rate,
+                'eta': remaining / rate if rate > 0 else None,
+                'workers': workers}
+
+    def chunk_done(self, ind, num_hands):
+        """Record a chunk file of num_hands results written at offset ind."""
+        now = time.perf_counter()
+        record = {'event': 'chunk', 'chunk': ind, 'num_hands': num_hands,
+                  'hands_analyzed': self.__chunk_hands,
+                  'wall': now - self.__chunk_start, 'cpu': self.__chunk_cpu}
+        record.update(self.progress())
+        self._emit(record)
+        self.__chunk_start = now
+        self.__chunk_cpu = 0
+        self.__chunk_hands = 0
+        if self.live:
+            sys.stderr.write('\n')
+
+    def summary(self):
+        """Progress fields plus the slowest hands, slowest first."""
+        summ = {'event': 'summary'}
+        summ.update(self.progress())
+        summ['slowest'] = [[secs, hstr] for secs, hstr in sorted(self.slowest, reverse = True)]
+        return summ
+
+    def finish(self):
+        """Record and return the run summary."""
+        summ = self.summary()
+        self._emit(summ)
+        return summ
 
-        fname = filename_base + str(ind)
-        if return_bestdisc_cnts:
-            with open(fname + '.json', 'w') as fout:
-                json.dump(hands_analysis, fout)
+    def _emit(self, record):
+        """Helper, append a record to the metrics file."""
+        if self.fname is not None:
+            with open(self.fname, 'a') as fout:
+                fout.write(json.dumps(record) + '\n')
+
+
+def _format_secs(secs):
+    """Helper, format seconds as H:MM:SS ('?' if unknown)."""
+    if secs is None:
+        return '?'
+    mins, secs = divmod(int(secs), 60)
+    hours, mins = divmod(mins, 60)
+    return '{}:{:02d}:{:02d}'.format(hours, mins, secs)
+
+
+class _ChunkWriter(object):
+    """
+    Helper for save_chunks, stream the results of a chunk to a temporary file
+    as they come in, and rename it to fname once closed. Memory use doesn't
+    depend on the chunk size. The file format follows fname's extension:
+    '.txt': one 'hand,hold,ev' line per hand
+    '.json': a json list of dicts (same as json.dump of the whole chunk)
+    '.ndjson': one json dict per line
+    optionally followed by a compression extension (see COMPRESSIONS).
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self.num_hands = 0
+        self.__format = _chunk_format(fname)
+        self.__fout = open_chunk(fname, 'w', tmp_fname = fname + '.tmp')
+        if self.__format == '.json':
+            self.__fout.write('[')
+
+    def write(self, results):
+        for result in results:
+            if self.__format == '.json':
+                if self.num_hands > 0:
+                    self.__fout.write(', ')
+                self.__fout.write(json.dumps(result))
+            elif self.__format == '.ndjson':
+                self.__fout.write(json.dumps(result) + '\n')
+            else:
+                self.__fout.write(result + '\n')
+            self.num_hands += 1
+
+    def close(self):
+        if self.__format == '.json':
+            self.__fout.write(']')
+        self.__fout.close()
+        os.replace(self.fname + '.tmp', self.fname)
+
+
+#chunk file compression extension -> module with a compatible open()
+COMPRESSIONS = {'gz': gzip, 'bz2': bz2, 'xz': lzma}
+
+
+def _chunk_format(fname):
+    """Helper, chunk file format extension without any compression extension."""
+    root, ext = os.path.splitext(fname)
+    if ext[1:] in COMPRESSIONS:
+        root, ext = os.path.splitext(root)
+    return ext
+
+
+def open_chunk(fname, mode = 'r', tmp_fname = None):
+    """
+    Open a chunk file as text for reading ('r') or writing ('w'), compressed
+    or decompressed according to fname's extension (see COMPRESSIONS). If
+    tmp_fname is given, open that file instead (with fname's compression).
+    """
+    path = fname if tmp_fname is None else tmp_fname
+    comp = os.path.splitext(fname)[1][1:]
+    if comp not in COMPRESSIONS:
+        return open(path, mode)
+    elif comp == 'gz' and mode == 'w':
+        #zero mtime in the gzip header, so that identical results give identical files
+        return io.TextIOWrapper(gzip.GzipFile(path, 'wb', mtime = 0))
+    else:
+        return COMPRESSIONS[comp].open(path, mode + 't')
+
+
+def load_manifest(manifest_fname, run_info):
+    """
+    Load the run manifest written by save_chunks. Return None if there is no
+    manifest yet. Raise an Exception if the manifest was written by a run with
+    different settings (payouts, chunksize, hands, etc.), since its chunks
+    can't be reused.
+    """
+    if not os.path.exists(manifest_fname):
+        return None
+    with open(manifest_fname) as fin:
+        manifest = json.load(fin)
+
+    #round trip through json so that e.g. tuples compare equal to lists
+    run_info = json.loads(json.dumps(run_info))
+    for key, val in run_info.items():
+        if manifest.get(key) != val:
+            exp = 'Manifest {} was written by a run with a different {}: {} != {}'
+            raise Exception(exp.format(manifest_fname, key, manifest.get(key), val))
+    return manifest
+
+
+def manifest_records(filename_base):
+    """
+    Yield a (hand, best discard, expected value) tuple for every hand of a
+    save_chunks run, reading the chunk files in order. Raise an Exception if
+    the run is incomplete or a chunk file doesn't match its checksum.
+    """
+    with open(filename_base + 'manifest.json') as fin:
+        manifest = json.load(fin)
+    dirname = os.path.dirname(filename_base)
+    chunk_inds = range(0, manifest['num_hands'], manifest['chunksize'])
+    for ind in chunk_inds:
+        chunk = manifest['chunks'].get(str(ind))
+        fname = os.path.join(dirname, chunk['file']) if chunk else None
+        if fname is None or not chunk_verified(manifest, ind, fname):
+            exp = 'Run {} is incomplete or corrupt at chunk {}'
+            raise Exception(exp.format(filename_base, ind))
+
+    for ind in chunk_inds:
+        fname = os.path.join(dirname, manifest['chunks'][str(ind)]['file'])
+        for record in read_chunk(fname):
+            yield record
+
+
+def chunk_verified(manifest, ind, fname):
+    """
+    Check that the chunk starting at hand ind is recorded as complete in the
+    manifest and that fname on disk still matches its recorded checksum.
+    """
+    chunk = manifest['chunks'].get(str(ind))
+    if chunk is None or not os.path.exists(fname):
+        return False
+    return file_sha256(fname) == chunk['sha256']
+
+
+def file_sha256(fname):
+    """Hex sha256 checksum of a file's contents."""
+    sha = hashlib.sha256()
+    with open(fname, 'rb') as fin:
+        for block in iter(lambda: fin.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _hands_sha256(hands_lst):
+    """Helper to fingerprint the list of hands a run was asked to analyze."""
+    sha = hashlib.sha256()
+    if isinstance(hands_lst, range):
+        sha.update(repr(hands_lst).encode())
+        return sha.hexdigest()
+    for hstr in hands_lst:
+        sha.update(hstr.encode())
+    return sha.hexdigest()
+
+
+def _write_json_atomic(fname, obj):
+    """Helper to write json to a temp file and rename it over fname."""
+    with open(fname + '.tmp', 'w') as fout:
+        json.dump(obj, fout, indent = 1, sort_keys = True)
+    os.replace(fname + '.tmp', fname)
+
+
+def read_chunk(fname):
+    """
+    Yield a (hand, best discard, expected value) tuple for each hand in a chunk
+    file written by save_chunks (any format, see _ChunkWriter). Apart from
+    '.json', files are read as a stream.
+    """
+    with open_chunk(fname) as fin:
+        if _chunk_format(fname) == '.json':
+            for hand_d in json.load(fin):
+                (hstr, holds_d), = hand_d.items()
+                (hold_str, cnts), = holds_d.items()
+                yield hstr, hold_str, cnts['expected_val']
+        elif _chunk_format(fname) == '.ndjson':
+            for line in fin:
+                (hstr, holds_d), = json.loads(line).items()
+                (hold_str, cnts), = holds_d.items()
+                yield hstr, hold_str, cnts['expected_val']
         else:
-            with open(fname + '.txt', 'w') as fout:
-                # write results on separate lines, include \n on last line
-                fout.write('\n'.join(hands_analysis)+'\n')
-        print('Saved: {}'.format(fname))
+            for line in fin:
+                hstr, hold_str, ev = line.rstrip('\n').split(',')
+                yield hstr, hold_str, float(ev)
+
+
+def chunks2table(filename_base, table_fname, name = None):
+    """
+    Combine the chunk files of a complete save_chunks run over all hands into
+    a single binary strategy table (see strategy_table), which can be memory
+    mapped and queried without parsing ~70MB of text.
+
+    INPUT:
+    filename_base: (str) filename_base the chunks were saved with, the run
+        manifest is used to find the chunk files and the payout table.
+    table_fname: (str) name of the strategy table file to write.
+    name: (str) optional payout table name stored in the table header.
+    """
+    with open(filename_base + 'manifest.json') as fin:
+        payouts = json.load(fin)['payouts']
+    strategy_table.write_table(table_fname, manifest_records(filename_base),
+                               payouts = payouts, name = name)
+
+
+def shard_base(filename_base, shard_ind, num_shards):
+    """filename_base of the save_chunks run of one shard."""
+    return '{}shard{}of{}_'.format(filename_base, shard_ind, num_shards)
+
+
+def parse_shard(shard_str):
+    """Parse a shard spec like '3/8' (shard index 3 of 8) to a tuple (3, 8)."""
+    try:
+        shard_ind, num_shards = [int(x) for x in shard_str.split('/')]
+    except ValueError:
+        raise ValueError('Expecting a shard of the form i/N, got: {}'.format(shard_str))
+    if not 0 <= shard_ind < num_shards:
+        raise ValueError('Shard index must be in [0, N), got: {}'.format(shard_str))
+    return shard_ind, num_shards
+
+
+def save_shard(filename_base, shard_ind, num_shards, payouts = None,
+               canonical = False, **kwargs):
+    """
+    Analyze one of num_shards disjoint slices of the hand space, so that a
+    full run can be split across machines and merged with merge_shards.
+
+    The hand space is the range of all hand indices (see
+    strategy_table.index_hand, strategy_table.num_hands for Joker Poker's
+    larger deck), or canonical_hands_gen() if canonical, and
+    shard i takes every num_shards-th hand starting at i. Striding spreads
+    expensive and cheap hands evenly over the shards. Each shard is its own
+    resumable save_chunks run under shard_base(filename_base, ...), and its
+    manifest records the payouts, shard index, shard count and hand space, so
+    the shard files describe themselves.
+
+    INPUT:
+    filename_base: (str) base name shared by all shards of the run.
+    shard_ind, num_shards: (int) analyze shard shard_ind of num_shards.
+    payouts: (dict) see save_chunks.
+    canonical: (bool) shard the 134,459 canonical hands (see canonicalize)
+        instead of all ~2.6M hands. merge_shards expands them to all hands.
+    kwargs: passed on to save_chunks (chunksize, return_bestdisc_cnts, etc.)
+
+    OUTPUT: the save_chunks run summary.
+    """
+    joker = payouts is not None and is_joker_poker(payouts)
+    if canonical:
+        space = [hstr for hstr, _ in canonical_hands_gen(joker = joker)]
+    else:
+        space = range(strategy_table.num_hands(payouts))
+    shard_info = {'index': shard_ind, 'count': num_shards,
+                  'space': 'canonical' if canonical else 'hands',
+                  'space_size': len(space)}
+    return save_chunks(space[shard_ind::num_shards],
+                       shard_base(filename_base, shard_ind, num_shards),
+                       payouts = payouts, shard_info = shard_info, **kwargs)
+
+
+def merge_shards(filename_base, table_fname, name = None):
+    """
+    Check that the shards saved under filename_base (see save_shard) are all
+    present, complete and from the same run, and combine them into a single
+    strategy table covering every hand exactly once.
+
+    INPUT:
+    filename_base: (str) base name passed to save_shard.
+    table_fname: (str) name of the strategy table file to write.
+    name: (str) optional payout table name stored in the table header.
+    """
+    manifests = {}
+    for manifest_fname in glob.glob(glob.escape(filename_base) + 'shard*of*_manifest.json'):
+        with open(manifest_fname) as fin:
+            manifest = json.load(fin)
+        if 'shard' not in manifest:
+            continue
+        base = manifest_fname[:-len('manifest.json')]
+        manifests[base] = manifest
+    if manifests == {}:
+        raise Exception('No shards found for {}'.format(filename_base))
+
+    first = list(manifests.values())[0]
+    num_shards = first['shard']['count']
+    for base, manifest in manifests.items():
+        for key in ['payouts', 'return_bestdisc_cnts']:
+            if manifest[key] != first[key]:
+                raise Exception('Shard {} has a different {}'.format(base, key))
+        for key in ['count', 'space', 'space_size']:
+            if manifest['shard'][key] != first['shard'][key]:
+                raise Exception('Shard {} has a different shard {}'.format(base, key))
+        shard_ind = manifest['shard']['index']
+        if base != shard_base(filename_base, shard_ind, num_shards):
+            raise Exception('Shard {} has unexpected index {}'.format(base, shard_ind))
+    missing = set(range(num_shards)).difference(
+              [manifest['shard']['index'] for manifest in manifests.values()])
+    if missing:
+        raise Exception('Missing shards {} of {}'.format(sorted(missing), num_shards))
+    covered = sum([manifest['num_hands'] for manifest in manifests.values()])
+    if covered != first['shard']['space_size']:
+        exp = 'Shards cover {} hands, expecting {}'
+        raise Exception(exp.format(covered, first['shard']['space_size']))
+
+    def records():
+        for shard_ind in range(num_shards):
+            base = shard_base(filename_base, shard_ind, num_shards)
+            for hstr, hold_str, ev in manifest_records(base):
+                if first['shard']['space'] == 'canonical':
+                    for member, suit_map in class_members(hstr):
+                        yield member, remap_hold(hold_str, member, suit_map), ev
+                else:
+                    yield hstr, hold_str, ev
+
+    strategy_table.write_table(table_fname, records(),
+                               payouts = first['payouts'], name = name)
+
+
+#paytable independent winning hand categories, any payout table is a linear
+#function of these counts (see payout_matrix)
+SWEEP_WINS = ['royal_flush', 'straight_flush', 'full_house', 'flush',
+              'straight', 'three_kind', 'two_pair', 'pair_jqka'] + \
+             ['four_kind' + r for r in RANKS]
+
+
+def payout_matrix(paytables):
+    """
+    Payout of each SWEEP_WINS category under each payout table.
+
+    INPUT:
+    paytables: (list of dict) payout tables, see vp_analyzer.HandAnalyzer.
+        Bonus fours of a kind are given as 'four_kind' + ranks, e.g.
+        'four_kindA8', and pay instead of 'four_kind' for those ranks.
+
+    OUTPUT: (np.array) shape (len(SWEEP_WINS), len(paytables))
+    """
+    pay_matrix = np.zeros((len(SWEEP_WINS), len(paytables)))
+    for col, payouts in enumerate(paytables):
+        for win in payouts:
+            if win not in SWEEP_WINS and not win.startswith('four_kind'):
+                raise Exception('Unknown winning hand: {}'.format(win))
+        for row, win in enumerate(SWEEP_WINS):
+            if win.startswith('four_kind'):
+                rank = win[len('four_kind'):]
+                pay = payouts.get('four_kind', 0)
+                for bonus, bonus_pay in payouts.items():
+                    if bonus.startswith('four_kind') and rank in bonus[len('four_kind'):]:
+                        pay = bonus_pay
+                pay_matrix[row, col] = pay
+            else:
+                pay_matrix[row, col] = payouts.get(win, 0)
+    return pay_matrix
+
+
+def sweep_hand(handstr, pay_matrix):
+    """
+    Count the ways to win of each of a hand's 32 discard strategies once, and
+    price them under every payout table of pay_matrix (see payout_matrix) with
+    a single matrix product.
+
+    OUTPUT: (tuple) list of the best discard strategy's 5-bit hold mask (bit i
+        for the i-th card of handstr) and list of its expected value, one per
+        payout table. As in HandAnalyzer.best_disc, ties in expected value go
+        to the strategy that discards more cards.
+    """
+    hold_strs, counts, denoms = HandAnalyzer(handstr).count_matrix(SWEEP_WINS)
+    evs = np.dot(np.array(counts, dtype = np.float64), pay_matrix)
+    evs /= np.array(denoms, dtype = np.float64)[:, None]
+    discards = np.array([hold_str.count('XX') for hold_str in hold_strs])
+
+    masks, best_evs = [], []
+    for col in range(pay_matrix.shape[1]):
+        tied = np.flatnonzero(evs[:, col] == evs[:, col].max())
+        best = tied[np.argmax(discards[tied])]
+        masks.append(sum([1 << ind for ind in range(5)
+                          if hold_strs[best][2*ind:2*ind+2] != 'XX']))
+        best_evs.append(float(evs[best, col]))
+    return masks, best_evs
+
+
+def sweep_paytables(paytables, filename_base, procs = None, batchsize = 64,
+                    live_progress = False, write_tables = True):
+    """
+    Find the best discard, its expected value, and the overall return to
+    player (RTP) of every hand under many payout tables in one pass. The ways
+    to win of each hold don't depend on the payouts, so each hand's counts are
+    computed once (see sweep_hand) instead of once per payout table. Only the
+    134,459 canonical hands (see canonicalize) are analyzed.
+
+    INPUT:
+    paytables: (dict) payout table name -> payouts dict, e.g. PAYTABLES
+    filename_base: (str) base name of the output files
+    procs, batchsize, live_progress: see save_chunks
+    write_tables: (bool) write a strategy table (see strategy_table) for each
+        payout table to filename_base + name + '.vpst'
+
+    OUTPUT:
+    Files to disk: filename_base + 'sweep.json' with the payouts and RTP of
+        each payout table, the strategy tables, and run metrics (see
+        RunMetrics) in filename_base + 'sweep_metrics.jsonl'
+    Returns the contents of sweep.json as a dict.
+    """
+    if procs is None:
+        procs = multiprocessing.cpu_count()
+    names = sorted(paytables)
+    pay_matrix = payout_matrix([paytables[name] for name in names])
+    classes = list(canonical_hands_gen())
+    hands = [hstr for hstr, _ in classes]
+    mults = np.array([mult for _, mult in classes], dtype = np.float64)
+
+    run_metrics = RunMetrics(filename_base + 'sweep_metrics.jsonl',
+                             live = live_progress)
+    run_metrics.start(len(hands))
+    masks = np.zeros((len(hands), len(names)), dtype = np.uint8)
+    evs = np.zeros((len(hands), len(names)))
+    batches = [hands[start:start+batchsize] for start in range(0, len(hands), batchsize)]
+    initargs = ({'pay_matrix': pay_matrix}, sweep_hand)
+    with multiprocessing.Pool(processes = procs, initializer = _init_worker,
+                              initargs = initargs) as pool:
+        row = 0
+        for results in _imap_in_order(pool, batches, run_metrics):
+            for hand_masks, hand_evs in results:
+                masks[row] = hand_masks
+                evs[row] = hand_evs
+                row += 1
+    run_metrics.finish()
+
+    rtps = np.dot(mults, evs) / mults.sum()
+    summary = {name: {'payouts': paytables[name], 'rtp': float(rtps[col])}
+               for col, name in enumerate(names)}
+    if write_tables:
+        class_ids, member_inds, perms = _class_member_arrays(hands)
+        for col, name in enumerate(names):
+            canon_masks = masks[class_ids, col]
+            member_masks = np.zeros(len(class_ids), dtype = np.uint8)
+            for bit in range(5):
+                member_masks |= ((canon_masks >> perms[:, bit]) & 1) << bit
+            table_masks = np.zeros(strategy_table.NUM_HANDS, dtype = np.uint8)
+            table_evs = np.zeros(strategy_table.NUM_HANDS)
+            table_masks[member_inds] = member_masks
+            table_evs[member_inds] = evs[class_ids, col]
+            fname = filename_base + name + '.vpst'
+            strategy_table.write_arrays(fname, table_masks, table_evs,
+                                        payouts = paytables[name], name = name)
+            summary[name]['table'] = os.path.basename(fname)
+
+    _write_json_atomic(filename_base + 'sweep.json', summary)
+    return summary
+
+
+def _class_member_arrays(canon_hands):
+    """
+    Helper for sweep_paytables, arrays to expand per canonical hand results to
+    all hands: for each member hand (see class_members), the row of its class
+    in canon_hands, its strategy table index, and for each of its (sorted)
+    cards, the position of the corresponding card in the canonical hand.
+    """
+    class_ids = np.zeros(strategy_table.NUM_HANDS, dtype = np.int64)
+    member_inds = np.zeros(strategy_table.NUM_HANDS, dtype = np.int64)
+    perms = np.zeros((strategy_table.NUM_HANDS, 5), dtype = np.uint8)
+    row = 0
+    for class_id, canon in enumerate(canon_hands):
+        canon_pos = {canon[ind:ind+2]: ind // 2 for ind in range(0, 10, 2)}
+        for member, suit_map in class_members(canon):
+            class_ids[row] = class_id
+            member_inds[row] = strategy_table.hand_index(member)
+            perms[row] = [canon_pos[member[ind] + suit_map[member[ind+1]]]
+                          for ind in range(0, 10, 2)]
+            row += 1
+    return class_ids, member_inds, perms
 
 
 def flatten_bestdisc_json_chunks2df(json_chunks):
@@ -111,31 +1182,69 @@ def flatten_bestdisc_json_chunks2df(json_chunks):
 
 
 
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Optimal discard and expected'
+                                     ' value of all ~2.6M poker hands.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    run = commands.add_parser('run', help = 'analyze all hands, or one shard')
+    run.add_argument('filename_base')
+    run.add_argument('--paytable', choices = sorted(PAYTABLES) + sorted(WILD_PAYTABLES),
+                     default = 'jacks_or_better_96')
+    run.add_argument('--shard', type = parse_shard, metavar = 'i/N',
+                     help = 'only analyze shard i of N (see save_shard)')
+    run.add_argument('--canonical', action = 'store_true',
+                     help = 'analyze one hand per suit isomorphism class')
+    run.add_argument('--counts', action = 'store_true',
+                     help = 'save win counts of the best discards (json)')
+    run.add_argument('--ndjson', action = 'store_true',
+                     help = 'save win counts one json dict per line')
+    run.add_argument('--compression', choices = sorted(COMPRESSIONS), default = None)
+    run.add_argument('--chunksize', type = int, default = 200000)
+    run.add_argument('--procs', type = int, default = None)
+    run.add_argument('--engine', choices = ['hand', 'subset'], default = 'hand',
+                     help = 'subset: all hands at once by inclusion-exclusion '
+                     '(not with --canonical or the wild card games)')
+    run.add_argument('--table', default = None,
+                     help = 'strategy table file to write when done (no --shard)')
+
+    sweep = commands.add_parser('sweep', help = 'price many payout tables at once')
+    sweep.add_argument('filename_base')
+    sweep.add_argument('--paytables', nargs = '+', choices = sorted(PAYTABLES),
+                       default = sorted(PAYTABLES))
+    sweep.add_argument('--procs', type = int, default = None)
+
+    merge = commands.add_parser('merge', help = 'merge shards to a strategy table')
+    merge.add_argument('filename_base')
+    merge.add_argument('table_fname')
+    merge.add_argument('--name', default = None)
+
+    args = parser.parse_args(argv)
+    if args.command == 'merge':
+        merge_shards(args.filename_base, args.table_fname, name = args.name)
+        return
+    elif args.command == 'sweep':
+        summary = sweep_paytables({name: PAYTABLES[name] for name in args.paytables},
+                                  args.filename_base, procs = args.procs,
+                                  live_progress = True)
+        for name in sorted(summary):
+            print('{}: {:.5f}'.format(name, summary[name]['rtp']))
+        return
+
+    save_kwargs = {'payouts': dict(PAYTABLES, **WILD_PAYTABLES)[args.paytable],
+                   'chunksize': args.chunksize, 'procs': args.procs,
+                   'return_bestdisc_cnts': args.counts, 'ndjson': args.ndjson,
+                   'compression': args.compression, 'live_progress': True,
+                   'engine': args.engine}
+    if args.shard is not None:
+        save_shard(args.filename_base, args.shard[0], args.shard[1],
+                   canonical = args.canonical, **save_kwargs)
+    else:
+        save_chunks(range(strategy_table.num_hands(save_kwargs['payouts'])),
+                    args.filename_base, canonical = args.canonical, **save_kwargs)
+        if args.table is not None:
+            chunks2table(args.filename_base, args.table, name = args.paytable)
+
+
 if __name__ == '__main__':
-    print(time.localtime())
-
-    aces8s_d = {'flush': 5,
-                  'four_kind': 25,
-                  'four_kind7': 50,
-                  'four_kindA8': 80,
-                  'full_house': 8,
-                  'pair_jqka': 1,
-                  'royal_flush': 800,
-                  'straight': 4,
-                  'straight_flush': 50,
-                  'three_kind': 3,
-                  'two_pair': 2}
-    all_hands_str_l = list(map(hand2str, all_hands_gen()))
-    # indout = save_chunks(all_hands_str_l, 'poker_hand_evs_aces8s_',
-    #                      payouts = aces8s_d, chunksize = 200000)
-
-
-    tripbonusplus_d = {'pair_jqka': 1, 'two_pair': 1, 'three_kind': 3,
-                    'straight': 4, 'flush': 5, 'full_house': 9,
-                    'four_kind': 50, 'four_kind234':120, 'four_kindA':240,
-                    'straight_flush': 100, 'royal_flush': 800}
-
-    indout = save_chunks(all_hands_str_l, 'poker_hands_win_cnts_triplebonusplus_',
-                         payouts = tripbonusplus_d, chunksize = 200000,
-                         return_bestdisc_cnts = True)
-    print(time.localtime())
+    main()
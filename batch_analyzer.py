@@ -0,0 +1,216 @@
+"""
+Vectorized analysis of many hands at once, see analyze_batch.
+
+Hands are int arrays of card ids (see vp_analyzer.CARD_IDS) with shape (N, 5).
+Each of the 32 hold/discard strategies of a hand is a column, in the order
+HandAnalyzer.analyze uses: column j holds card i when HOLDS[j, i] is True.
+
+The counts of most winning hands depend only on the ranks held and discarded
+(see vp_analyzer.RankCache), so those are counted once per distinct rank
+signature in the batch and gathered back to every (hand, hold). The suit
+dependent counts (royal_flush, straight_flush, flush, and the flushes taken out
+of straight) are computed for the whole batch with 52-bit card mask kernels.
+"""
+from itertools import product
+import numpy as np
+from vp_analyzer import (CARD_PRIMES, CHOOSE, DEFAULT_PAYOUTS, DiscardValue,
+                         FLUSH_PATTERN_CATEGORY, HAND_CATEGORIES, RANKS,
+                         RANK_PATTERN_CATEGORY, ROYAL_MASKS, SUITS,
+                         STRAIGHT_FLUSH_MASKS, SUITED_WINS, category_pays)
+
+
+#HOLDS[j, i]: hold/discard strategy j holds the hand's i-th card
+HOLDS = np.array(list(product([True, False], repeat = 5)))
+NUM_HELD = HOLDS.sum(axis = 1)
+_HOLD_INDS = [[np.flatnonzero(hold).tolist(), np.flatnonzero(~hold).tolist()]
+              for hold in HOLDS]
+#COMB[n, k] = comb(n, k), from the vp_analyzer.CHOOSE table
+COMB = np.array([row[:6] for row in CHOOSE[:48]], dtype = np.int64)
+SUIT_MASKS = [sum([1 << (r*len(SUITS) + s) for r in range(13)])
+              for s in range(len(SUITS))]
+#rank signature codes: count of each rank held/discarded as base 5 digits
+_RANK_BASE = 5
+_DISC_SHIFT = _RANK_BASE ** 13
+#array versions of the vp_analyzer.eval_hand tables, sorted by key
+_CARD_PRIMES = np.array(CARD_PRIMES, dtype = np.int64)
+_RANK_CAT_KEYS = np.array(sorted(RANK_PATTERN_CATEGORY), dtype = np.int64)
+_RANK_CATS = np.array([RANK_PATTERN_CATEGORY[key] for key in _RANK_CAT_KEYS.tolist()],
+                      dtype = np.uint8)
+_FLUSH_CAT_KEYS = np.array(sorted(FLUSH_PATTERN_CATEGORY), dtype = np.int64)
+_FLUSH_CATS = np.array([FLUSH_PATTERN_CATEGORY[key] for key in _FLUSH_CAT_KEYS.tolist()],
+                       dtype = np.uint8)
+
+
+def analyze_batch(hands, payouts = None, chunksize = 1 << 15):
+    """
+    Count the ways of making each winning hand in payouts, and the expected
+    value, of each of the 32 hold/discard strategies of every hand.
+
+    INPUT:
+    hands: (int array like) shape (N, 5) card ids, in the card order hold
+        columns refer to (see HOLDS)
+    payouts: (dict) payout table, None for vp_analyzer.DEFAULT_PAYOUTS
+    chunksize: (int) number of hands processed at a time, bounds memory use
+
+    OUTPUT: (tuple) dict of win: (N, 32) int64 array of counts, for each win in
+        payouts, and (N, 32) float64 array of expected values. These match
+        HandAnalyzer(hand, payouts).analyze() for the same hold strategies.
+    """
+    if payouts is None:
+        payouts = DEFAULT_PAYOUTS
+    hands = np.asarray(hands, dtype = np.int64).reshape(-1, 5)
+    #Bonus four_kind ranks, as in HandAnalyzer
+    specials = ''.join([win[len('four_kind'):] for win in payouts
+                        if win.startswith('four_kind') and win != 'four_kind'])
+    rank_wins = [win for win in payouts if win not in SUITED_WINS]
+
+    counts = {win: np.zeros((len(hands), len(HOLDS)), dtype = np.int64)
+              for win in payouts}
+    for start in range(0, len(hands), chunksize):
+        chunk = hands[start:start + chunksize]
+        rank_cnts = _rank_counts(chunk, rank_wins, specials)
+        suit_cnts = _suit_counts(chunk)
+        for wind, win in enumerate(rank_wins):
+            counts[win][start:start + chunksize] = rank_cnts[:, :, wind]
+        for win in payouts:
+            if win in suit_cnts:
+                counts[win][start:start + chunksize] = suit_cnts[win]
+        if 'straight' in payouts:
+            #rank counts of straights include the straight/royal flushes
+            counts['straight'][start:start + chunksize] -= (suit_cnts['royal_flush'] +
+                                                            suit_cnts['straight_flush'])
+
+    #same operation order as HandAnalyzer.analyze
+    denoms = COMB[47, 5 - NUM_HELD]
+    evs = np.zeros((len(hands), len(HOLDS)))
+    for win, pay in payouts.items():
+        evs += pay * counts[win] / denoms
+    return counts, evs
+
+
+def best_holds(evs):
+    """
+    Column index of the best hold/discard strategy of each row of an (N, 32)
+    expected value array, with HandAnalyzer.best_disc's tie break (prefer more
+    discards, then the first in HOLDS order).
+    """
+    evs = np.asarray(evs)
+    is_best = evs == evs.max(axis = 1, keepdims = True)
+    pref = (5 - NUM_HELD) * len(HOLDS) + np.arange(len(HOLDS))[::-1]
+    return np.where(is_best, pref, -1).argmax(axis = 1)
+
+
+def eval_hands(hands):
+    """
+    Vectorized vp_analyzer.eval_hand, (N,) uint8 array of the category of each
+    final hand (index into vp_analyzer.HAND_CATEGORIES) of an (N, 5) array of
+    card ids.
+    """
+    hands = np.asarray(hands, dtype = np.int64).reshape(-1, 5)
+    keys = _CARD_PRIMES[hands].prod(axis = 1)
+    suits = hands % len(SUITS)
+    flush = (suits == suits[:, :1]).all(axis = 1)
+    cats = _RANK_CATS[np.searchsorted(_RANK_CAT_KEYS, keys)]
+    cats[flush] = _FLUSH_CATS[np.searchsorted(_FLUSH_CAT_KEYS, keys[flush])]
+    return cats
+
+
+def pay_hands(hands, payouts = None):
+    """
+    Vectorized HandAnalyzer.pay_current_hand, the payout of each final hand of
+    an (N, 5) array of card ids.
+    """
+    if payouts is None:
+        payouts = DEFAULT_PAYOUTS
+    return np.array(category_pays(payouts))[eval_hands(hands)]
+
+
+def category_wins(wins, specials = ''):
+    """
+    (len(HAND_CATEGORIES), len(wins)) 0/1 int64 matrix, column w marks the
+    categories DiscardValue.count_wins(wins, specials) counts as wins[w], so
+    counts of final hands by category (e.g. draw_enum.enum_counts(hand)) @
+    category_wins(wins) are the counts of wins.
+    """
+    matrix = np.zeros((len(HAND_CATEGORIES), len(wins)), dtype = np.int64)
+    for wind, win in enumerate(wins):
+        if win == 'four_kind':
+            ranks = [r for r in RANKS if r not in specials]
+        elif win.startswith('four_kind') and set(win[len('four_kind'):]) <= set(RANKS):
+            ranks = win[len('four_kind'):]
+        elif win in HAND_CATEGORIES:
+            matrix[HAND_CATEGORIES.index(win), wind] = 1
+            continue
+        else:
+            raise Exception('Unknown winning hand: {}'.format(win))
+        for r in ranks:
+            matrix[HAND_CATEGORIES.index('four_kind' + r), wind] = 1
+    return matrix
+
+
+def rank_signatures(hands):
+    """
+    (N, 32) int64 array of rank signature codes: the count of each rank held
+    (base 5 digits) times 5**13, plus the count of each rank discarded.
+    """
+    ranks = np.asarray(hands, dtype = np.int64) // len(SUITS)
+    rank_pows = np.power(_RANK_BASE, ranks, dtype = np.int64)
+    held_code = rank_pows @ HOLDS.T.astype(np.int64)
+    disc_code = rank_pows @ (~HOLDS).T.astype(np.int64)
+    return held_code * _DISC_SHIFT + disc_code
+
+
+def _rank_counts(hands, rank_wins, specials):
+    """
+    Helper for analyze_batch, (N, 32, len(rank_wins)) counts of the wins that
+    depend only on ranks (straight including straight and royal flushes).
+    Counted with DiscardValue (and its rank_cache) for one (hand, hold) per
+    distinct rank signature.
+    """
+    sigs = rank_signatures(hands).ravel()
+    _, first, inverse = np.unique(sigs, return_index = True, return_inverse = True)
+    hands_l = hands.tolist()
+    sig_cnts = np.zeros((len(first), len(rank_wins)), dtype = np.int64)
+    for sind, ind in enumerate(first.tolist()):
+        hand = hands_l[ind // len(HOLDS)]
+        held_inds, disc_inds = _HOLD_INDS[ind % len(HOLDS)]
+        deck_state = DiscardValue(held_ids = [hand[i] for i in held_inds],
+                                  disc_ids = [hand[i] for i in disc_inds])
+        wins_d = deck_state.count_wins(wins = rank_wins, specials = specials)
+        if 'straight' in wins_d:
+            #straights of any suits, the flushes are taken out per hand
+            wins_d['straight'] += deck_state.royal_flush() + deck_state.straight_flush()
+        sig_cnts[sind] = [wins_d[win] for win in rank_wins]
+    return sig_cnts[inverse.ravel()].reshape(len(hands), len(HOLDS), len(rank_wins))
+
+
+def _suit_counts(hands):
+    """
+    Helper for analyze_batch, dict of (N, 32) counts of royal_flush,
+    straight_flush and flush, from masks of the held and discarded cards.
+    """
+    bits = np.left_shift(np.int64(1), hands)
+    held = bits @ HOLDS.T.astype(np.int64)
+    disc = bits @ (~HOLDS).T.astype(np.int64)
+
+    def cnt_flushes(masks):
+        #all held cards in the mask's cards, none of them discarded
+        cnt = np.zeros(held.shape, dtype = np.int64)
+        for mask in masks:
+            cnt += ((held & ~mask) == 0) & ((disc & mask) == 0)
+        return cnt
+
+    royal = cnt_flushes(ROYAL_MASKS)
+    strt_flush = cnt_flushes([mask for suit_masks in STRAIGHT_FLUSH_MASKS
+                              for mask in suit_masks])
+
+    #cards of each suit in the hand, i.e. undrawable cards of that suit
+    suit_cnts = np.stack([(hands % len(SUITS) == s).sum(axis = 1)
+                          for s in range(len(SUITS))], axis = 1)
+    flush = np.zeros(held.shape, dtype = np.int64)
+    for s, suit_mask in enumerate(SUIT_MASKS):
+        all_suit = (held & ~suit_mask) == 0
+        flush += all_suit * COMB[13 - suit_cnts[:, s:s+1], 5 - NUM_HELD]
+    flush -= royal + strt_flush
+
+    return {'royal_flush': royal, 'straight_flush': strt_flush, 'flush': flush}
@@ -0,0 +1,175 @@
+"""
+Brute force counterpart of vp_analyzer.DiscardValue: count winning hands by
+enumerating every draw, and check the closed-form counts against it.
+
+Every final hand F (one of the 2,598,960 five card hands) is the result of
+exactly one hold/discard strategy of a dealt hand: hold the dealt cards in F,
+draw the rest of F. So one pass over all final hands, each scored with the
+vp_analyzer.eval_hand tables, counts every category for all 32 strategies at
+once. Final hands sharing no card with the dealt hand all belong to the
+discard everything strategy, and are counted as the total minus the others.
+
+Hold columns are in the order of batch_analyzer.HOLDS (HandAnalyzer.analyze's).
+
+Usage, check count_wins for all canonical hands (see
+all_hands_analysis.canonical_hands_gen):
+python draw_enum.py --paytable aces_and_eights --procs 8
+"""
+import argparse
+from itertools import chain, combinations
+import multiprocessing
+import time
+import numpy as np
+from all_hands_analysis import canonical_hands_gen
+from batch_analyzer import HOLDS, category_wins, eval_hands
+from strategy_table import NUM_HANDS, hand_ids
+from vp_analyzer import (DEFAULT_PAYOUTS, DiscardValue, HAND_CATEGORIES, ID_CARDS,
+                         PAYTABLES)
+
+
+#filled in by _tables()
+_TABLES = {}
+
+
+def _tables():
+    """
+    Helper, build (once per process) the category of every final hand, the
+    total count of each category, and for each card id the indices of the
+    final hands containing it.
+    """
+    if not _TABLES:
+        all_hands = np.fromiter(chain.from_iterable(combinations(range(52), 5)),
+                                dtype = np.uint8, count = NUM_HANDS*5).reshape(-1, 5)
+        cats = eval_hands(all_hands).astype(np.intp)
+        #hand indices grouped by card: each card is in comb(51, 4) hands
+        by_card = np.argsort(all_hands.ravel(), kind = 'stable') // 5
+        _TABLES['cats'] = cats
+        _TABLES['total'] = np.bincount(cats, minlength = len(HAND_CATEGORIES))
+        _TABLES['card_hands'] = np.split(by_card.astype(np.int32), 52)
+        _TABLES['hold_code'] = np.zeros(NUM_HANDS, dtype = np.uint8)
+    return _TABLES
+
+
+def enum_counts(hand):
+    """
+    Count the final hands of each category for each hold/discard strategy.
+
+    INPUT:
+    hand: (str or list of int) 10 char hand string or 5 card ids
+
+    OUTPUT: (32, len(HAND_CATEGORIES)) int64 array, one row per hold column
+    """
+    if isinstance(hand, str):
+        hand = [ID_CARDS.index(hand[ind].upper() + hand[ind+1].lower())
+                for ind in range(0, 10, 2)]
+    tables = _tables()
+    cats, card_hands, hold_code = tables['cats'], tables['card_hands'], tables['hold_code']
+    num_cats = len(HAND_CATEGORIES)
+
+    #bit 4-i set when the final hand has dealt card i, so the hold column is
+    #31 - hold_code (see HOLDS)
+    for ind, cid in enumerate(hand):
+        hold_code[card_hands[cid]] |= 1 << (4 - ind)
+    counts = np.zeros(len(HOLDS)*num_cats, dtype = np.int64)
+    for ind, cid in enumerate(hand):
+        hinds = card_hands[cid]
+        codes = hold_code[hinds]
+        #count each final hand once, with its first dealt card
+        first = codes < (1 << (5 - ind))
+        keys = (31 - codes[first].astype(np.intp)) * num_cats + cats[hinds[first]]
+        counts += np.bincount(keys, minlength = len(counts))
+    for cid in hand:
+        hold_code[card_hands[cid]] = 0
+
+    counts = counts.reshape(len(HOLDS), num_cats)
+    counts[-1] = tables['total'] - counts.sum(axis = 0)
+    return counts
+
+
+def check_hand(handstr, payouts = None):
+    """
+    Compare DiscardValue.count_wins against enum_counts for each hold/discard
+    strategy of handstr, for the wins (and bonus four_kind specials) in
+    payouts, as HandAnalyzer.analyze calls it.
+
+    OUTPUT: (list) of disagreements, tuples of (hand str, hold str, win,
+        count_wins count, enumerated count)
+    """
+    if payouts is None:
+        payouts = DEFAULT_PAYOUTS
+    wins = list(payouts)
+    specials = ''.join([win[len('four_kind'):] for win in wins
+                        if win.startswith('four_kind') and win != 'four_kind'])
+    ids = hand_ids(handstr)
+    enumerated = enum_counts(ids) @ category_wins(wins, specials)
+
+    cards = [ID_CARDS[cid] for cid in ids]
+    diffs = []
+    for hind, hold in enumerate(HOLDS):
+        deck_state = DiscardValue(held_ids = [c for c, held in zip(ids, hold) if held],
+                                  disc_ids = [c for c, held in zip(ids, hold) if not held])
+        wins_d = deck_state.count_wins(wins = wins, specials = specials)
+        for wind, win in enumerate(wins):
+            if wins_d[win] != enumerated[hind, wind]:
+                hold_str = ''.join([card if held else 'XX' for card, held in zip(cards, hold)])
+                diffs.append((handstr, hold_str, win, wins_d[win], int(enumerated[hind, wind])))
+    return diffs
+
+
+def _check_hand_worker(hand_payouts):
+    """Pool worker func for check_counts."""
+    return check_hand(*hand_payouts)
+
+
+def check_counts(hands = None, payouts = None, procs = None, report_every = 1000):
+    """
+    Differential harness, run check_hand for many hands in a process pool.
+
+    INPUT:
+    hands: (iterable of str) hands to check, None for all 134,459 canonical
+        hands (each stands for all of its suit permutations)
+    payouts: (dict) payout table whose wins are checked
+    procs: (int) number of processes, None for all cpus
+    report_every: (int) print progress every this many hands, 0 for never
+
+    OUTPUT: (tuple) number of hands checked, list of disagreements (see
+        check_hand)
+    """
+    if hands is None:
+        hands = (hstr for hstr, _ in canonical_hands_gen())
+    diffs = []
+    num_hands = 0
+    start = time.time()
+    with multiprocessing.Pool(processes = procs) as pool:
+        tasks = ((hstr, payouts) for hstr in hands)
+        for hand_diffs in pool.imap(_check_hand_worker, tasks, chunksize = 16):
+            num_hands += 1
+            diffs.extend(hand_diffs)
+            if report_every and num_hands % report_every == 0:
+                print('{:,} hands, {:,} disagreements, {:.0f}s'.format(
+                      num_hands, len(diffs), time.time() - start))
+    return num_hands, diffs
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Check DiscardValue.count_wins '
+                                     'against exhaustive draw enumeration.')
+    parser.add_argument('--paytable', choices = sorted(PAYTABLES),
+                        default = 'jacks_or_better_96')
+    parser.add_argument('--procs', type = int, default = None)
+    parser.add_argument('--limit', type = int, default = None,
+                        help = 'only check the first LIMIT canonical hands')
+    args = parser.parse_args(argv)
+
+    hands = (hstr for hstr, _ in canonical_hands_gen())
+    if args.limit is not None:
+        hands = (hstr for _, hstr in zip(range(args.limit), hands))
+    num_hands, diffs = check_counts(hands, PAYTABLES[args.paytable], procs = args.procs)
+    for diff in diffs:
+        print('{} {} {}: count_wins {}, enumerated {}'.format(*diff))
+    print('checked {:,} hands, {:,} disagreements'.format(num_hands, len(diffs)))
+    return 1 if diffs else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,228 @@
+"""
+Monte Carlo simulation of video poker sessions, see simulate.
+
+Expected values give the long run return of a payout table, a simulation gives
+the spread of results over sessions of a given number of hands: the
+distribution of the net result, how often hands pay (hit frequency) and the
+largest drop from a session's high point (drawdown).
+
+Hands are played in batches with NumPy. A dealt hand is a uniform random hand
+index (colex rank, see strategy_table.hand_index), its best hold is looked up
+by index in a strategy table (see StrategyTable.lookup_indices, which falls
+back to HandAnalyzer without a table), the discards are replaced by cards
+drawn from the rest of the deck, and the final hands are scored with
+batch_analyzer.eval_hands.
+
+Sessions are simulated in blocks, each with its own random stream spawned from
+one numpy.random.SeedSequence, so a run is reproduced by its seed (and
+batchsize) with any number of processes. Wild card games are not supported.
+
+Usage, 10,000 sessions of 1,000 hands each:
+python simulator.py --table job.vpst --sessions 10000 --hands 1000 --procs 4 --seed 1
+"""
+import argparse
+import multiprocessing
+import time
+import numpy as np
+from batch_analyzer import eval_hands
+from strategy_table import NUM_HANDS, StrategyTable, index_ids_array
+from vp_analyzer import (DEFAULT_PAYOUTS, HAND_CATEGORIES, PAYTABLES, category_pays,
+                         is_deuces_wild, is_joker_poker)
+
+
+#set by _init_worker: the StrategyTable and category_pays array of the run
+_WORKER_STATE = {}
+
+
+def draw_cards(rng, dealt):
+    """
+    Draw 5 cards for each of an (N, 5) array of dealt card ids, from the 47
+    cards not dealt. Card j replaces the dealt card j when it's discarded.
+
+    INPUT:
+    rng: numpy.random.Generator
+    dealt: (int array) shape (N, 5) card ids
+
+    OUTPUT: (N, 5) int64 array of card ids
+    """
+    one = np.uint64(1)
+    #52-bit masks of the cards already out of the deck, redraw any card in them
+    used = np.bitwise_or.reduce(one << dealt.astype(np.uint64), axis = 1)
+    draws = np.empty(dealt.shape, dtype = np.int64)
+    for col in range(5):
+        cards = rng.integers(52, size = len(dealt))
+        redo = np.flatnonzero(used >> cards.astype(np.uint64) & one)
+        while len(redo) > 0:
+            cards[redo] = rng.integers(52, size = len(redo))
+            redo = redo[(used[redo] >> cards[redo].astype(np.uint64) & one) != 0]
+        used |= one << cards.astype(np.uint64)
+        draws[:, col] = cards
+    return draws
+
+
+def play_hands(rng, num_hands, table):
+    """
+    Deal num_hands hands, hold the best discard of each from table and draw.
+
+    INPUT:
+    rng: numpy.random.Generator
+    num_hands: (int)
+    table: strategy_table.StrategyTable
+
+    OUTPUT: (num_hands,) uint8 array of the category of each final hand
+        (index into vp_analyzer.HAND_CATEGORIES)
+    """
+    inds = rng.integers(NUM_HANDS, size = num_hands)
+    dealt = index_ids_array(inds)
+    masks, _ = table.lookup_indices(inds)
+    held = (masks[:, None] >> np.arange(5, dtype = np.uint8) & 1).astype(bool)
+    return eval_hands(np.where(held, dealt, draw_cards(rng, dealt)))
+
+
+def _init_worker(payouts, fname):
+    """Pool initializer (and setup for procs == 1), load the strategy table once."""
+    #fname is already found (or None for live analysis) by simulate
+    _WORKER_STATE['table'] = StrategyTable(payouts = payouts, fname = fname, table_dir = None)
+    _WORKER_STATE['pays'] = np.array(category_pays(payouts), dtype = np.float64)
+
+
+def _simulate_block(block):
+    """
+    Pool worker func, play a (SeedSequence, number of sessions, hands per
+    session, batchsize) block of sessions, batchsize // sessions hands of each
+    at a time.
+
+    OUTPUT: (tuple) net results, max drawdowns and paying hands of each
+        session, and counts of each category of final hand
+    """
+    seed_seq, num_sessions, session_hands, batchsize = block
+    rng = np.random.default_rng(seed_seq)
+    table, pays = _WORKER_STATE['table'], _WORKER_STATE['pays']
+
+    results = np.zeros(num_sessions)
+    highs = np.zeros(num_sessions)
+    max_drawdowns = np.zeros(num_sessions)
+    hits = np.zeros(num_sessions, dtype = np.int64)
+    cat_cnts = np.zeros(len(HAND_CATEGORIES), dtype = np.int64)
+    step = max(1, batchsize // num_sessions)
+    for start in range(0, session_hands, step):
+        num = min(step, session_hands - start)
+        cats = play_hands(rng, num_sessions * num, table).reshape(num_sessions, num)
+        cat_cnts += np.bincount(cats.ravel(), minlength = len(HAND_CATEGORIES))
+        won = pays[cats]
+        hits += (won > 0).sum(axis = 1)
+        #running result and high of each session after each hand, 1 bet a hand
+        path = results[:, None] + np.cumsum(won - 1, axis = 1)
+        path_highs = np.maximum(highs[:, None], np.maximum.accumulate(path, axis = 1))
+        max_drawdowns = np.maximum(max_drawdowns, (path_highs - path).max(axis = 1))
+        results, highs = path[:, -1], path_highs[:, -1]
+    return results, max_drawdowns, hits, cat_cnts
+
+
+def simulate(num_sessions, session_hands, payouts = None, table = None, seed = None,
+             procs = 1, batchsize = 1 << 20):
+    """
+    Simulate sessions of video poker played with the best hold of every hand.
+
+    INPUT:
+    num_sessions: (int) number of sessions
+    session_hands: (int) hands played in each session, at 1 bet each
+    payouts: (dict) payout table, None for the table's (or
+        vp_analyzer.DEFAULT_PAYOUTS without a table)
+    table: (str) strategy table file of the best holds (see
+        strategy_table.write_table), None for one computed with payouts in the
+        working directory (see strategy_table.find_table), or without one to
+        analyze every hand dealt with HandAnalyzer (tens of milliseconds per
+        hand)
+    seed: (int) entropy of the run's SeedSequence, None for a fresh one
+    procs: (int) number of processes, 1 to run in this one
+    batchsize: (int) about how many hands are played at a time. Sessions are
+        simulated in blocks of batchsize // session_hands (at least 1), each
+        with its own random stream.
+
+    OUTPUT: (dict) with keys
+        'results': (num_sessions,) float64 array of the net result of each
+            session, in bets
+        'max_drawdowns': (num_sessions,) float64 array, the largest drop of
+            each session's running result from its high so far (0 at the start)
+        'hits': (num_sessions,) int64 array of the paying hands of each session
+        'categories': dict of the number of final hands of each of
+            vp_analyzer.HAND_CATEGORIES
+        'rtp': total paid over total bet
+        'hit_frequency': share of hands that pay
+        'seed': entropy of the SeedSequence, to reproduce the run
+    """
+    #finds the table, and checks its payouts, before any worker loads it
+    strat = StrategyTable(payouts = payouts, fname = table)
+    payouts, table = strat.payouts, strat.fname
+    if payouts is None:
+        payouts = DEFAULT_PAYOUTS
+    if is_deuces_wild(payouts) or is_joker_poker(payouts):
+        raise Exception('Wild card games are not supported: {}'.format(sorted(payouts)))
+    seed_seq = np.random.SeedSequence(seed)
+    block_sessions = max(1, batchsize // session_hands)
+    num_blocks = -(-num_sessions // block_sessions)
+    blocks = [(child, min(block_sessions, num_sessions - ind * block_sessions),
+               session_hands, batchsize)
+              for ind, child in enumerate(seed_seq.spawn(num_blocks))]
+
+    if procs == 1:
+        _init_worker(payouts, table)
+        block_results = [_simulate_block(block) for block in blocks]
+    else:
+        with multiprocessing.Pool(processes = procs, initializer = _init_worker,
+                                  initargs = (payouts, table)) as pool:
+            block_results = pool.map(_simulate_block, blocks, chunksize = 1)
+
+    results, max_drawdowns, hits, cat_cnts = zip(*block_results)
+    results = np.concatenate(results)
+    hits = np.concatenate(hits)
+    num_hands = num_sessions * session_hands
+    return {'results': results, 'max_drawdowns': np.concatenate(max_drawdowns),
+            'hits': hits,
+            'categories': dict(zip(HAND_CATEGORIES, np.sum(cat_cnts, axis = 0).tolist())),
+            'rtp': float(1 + results.sum() / num_hands),
+            'hit_frequency': float(hits.sum() / num_hands),
+            'seed': seed_seq.entropy}
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Simulate video poker sessions '
+                                     'played with the best hold of every hand.')
+    parser.add_argument('--table', default = None,
+                        help = 'strategy table file (.vpst) of the best holds, '
+                        'default one for the paytable in the working directory, '
+                        'without one every hand is analyzed (slow)')
+    parser.add_argument('--paytable', choices = sorted(PAYTABLES), default = None,
+                        help = "default: the table's")
+    parser.add_argument('--sessions', type = int, default = 10000)
+    parser.add_argument('--hands', type = int, default = 1000,
+                        help = 'hands per session')
+    parser.add_argument('--seed', type = int, default = None)
+    parser.add_argument('--procs', type = int, default = 1)
+    parser.add_argument('--batchsize', type = int, default = 1 << 20)
+    args = parser.parse_args(argv)
+
+    payouts = None if args.paytable is None else PAYTABLES[args.paytable]
+    start = time.time()
+    sim = simulate(args.sessions, args.hands, payouts = payouts, table = args.table,
+                   seed = args.seed, procs = args.procs, batchsize = args.batchsize)
+    secs = time.time() - start
+    num_hands = args.sessions * args.hands
+
+    print('{:,} sessions of {:,} hands, {:.1f}s ({:,.0f} hands/min), seed {}'.format(
+          args.sessions, args.hands, secs, num_hands / secs * 60, sim['seed']))
+    print('return {:.5f}, hit frequency {:.5f}'.format(sim['rtp'], sim['hit_frequency']))
+    pcts = [5, 25, 50, 75, 95]
+    for name, vals in [('net result', sim['results']), ('max drawdown', sim['max_drawdowns'])]:
+        print('{} (bets), percentiles {}: {}'.format(name, pcts, ', '.join(
+              ['{:.0f}'.format(val) for val in np.percentile(vals, pcts)])))
+    print('sessions ahead: {:.2%}'.format((sim['results'] > 0).mean()))
+    for cat, cnt in sim['categories'].items():
+        if cnt:
+            print('{:>15} {:.6f}'.format(cat, cnt / num_hands))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,455 @@
+"""
+Human readable hold strategy lists for a payout table, e.g.
+    Royal flush > 4 to a royal flush > Straight flush > ... > Discard everything
+and a matcher that plays hands by such a list, for strategy cards and devices
+too small for the full analyzer.
+
+Every hold of a hand belongs to a class, named by hold_class from the ranks
+held and whether they're suited (e.g. '4 to a royal flush', 'High pair',
+'KQ unsuited'). A strategy list is classes in order of preference: a hand is
+played by holding the cards of the first class in the list that any of its
+holds belongs to (two holds of the same class go to the one with the higher
+ranks), see StrategyList.match.
+
+generate_strategy orders the classes from the expected values of all 32 holds
+of every hand (see subset_analyzer), check_strategy measures the return lost
+by playing the list instead of the best hold of every hand. Wild card games
+are not supported.
+
+Usage, print the strategy list for a paytable, and its return lost:
+python strategy_list.py --paytable aces_and_eights --out aces8s_strategy.txt
+"""
+import argparse
+import json
+import numpy as np
+from all_hands_analysis import canonical_hands_gen
+from batch_analyzer import HOLDS, NUM_HELD, best_holds
+from strategy_table import hand_ids
+from subset_analyzer import analyze_hands
+from vp_analyzer import CARD_IDS, DEFAULT_PAYOUTS, PAYTABLES, SUITS, card_id
+
+
+#rank chars from the highest, the ranks a pair of pays in pair_jqka, the ranks
+#of a royal flush
+HIGH_FIRST = 'AKQJT98765432'
+PAYING_RANKS = 'AKQJ'
+ROYAL_RANKS = 'AKQJT'
+#a hold's class key: the count of each held rank as a base 5 digit (2 lowest,
+#A highest) times 2, plus 1 if 2 or more cards are held all of one suit. Of two
+#holds of the same class, the one with the larger key has the higher ranks.
+_RANK_DIGITS = {r: 5 ** (len(HIGH_FIRST) - 1 - ind) for ind, r in enumerate(HIGH_FIRST)}
+_CARDS = sorted(CARD_IDS, key = CARD_IDS.get)
+_CARD_KEYS = [2 * _RANK_DIGITS[card[0]] for card in _CARDS]
+#hold masks (bit i: the i-th card is held) as columns of batch_analyzer.HOLDS
+_MASK_COLS = {sum([1 << i for i, held in enumerate(hold) if held]): col
+              for col, hold in enumerate(HOLDS.tolist())}
+#(mask, mask without its lowest card, lowest card, 2 or more cards) of each
+#non-empty hold mask, for StrategyList.match_ids
+_MASK_STEPS = [(mask, mask & (mask - 1), (mask & -mask).bit_length() - 1, mask & (mask - 1) > 0)
+               for mask in range(1, 32)]
+
+
+def hold_class(ranks, suited = False, specials = ''):
+    """
+    Name of the class of a hold.
+
+    INPUT:
+    ranks: (str) rank chars of the held cards, any order, e.g. 'QJ' or 'ATKJQ'
+    suited: (bool) all held cards are of one suit
+    specials: (str) ranks with a bonus four of a kind (e.g. 'A78' for Aces
+        and Eights), pairs and trips of these are named by rank
+
+    OUTPUT: (str) e.g. 'Discard everything', 'High pair', 'Low pair (8) + 1
+        kicker', 'Flush', '4 to a royal flush', '3 to a straight flush (1 high,
+        2 gaps)', '4 to an outside straight (0 high)', 'KQ unsuited', 'Single A'
+    """
+    ranks = sorted(ranks.upper(), key = HIGH_FIRST.index)
+    num_held = len(ranks)
+    suited = suited and num_held > 1
+    if num_held == 0:
+        return 'Discard everything'
+
+    groups = sorted([(ranks.count(r), r) for r in set(ranks)],
+                    key = lambda grp: (-grp[0], HIGH_FIRST.index(grp[1])))
+    if groups[0][0] > 1:
+        return _pair_class(groups, num_held, specials)
+
+    highs = len([r for r in ranks if r in PAYING_RANKS])
+    gaps = _straight_gaps(ranks)
+    if num_held == 5:
+        if gaps is None:
+            return 'Flush' if suited else 'Nothing'
+        elif suited:
+            return 'Royal flush' if set(ranks) == set(ROYAL_RANKS) else 'Straight flush'
+        return 'Straight'
+    elif num_held == 1:
+        return 'Single ' + ranks[0]
+    elif set(ranks) <= set(ROYAL_RANKS):
+        if suited and num_held > 2:
+            return '{} to a royal flush'.format(num_held)
+        elif num_held == 2:
+            return ''.join(ranks) + (' suited' if suited else ' unsuited')
+
+    if suited and gaps is not None:
+        return '{} to a straight flush ({} high, {})'.format(num_held, highs, _gaps_str(gaps))
+    elif suited:
+        return '{} to a flush ({} high)'.format(num_held, highs)
+    elif gaps is not None and num_held == 4:
+        side = 'outside' if gaps == 0 and 'A' not in ranks else 'inside'
+        return '4 to an {} straight ({} high)'.format(side, highs)
+    elif gaps is not None:
+        return '{} to a straight ({} high, {})'.format(num_held, highs, _gaps_str(gaps))
+    return '{} unsuited ({} high)'.format(num_held, highs)
+
+
+def _pair_class(groups, num_held, specials):
+    """Helper for hold_class, name of a hold with a pair or more."""
+    (top_cnt, top_rank), grouped = groups[0], [grp for grp in groups if grp[0] > 1]
+    if top_cnt == 3 and len(grouped) == 2:
+        return 'Full house'
+    elif top_cnt == 4:
+        name = 'Four of a kind'
+    elif top_cnt == 3:
+        name = 'Three of a kind'
+    elif len(grouped) == 2:
+        name = 'Two pair'
+    else:
+        name = 'High pair' if top_rank in PAYING_RANKS else 'Low pair'
+    if len(grouped) == 1 and top_rank in specials:
+        name += ' ({})'.format(top_rank)
+    kickers = num_held - sum([cnt for cnt, _ in grouped])
+    if kickers > 0:
+        name += ' + {} kicker{}'.format(kickers, 's' if kickers > 1 else '')
+    return name
+
+
+def _straight_gaps(ranks):
+    """
+    Helper for hold_class, number of missing ranks between the lowest and
+    highest of distinct ranks that fit in a straight (ace high or low), None
+    if they don't fit in one.
+    """
+    gaps = None
+    for order in ('A' + HIGH_FIRST[::-1][:-1], HIGH_FIRST[::-1]):
+        inds = [order.index(r) for r in ranks]
+        span = max(inds) - min(inds) + 1
+        if span <= 5 and (gaps is None or span - len(ranks) < gaps):
+            gaps = span - len(ranks)
+    return gaps
+
+
+def _gaps_str(gaps):
+    """Helper, e.g. '1 gap', '2 gaps'."""
+    return '{} gap{}'.format(gaps, '' if gaps == 1 else 's')
+
+
+def key_class(key, specials = ''):
+    """hold_class of a hold's class key (see hold_keys)."""
+    ranks, digits = '', key // 2
+    for r in HIGH_FIRST:
+        cnt, digits = divmod(digits, _RANK_DIGITS[r])
+        ranks += r * cnt
+    return hold_class(ranks, suited = bool(key & 1), specials = specials)
+
+
+def hold_keys(hands):
+    """
+    (N, 32) int64 array of the class keys (see _RANK_DIGITS) of the holds of
+    an (N, 5) array of card ids, in the hold column order of
+    batch_analyzer.HOLDS.
+    """
+    hands = np.asarray(hands, dtype = np.int64).reshape(-1, 5)
+    holds = HOLDS.T.astype(np.int64)
+    keys = np.array(_CARD_KEYS, dtype = np.int64)[hands] @ holds
+    suit_cnts = np.stack([(hands % len(SUITS) == s).astype(np.int64) @ holds
+                          for s in range(len(SUITS))])
+    suited = (suit_cnts == NUM_HELD).any(axis = 0) & (NUM_HELD > 1)
+    return keys + suited
+
+
+class StrategyList(object):
+    """
+    A ranked list of hold classes (see hold_class), and the matcher that plays
+    hands by it.
+
+    match classes each hold by its class key (see hold_keys), looked up in a
+    dict of the position in the list of every key seen so far, so a hand takes
+    32 dict lookups once the keys are known.
+
+    INPUT:
+    lines: (list of str) hold classes, the most preferred first. Classes not
+        in the list are below all of those that are.
+    payouts: (dict) payout table the list is for, None for
+        vp_analyzer.DEFAULT_PAYOUTS. Its bonus four_kind ranks name classes.
+
+    OUTPUT: None
+    """
+    def __init__(self, lines, payouts = None):
+        self.lines = list(lines)
+        self.payouts = DEFAULT_PAYOUTS if payouts is None else payouts
+        self.specials = ''.join([win[len('four_kind'):] for win in self.payouts
+                                 if win.startswith('four_kind') and win != 'four_kind'])
+        self.__line_pos = {line: pos for pos, line in enumerate(self.lines)}
+        self.__key_pos = {} #see _key_pos
+
+
+    def __str__(self):
+        return '\n'.join(['{:>3}. {}'.format(pos + 1, line)
+                          for pos, line in enumerate(self.lines)])
+
+
+    def _key_pos(self, key):
+        """Helper, list position of the class of a class key."""
+        pos = self.__key_pos.get(key)
+        if pos is None:
+            pos = self.__line_pos.get(key_class(key, self.specials), len(self.lines))
+            self.__key_pos[key] = pos
+        return pos
+
+
+    def match_ids(self, ids):
+        """
+        Hold the list plays for a hand of 5 card ids, as a column of
+        batch_analyzer.HOLDS.
+        """
+        card_keys = [_CARD_KEYS[c] for c in ids]
+        suit_bits = [1 << (c % len(SUITS)) for c in ids]
+        #class key of each hold mask, from that of the mask without its lowest card
+        keys, suits = [0]*32, [0]*32
+        key_pos = self.__key_pos
+        best_pos, best_key, best_mask = key_pos.get(0), 0, 0
+        if best_pos is None:
+            best_pos = self._key_pos(0)
+        for mask, rest, low, multi in _MASK_STEPS:
+            key = keys[mask] = keys[rest] + card_keys[low]
+            suit = suits[mask] = suits[rest] | suit_bits[low]
+            if multi and not suit & (suit - 1):
+                key += 1
+            pos = key_pos.get(key)
+            if pos is None:
+                pos = self._key_pos(key)
+            if pos < best_pos or (pos == best_pos and key > best_key):
+                best_pos, best_key, best_mask = pos, key, mask
+        return _MASK_COLS[best_mask]
+
+
+    def match(self, handstr):
+        """
+        Hold the list plays for a hand string, as a discard strategy string,
+        e.g. 'QdXXXXXXXX' for 'Qd9c8d5c2c' (see HandAnalyzer.analyze).
+        """
+        ids = [card_id(handstr[ind:ind+2]) for ind in range(0, 10, 2)]
+        return _hold_str([_CARDS[c] for c in ids], self.match_ids(ids))
+
+
+    def save(self, fname):
+        """Write the list as text, one class per line after a payouts header."""
+        with open(fname, 'w') as fout:
+            fout.write('#payouts: ' + json.dumps(self.payouts) + '\n')
+            for line in self.lines:
+                fout.write(line + '\n')
+
+
+    @classmethod
+    def load(cls, fname):
+        """Read a list written by save."""
+        with open(fname) as fin:
+            header = fin.readline()
+            lines = fin.read().splitlines()
+        if not header.startswith('#payouts: '):
+            raise Exception('Not a strategy list file: {}'.format(fname))
+        return cls(lines, payouts = json.loads(header[len('#payouts: '):]))
+
+
+
+def canonical_hands():
+    """
+    (N, 5) card id array of the 134,459 canonical hands (see
+    all_hands_analysis.canonical_hands_gen), and (N,) array of the number of
+    hands each stands for.
+    """
+    hands, weights = [], []
+    for hstr, mult in canonical_hands_gen():
+        hands.append(hand_ids(hstr))
+        weights.append(mult)
+    return np.array(hands, dtype = np.int64), np.array(weights, dtype = np.float64)
+
+
+def _class_entries(hands, specials):
+    """
+    Helper for generate_strategy, the holds a strategy list can play for each
+    hand: the one with the largest class key of each class.
+
+    OUTPUT: (tuple) list of the class names, and one entry per hand and class
+        in the hand, as arrays of the hand row (ascending), the class (index
+        into the names) and the hold column
+    """
+    keys = hold_keys(hands)
+    uniq_keys, key_inds = np.unique(keys, return_inverse = True)
+    names, key_cls = {}, []
+    for key in uniq_keys.tolist():
+        key_cls.append(names.setdefault(key_class(key, specials), len(names)))
+    cls = np.array(key_cls, dtype = np.int64)[key_inds.reshape(keys.shape)]
+
+    #order each row's holds by class, largest key first within a class
+    order = np.argsort((cls << 32) - keys, axis = 1, kind = 'stable')
+    sorted_cls = np.take_along_axis(cls, order, axis = 1)
+    is_first = np.ones(cls.shape, dtype = bool)
+    is_first[:, 1:] = sorted_cls[:, 1:] != sorted_cls[:, :-1]
+    rows, cols = np.nonzero(is_first)
+    return sorted(names, key = names.get), rows, sorted_cls[rows, cols], order[rows, cols]
+
+
+def generate_strategy(payouts = None, hands = None, weights = None, max_passes = 20):
+    """
+    Strategy list (see StrategyList) for a payout table, from the expected
+    values of all holds of all hands.
+
+    The classes are placed greedily: the next one is the class that loses the
+    least return on the hands none of the classes placed so far are in (of
+    those losing the same, the one with the highest mean expected value). The
+    order is then improved by swapping neighbouring classes while that gains
+    return (exactly, from the hands where the upper of the two is played and
+    the lower is in the hand). Classes no hand is played by are left out.
+
+    INPUT:
+    payouts: (dict) payout table, None for vp_analyzer.DEFAULT_PAYOUTS
+    hands: (int array like) shape (N, 5) card ids of the hands to play well,
+        None for the canonical hands (see canonical_hands)
+    weights: (array like) shape (N,) number of hands each row stands for,
+        None for the canonical hands' (or 1 each for given hands)
+    max_passes: (int) most passes of neighbour swaps
+
+    OUTPUT: StrategyList
+    """
+    if hands is None:
+        hands, weights = canonical_hands()
+    hands = np.asarray(hands, dtype = np.int64).reshape(-1, 5)
+    weights = np.ones(len(hands)) if weights is None else np.asarray(weights, dtype = np.float64)
+    strategy = StrategyList([], payouts = payouts)
+    evs = analyze_hands(hands, strategy.payouts)[1]
+    names, rows, ent_cls, cols = _class_entries(hands, strategy.specials)
+    ent_evs = evs[rows, cols]
+    losses = weights[rows] * (evs.max(axis = 1)[rows] - ent_evs)
+
+    order, undecided = [], np.ones(len(hands), dtype = bool)
+    while undecided.any():
+        active = undecided[rows]
+        cls_loss = np.bincount(ent_cls[active], weights = losses[active], minlength = len(names))
+        cls_weight = np.bincount(ent_cls[active], weights = weights[rows[active]],
+                                 minlength = len(names))
+        cls_ev = np.bincount(ent_cls[active], weights = (weights[rows] * ent_evs)[active],
+                             minlength = len(names))
+        #least return lost, then the highest mean expected value
+        cands = np.nonzero(cls_weight)[0]
+        pick = cands[np.lexsort((-cls_ev[cands] / cls_weight[cands], cls_loss[cands]))[0]]
+        order.append(pick)
+        undecided[rows[active & (ent_cls == pick)]] = False
+
+    #class and expected value played for each hand
+    pos = np.full(len(names), len(order))
+    pos[order] = np.arange(len(order))
+    ent_pos = pos[ent_cls]
+    played_pos = np.minimum.reduceat(ent_pos, np.searchsorted(rows, np.arange(len(hands))))
+    is_played = ent_pos == played_pos[rows]
+    played_cls, played_evs = ent_cls[is_played], ent_evs[is_played]
+
+    cls_ents = np.split(np.argsort(ent_cls, kind = 'stable'),
+                        np.cumsum(np.bincount(ent_cls, minlength = len(names)))[:-1])
+    for _ in range(max_passes):
+        swapped = False
+        for ind in range(len(order) - 1):
+            upper, lower = order[ind], order[ind + 1]
+            ents = cls_ents[lower]
+            ents = ents[played_cls[rows[ents]] == upper]
+            hand_rows = rows[ents]
+            gain = (weights[hand_rows] * (ent_evs[ents] - played_evs[hand_rows])).sum()
+            if gain > 1e-9:
+                order[ind], order[ind + 1] = lower, upper
+                played_cls[hand_rows], played_evs[hand_rows] = lower, ent_evs[ents]
+                swapped = True
+        if not swapped:
+            break
+
+    is_used = np.zeros(len(names), dtype = bool)
+    is_used[played_cls] = True
+    return StrategyList([names[c] for c in order if is_used[c]], payouts = strategy.payouts)
+
+
+def check_strategy(strategy, hands = None, weights = None, num_worst = 10):
+    """
+    Return of playing hands by a strategy list (with StrategyList.match_ids),
+    against that of the best hold of every hand. Expected values are those of
+    HandAnalyzer.analyze (see subset_analyzer.analyze_hands).
+
+    INPUT:
+    strategy: StrategyList
+    hands: (int array like) shape (N, 5) card ids, None for the canonical
+        hands (see canonical_hands)
+    weights: (array like) shape (N,) number of hands each row stands for,
+        None for the canonical hands' (or 1 each for given hands)
+    num_worst: (int) number of the hands with the largest loss to list
+
+    OUTPUT: (dict) with keys 'rtp' (mean expected value playing by the list),
+        'optimal_rtp', 'loss' (optimal_rtp - rtp), 'mistakes' (share of the
+        hands the list plays worse than the best hold), 'worst' (list of (hand
+        string, list's hold, best hold, expected value lost) tuples, the
+        largest loss first)
+    """
+    if hands is None:
+        hands, weights = canonical_hands()
+    hands = np.asarray(hands, dtype = np.int64).reshape(-1, 5)
+    weights = np.ones(len(hands)) if weights is None else np.asarray(weights, dtype = np.float64)
+    evs = analyze_hands(hands, strategy.payouts)[1]
+    played = np.array([strategy.match_ids(ids) for ids in hands.tolist()], dtype = np.int64)
+    best = best_holds(evs)
+    rows = np.arange(len(hands))
+    hand_losses = evs[rows, best] - evs[rows, played]
+
+    total = weights.sum()
+    rtp = (weights * evs[rows, played]).sum() / total
+    optimal_rtp = (weights * evs[rows, best]).sum() / total
+    worst = []
+    for row in np.argsort(-hand_losses, kind = 'stable')[:num_worst].tolist():
+        if hand_losses[row] <= 0:
+            break
+        cards = [_CARDS[c] for c in hands[row].tolist()]
+        worst.append((''.join(cards), _hold_str(cards, played[row]),
+                      _hold_str(cards, best[row]), float(hand_losses[row])))
+    return {'rtp': float(rtp), 'optimal_rtp': float(optimal_rtp),
+            'loss': float(optimal_rtp - rtp),
+            'mistakes': float(weights[hand_losses > 0].sum() / total), 'worst': worst}
+
+
+def _hold_str(cards, col):
+    """Helper, discard strategy string of a hold column, e.g. 'QdXXXXXXXX'."""
+    return ''.join([card if held else 'XX' for card, held in zip(cards, HOLDS[col])])
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Print the hold strategy list '
+                                     'for a payout table, and the return it loses.')
+    parser.add_argument('--paytable', choices = sorted(PAYTABLES),
+                        default = 'jacks_or_better_96')
+    parser.add_argument('--out', default = None,
+                        help = 'file to save the list to (see StrategyList.load)')
+    parser.add_argument('--worst', type = int, default = 10,
+                        help = 'number of the costliest hands to print')
+    args = parser.parse_args(argv)
+
+    hands, weights = canonical_hands()
+    strategy = generate_strategy(PAYTABLES[args.paytable], hands = hands, weights = weights)
+    if args.out is not None:
+        strategy.save(args.out)
+    print(strategy)
+    result = check_strategy(strategy, hands = hands, weights = weights, num_worst = args.worst)
+    for hstr, hold, best, loss in result['worst']:
+        print('{}: list holds {}, best is {} ({:.5f} lost)'.format(hstr, hold, best, loss))
+    print('return {:.7f}, optimal {:.7f}, loss {:.7f} ({:.2%} of hands played '
+          'worse)'.format(result['rtp'], result['optimal_rtp'], result['loss'],
+                          result['mistakes']))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,377 @@
+"""
+Compact binary format for a full strategy table, i.e. the best discard and its
+expected value for each of the 2,598,960 five-card hands under one payout table
+(or each of the 2,869,685 hands dealt from the 53 card Joker Poker deck).
+
+Each hand is stored at its colex rank (see hand_index), so a hand's row can be
+found without searching or parsing. The file layout is:
+
+    8 bytes   magic b'VPSTRAT\\x00'
+    4 bytes   little-endian uint32, length of the json header
+    n bytes   json header: name, payouts, num_hands, ev_offset, hold_offset
+    padding   to a multiple of 64 bytes
+    float64   expected value of the best discard, one per hand  (at ev_offset)
+    uint8     5-bit hold mask of the best discard, one per hand (at hold_offset)
+
+Bit i of a hold mask is set when the i-th card of the hand, with cards sorted
+in deck order (the order of all_hands_analysis.all_hands_gen()), is held.
+
+StrategyTable wraps a table file for constant time best-hold lookups.
+"""
+from bisect import bisect_right
+import glob
+import json
+from math import comb
+import os
+import struct
+import numpy as np
+from vp_analyzer import (DEFAULT_PAYOUTS, HandAnalyzer, ID_CARDS, JOKER, JOKER_ID,
+                         is_joker_poker)
+
+
+MAGIC = b'VPSTRAT\x00'
+NUM_HANDS = comb(52, 5)
+#Joker Poker hands, the joker (vp_analyzer.JOKER_ID) is the last card of the
+#deck, so the hands without it keep their colex ranks in range(NUM_HANDS)
+NUM_JOKER_HANDS = comb(53, 5)
+#COLEX[i, c] = comb(c, i+1), the colex rank contribution of card c in position i
+COLEX = np.array([[comb(c, i+1) for c in range(JOKER_ID + 1)] for i in range(5)],
+                 dtype = np.int64)
+#plain python copies for fast scalar lookups
+_COLEX_L = COLEX.tolist()
+_ID_CARDS = ID_CARDS + [JOKER]
+_CARD_IDS_ANYCASE = {r + s: cid for cid, card in enumerate(_ID_CARDS)
+                     for r in (card[0], card[0].lower())
+                     for s in (card[1], card[1].upper())}
+
+
+def hand_ids(handstr):
+    """Sorted list of the card ids of a 10-char hand string, e.g. 'Qd9c8d5c2c'"""
+    return sorted([_CARD_IDS_ANYCASE[handstr[ind:ind+2]] for ind in range(0, 10, 2)])
+
+
+def num_hands(payouts = None):
+    """
+    Number of hands in a full strategy table for payouts: NUM_JOKER_HANDS for
+    Joker Poker (see vp_analyzer.is_joker_poker), else NUM_HANDS.
+    """
+    return NUM_JOKER_HANDS if payouts is not None and is_joker_poker(payouts) else NUM_HANDS
+
+
+def hand_index(handstr):
+    """
+    Colex rank of a hand, an int in range(NUM_HANDS) (range(NUM_JOKER_HANDS)
+    with the joker). For sorted card ids
+    c0 < c1 < ... < c4 this is comb(c0, 1) + comb(c1, 2) + ... + comb(c4, 5).
+    """
+    return ids_index(hand_ids(handstr))
+
+
+def ids_index(ids):
+    """hand_index for a sorted sequence of 5 card ids."""
+    c0, c1, c2, c3, c4 = ids
+    return (_COLEX_L[0][c0] + _COLEX_L[1][c1] + _COLEX_L[2][c2] +
+            _COLEX_L[3][c3] + _COLEX_L[4][c4])
+
+
+def hand_index_array(hands):
+    """
+    Vectorized hand_index for an int array of card ids with shape (N, 5), in
+    any card order. Returns an int64 array of shape (N,).
+    """
+    hands = np.sort(np.asarray(hands), axis = 1)
+    return COLEX[np.arange(5), hands].sum(axis = 1)
+
+
+def index_ids(index):
+    """Inverse of ids_index, return the sorted list of 5 card ids."""
+    ids = [0]*5
+    for i in range(4, -1, -1):
+        #largest card c with comb(c, i+1) <= index
+        c = bisect_right(_COLEX_L[i], index) - 1
+        index -= _COLEX_L[i][c]
+        ids[i] = c
+    return ids
+
+
+def index_ids_array(inds):
+    """
+    Vectorized index_ids for an int array of N colex ranks. Returns an int64
+    array of sorted card ids with shape (N, 5).
+    """
+    inds = np.array(inds, dtype = np.int64).reshape(-1)
+    ids = np.empty((len(inds), 5), dtype = np.int64)
+    for i in range(4, -1, -1):
+        c = np.searchsorted(COLEX[i], inds, side = 'right') - 1
+        inds -= COLEX[i, c]
+        ids[:, i] = c
+    return ids
+
+
+def index_hand(index):
+    """Inverse of hand_index, return the hand string (in deck order)."""
+    return ''.join([_ID_CARDS[c] for c in index_ids(index)])
+
+
+def hold_mask(handstr, hold_str):
+    """
+    Convert a discard strategy string for handstr (e.g. 'QdXX8dXXXX' for hand
+    'Qd9c8d5c2c') to a 5-bit hold mask (see module docstring).
+    """
+    held = set([_CARD_IDS_ANYCASE[hold_str[ind:ind+2]]
+                for ind in range(0, 10, 2) if hold_str[ind:ind+2].upper() != 'XX'])
+    mask = 0
+    for bit, c in enumerate(hand_ids(handstr)):
+        if c in held:
+            mask |= 1 << bit
+    return mask
+
+
+def hold_str_from_mask(handstr, mask):
+    """Inverse of hold_mask, the discard strategy string in handstr's card order."""
+    ids = hand_ids(handstr)
+    held = set([c for bit, c in enumerate(ids) if mask >> bit & 1])
+    hold_str = ''
+    for ind in range(0, 10, 2):
+        card = handstr[ind].upper() + handstr[ind+1].lower()
+        hold_str += card if _CARD_IDS_ANYCASE[card] in held else 'XX'
+    return hold_str
+
+
+def write_table(fname, records, payouts = None, name = None):
+    """
+    Write a strategy table file.
+
+    INPUT:
+    fname: (str) output file name
+    records: (iterable) of (hand str, best discard str, expected value) tuples
+        covering each of the num_hands(payouts) hands once, in any order, e.g.
+        the parsed lines of all_hands_analysis.save_chunks output.
+    payouts: (dict) payout table the records were computed with (None for the
+        vp_analyzer.HandAnalyzer default)
+    name: (str) optional name of the payout table, e.g. '9-6 Jacks or Better'
+
+    OUTPUT: None
+    """
+    table_size = num_hands(payouts)
+    evs = np.full(table_size, np.nan)
+    holds = np.zeros(table_size, dtype = np.uint8)
+    num_records = 0
+    for handstr, hold_str, ev in records:
+        ind = hand_index(handstr)
+        evs[ind] = float(ev)
+        holds[ind] = hold_mask(handstr, hold_str)
+        num_records += 1
+
+    missing = np.isnan(evs).sum()
+    if missing:
+        raise Exception('Strategy table is missing {} hands'.format(missing))
+    if num_records != table_size:
+        exp = 'Expecting each of {} hands once, got {} records'
+        raise Exception(exp.format(table_size, num_records))
+    write_arrays(fname, holds, evs, payouts = payouts, name = name)
+
+
+def write_arrays(fname, holds, evs, payouts = None, name = None):
+    """
+    Write a strategy table file from arrays of hold masks and expected values
+    that are already in colex order (see write_table).
+    """
+    table_size = num_hands(payouts)
+    if len(holds) != table_size or len(evs) != table_size:
+        raise Exception('Expecting {} hands, got {} holds and {} evs'.format(
+                        table_size, len(holds), len(evs)))
+
+    header = {'name': name, 'payouts': payouts, 'num_hands': table_size}
+    #offsets depend on the header length, so iterate until they fit
+    ev_offset = 0
+    while True:
+        header['ev_offset'] = ev_offset
+        header['hold_offset'] = ev_offset + 8 * table_size
+        header_b = json.dumps(header, sort_keys = True).encode()
+        needed = -(-(len(MAGIC) + 4 + len(header_b)) // 64) * 64
+        if needed == ev_offset:
+            break
+        ev_offset = needed
+
+    with open(fname, 'wb') as fout:
+        fout.write(MAGIC + struct.pack('<I', len(header_b)) + header_b)
+        fout.write(b'\x00' * (ev_offset - fout.tell()))
+        fout.write(np.asarray(evs, dtype = '<f8').tobytes())
+        fout.write(np.asarray(holds, dtype = np.uint8).tobytes())
+
+
+def read_header(fname):
+    """Read the json header of a strategy table file as a dict."""
+    with open(fname, 'rb') as fin:
+        if fin.read(len(MAGIC)) != MAGIC:
+            raise Exception('{} is not a strategy table file'.format(fname))
+        header_len, = struct.unpack('<I', fin.read(4))
+        return json.loads(fin.read(header_len).decode())
+
+
+def load_table(fname):
+    """
+    Memory map a strategy table file, nothing is read until it is indexed.
+
+    OUTPUT: (tuple) header dict, uint8 array of hold masks, float64 array of
+        expected values. Both arrays are indexed by hand_index.
+    """
+    header = read_header(fname)
+    evs = np.memmap(fname, dtype = '<f8', mode = 'r',
+                    offset = header['ev_offset'], shape = (header['num_hands'],))
+    holds = np.memmap(fname, dtype = np.uint8, mode = 'r',
+                      offset = header['hold_offset'], shape = (header['num_hands'],))
+    return header, holds, evs
+
+
+def find_table(payouts = None, table_dir = '.'):
+    """
+    Return the name of a strategy table file (*.vpst) in table_dir computed
+    with the given payouts (None for the vp_analyzer.HandAnalyzer default),
+    or None if there isn't one.
+    """
+    payouts = _normalize_payouts(payouts)
+    for fname in sorted(glob.glob(os.path.join(table_dir, '*.vpst'))):
+        try:
+            header = read_header(fname)
+        except Exception:
+            continue
+        if _normalize_payouts(header['payouts']) == payouts:
+            return fname
+    return None
+
+
+def _normalize_payouts(payouts):
+    """Helper, payouts dict with None replaced by the default payout table."""
+    return DEFAULT_PAYOUTS.copy() if payouts is None else dict(payouts)
+
+
+class StrategyTable(object):
+    """
+    Look up the best discard strategy and its expected value for a hand in
+    constant time from a precomputed strategy table file (see write_table).
+    The file is memory mapped on the first lookup, and only the pages that
+    are actually touched are ever read from disk.
+
+    If there is no table for the payout table, every lookup falls back to a
+    live vp_analyzer.HandAnalyzer analysis (tens of milliseconds per hand).
+
+    INPUT:
+    payouts: (dict) Payout table, see vp_analyzer.HandAnalyzer. If fname is
+        given, payouts may be None, and the table's own payouts are used.
+    fname: (str) strategy table file to use.
+    table_dir: (str) if fname is None, directory to search for a table
+        computed with payouts (see find_table), default the working
+        directory. None to always analyze live.
+
+    OUTPUT:
+    None
+    """
+    def __init__(self, payouts = None, fname = None, table_dir = '.'):
+        if fname is not None:
+            header_payouts = read_header(fname)['payouts']
+            if payouts is not None and (_normalize_payouts(payouts) !=
+                                        _normalize_payouts(header_payouts)):
+                exp = 'Strategy table {} was computed with different payouts'
+                raise Exception(exp.format(fname))
+            payouts = header_payouts
+        elif table_dir is not None:
+            fname = find_table(payouts, table_dir)
+
+        self.payouts = payouts
+        self.fname = fname
+        self.__holds = None
+        self.__evs = None
+
+    @property
+    def has_table(self):
+        """True if lookups use a precomputed table, False for live analysis."""
+        return self.fname is not None
+
+    def _arrays(self):
+        """Helper, memory map the table on first use."""
+        if self.__holds is None:
+            _, self.__holds, self.__evs = load_table(self.fname)
+            #memoryviews index to python ints/floats ~10x faster than memmaps
+            #(the 'd' cast assumes a little-endian machine, like the file)
+            self.__holds_mv = memoryview(self.__holds).cast('B')
+            self.__evs_mv = memoryview(self.__evs).cast('B').cast('d')
+        return self.__holds, self.__evs
+
+    def lookup(self, handstr):
+        """
+        Best discard for a 10-char hand string. Returns the same tuple as
+        HandAnalyzer(handstr).analyze(return_full_analysis = False,
+        return_bestdisc_cnts = False), e.g. ('QdXXXXXXXX', 0.474...)
+        """
+        if not self.has_table:
+            return self._live(handstr)
+        self._arrays()
+        ind = hand_index(handstr)
+        return hold_str_from_mask(handstr, self.__holds_mv[ind]), self.__evs_mv[ind]
+
+    def lookup_ids(self, ids):
+        """
+        Fastest scalar lookup, for a sorted sequence of 5 card ids (see
+        vp_analyzer.CARD_IDS). Returns the 5-bit hold mask (bit i for ids[i]) and the
+        expected value.
+        """
+        if not self.has_table:
+            hstr = ''.join([_ID_CARDS[c] for c in ids])
+            hold_str, ev = self._live(hstr)
+            return hold_mask(hstr, hold_str), ev
+        if self.__holds is None:
+            self._arrays()
+        ind = ids_index(ids)
+        return self.__holds_mv[ind], self.__evs_mv[ind]
+
+    def lookup_many(self, hands):
+        """
+        Vectorized lookup for an int array of card ids with shape (N, 5).
+
+        OUTPUT: (tuple) uint8 array of hold masks, where bit j is set when the
+            card in column j of hands is held, and a float64 array of expected
+            values, both of shape (N,).
+        """
+        hands = np.asarray(hands)
+        if not self.has_table:
+            holds_evs = [self.lookup_ids(sorted(hand)) for hand in hands.tolist()]
+            sorted_masks = np.array([m for m, _ in holds_evs], dtype = np.uint8)
+            evs = np.array([ev for _, ev in holds_evs], dtype = np.float64)
+        else:
+            holds, table_evs = self._arrays()
+            inds = hand_index_array(hands)
+            sorted_masks = holds[inds]
+            evs = np.asarray(table_evs[inds])
+
+        #bit i of a table mask is the i-th smallest card, move it to its column
+        order = np.argsort(hands, axis = 1)
+        masks = np.zeros(len(hands), dtype = np.uint8)
+        for bit in range(5):
+            held = (sorted_masks >> bit) & 1
+            masks |= (held << order[:, bit]).astype(np.uint8)
+        return masks, evs
+
+    def lookup_indices(self, inds):
+        """
+        Vectorized lookup for an int array of N hand indices (colex ranks, see
+        hand_index).
+
+        OUTPUT: (tuple) uint8 array of hold masks, bit i for the i-th card of
+            the hand in deck order (see index_ids_array), and a float64 array
+            of expected values, both of shape (N,).
+        """
+        inds = np.asarray(inds, dtype = np.int64)
+        if not self.has_table:
+            holds_evs = [self.lookup_ids(index_ids(ind)) for ind in inds.tolist()]
+            return (np.array([m for m, _ in holds_evs], dtype = np.uint8),
+                    np.array([ev for _, ev in holds_evs], dtype = np.float64))
+        holds, evs = self._arrays()
+        return holds[inds], np.asarray(evs[inds])
+
+    def _live(self, handstr):
+        """Helper, fall back to analyzing the hand with HandAnalyzer."""
+        hand = HandAnalyzer(handstr, payouts = self.payouts)
+        return hand.analyze(return_full_analysis = False,
+                            return_bestdisc_cnts = False)
@@ -0,0 +1,139 @@
+"""
+Analysis of all hands at once by inclusion-exclusion over held subsets, see
+analyze_hands.
+
+Drawing to a hold S of a dealt hand H (S is a subset of H) makes exactly the
+final hands F with F & H == S: F has every held card, no discarded card. With
+N(T) the counts by category of the final hands containing a set of cards T,
+the counts of the hold are
+    sum over S <= T <= H of (-1)**len(T - S) * N(T)
+so one pass over the 2,598,960 final hands, adding each one's category to
+N(T) of each of its 32 subsets T, gives the counts of every hold of every
+hand. N(T) is kept in one table per subset size (0 to 4 cards, indexed by
+colex rank, see strategy_table.COLEX), the 5 card N(H) is just the category
+of H itself.
+
+Hold columns are in the order of batch_analyzer.HOLDS (HandAnalyzer.analyze's),
+the counts and expected values are those of batch_analyzer.analyze_batch (and
+HandAnalyzer.analyze). Wild card games are not supported.
+"""
+from itertools import chain, combinations
+import numpy as np
+from batch_analyzer import COMB, HOLDS, NUM_HELD, category_wins, eval_hands
+from strategy_table import COLEX, NUM_HANDS
+from vp_analyzer import (DEFAULT_PAYOUTS, HAND_CATEGORIES, comb, is_deuces_wild,
+                         is_joker_poker)
+
+
+#filled in by subset_tables() and _win_tables()
+_TABLES = {}
+#the subsets T of a sorted hand: positions (into the sorted card ids) of each of
+#the 32 5-bit masks, bit i for the i-th lowest card
+_MASK_POS = [[pos for pos in range(5) if mask >> pos & 1] for mask in range(1 << 5)]
+
+
+def subset_tables():
+    """
+    Counts by category (index into vp_analyzer.HAND_CATEGORIES) of the final
+    hands containing each set of 0-4 cards, built once per process.
+
+    OUTPUT: (list) of 5 int64 arrays, element k has shape
+        (comb(52, k), len(HAND_CATEGORIES)), rows indexed by the colex rank of
+        the k sorted card ids
+    """
+    if 'subsets' not in _TABLES:
+        all_hands = np.fromiter(chain.from_iterable(combinations(range(52), 5)),
+                                dtype = np.uint8, count = NUM_HANDS*5).reshape(-1, 5)
+        cats = eval_hands(all_hands).astype(np.int64)
+        num_cats = len(HAND_CATEGORIES)
+        tables = [np.bincount(cats, minlength = num_cats).reshape(1, num_cats)]
+        for size in range(1, 5):
+            cnts = np.zeros(comb(52, size) * num_cats, dtype = np.int64)
+            for pos in combinations(range(5), size):
+                #rows of all_hands are sorted, so are the cards at pos
+                ranks = sum([COLEX[i][all_hands[:, p]] for i, p in enumerate(pos)])
+                cnts += np.bincount(ranks * num_cats + cats, minlength = len(cnts))
+            tables.append(cnts.reshape(-1, num_cats))
+        _TABLES['subsets'] = tables
+    return _TABLES['subsets']
+
+
+def _win_tables(wins, specials):
+    """
+    Helper, subset_tables summed into counts of wins (see
+    batch_analyzer.category_wins), kept for the last wins and specials.
+    """
+    key = (tuple(wins), specials)
+    if _TABLES.get('wins_key') != key:
+        matrix = category_wins(wins, specials)
+        _TABLES['wins'] = ([table @ matrix for table in subset_tables()], matrix)
+        _TABLES['wins_key'] = key
+    return _TABLES['wins']
+
+
+def analyze_hands(hands, payouts = None, chunksize = 1 << 14):
+    """
+    Count the ways of making each winning hand in payouts, and the expected
+    value, of each of the 32 hold/discard strategies of every hand.
+
+    INPUT:
+    hands: (int array like) shape (N, 5) card ids, in the card order hold
+        columns refer to (see batch_analyzer.HOLDS)
+    payouts: (dict) payout table, None for vp_analyzer.DEFAULT_PAYOUTS
+    chunksize: (int) number of hands processed at a time, bounds memory use
+
+    OUTPUT: (tuple) dict of win: (N, 32) int64 array of counts, for each win in
+        payouts, and (N, 32) float64 array of expected values, as
+        batch_analyzer.analyze_batch
+    """
+    if payouts is None:
+        payouts = DEFAULT_PAYOUTS
+    if is_deuces_wild(payouts) or is_joker_poker(payouts):
+        raise Exception('Wild card games are not supported: {}'.format(sorted(payouts)))
+    hands = np.asarray(hands, dtype = np.int64).reshape(-1, 5)
+    #Bonus four_kind ranks, as in HandAnalyzer
+    specials = ''.join([win[len('four_kind'):] for win in payouts
+                        if win.startswith('four_kind') and win != 'four_kind'])
+    wins = list(payouts)
+    tables, matrix = _win_tables(wins, specials)
+
+    counts = np.zeros((len(hands), len(HOLDS), len(wins)), dtype = np.int64)
+    for start in range(0, len(hands), chunksize):
+        chunk = hands[start:start + chunksize]
+        counts[start:start + chunksize] = _hold_counts(chunk, tables, matrix)
+
+    #same operation order as HandAnalyzer.analyze
+    denoms = COMB[47, 5 - NUM_HELD]
+    evs = np.zeros((len(hands), len(HOLDS)))
+    for wind, win in enumerate(wins):
+        evs += payouts[win] * counts[:, :, wind] / denoms
+    return {win: counts[:, :, wind] for wind, win in enumerate(wins)}, evs
+
+
+def _hold_counts(hands, tables, matrix):
+    """
+    Helper for analyze_hands, (N, 32, len(wins)) counts of the wins of each
+    hold of each hand, from the win tables and matrix of _win_tables.
+    """
+    order = np.argsort(hands, axis = 1)
+    cards = np.take_along_axis(hands, order, axis = 1)
+
+    #counts of the final hands containing each subset of the sorted cards
+    sub_cnts = np.empty((len(hands), 1 << 5, matrix.shape[1]), dtype = np.int64)
+    for mask, pos in enumerate(_MASK_POS):
+        if len(pos) == 5:
+            sub_cnts[:, mask] = matrix[eval_hands(cards)]
+        else:
+            ranks = sum([COLEX[i][cards[:, p]] for i, p in enumerate(pos)], np.int64(0))
+            sub_cnts[:, mask] = tables[len(pos)][ranks]
+
+    #take out the final hands with discarded cards, a bit at a time: viewed
+    #with the bit as axis 2, subtract the masks with it from those without
+    for bit in range(5):
+        by_bit = sub_cnts.reshape(len(hands), 1 << (4 - bit), 2, 1 << bit, -1)
+        by_bit[:, :, 0] -= by_bit[:, :, 1]
+
+    #hold columns hold the cards in hands' order, as masks of sorted positions
+    sorted_pos = np.argsort(order, axis = 1)
+    hold_masks = np.left_shift(1, sorted_pos) @ HOLDS.T.astype(np.int64)
+    return np.take_along_axis(sub_cnts, hold_masks[:, :, None], axis = 1)
@@ -0,0 +1,249 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from all_hands_analysis import (analyze_hand, canonicalize, class_members,
+                                class_multiplicity, canonical_hands_gen,
+                                merge_shards, open_chunk, parse_shard,
+                                payout_matrix, read_chunk, remap_hold,
+                                remap_result, save_chunks, sweep_hand,
+                                SWEEP_WINS)
+import strategy_table
+from vp_analyzer import HandAnalyzer, PAYTABLES, WILD_PAYTABLES
+
+
+class Test_all_hands_analysis(unittest.TestCase):
+    def test_canonicalize(self):
+        canon, suit_map = canonicalize('Qd9c8d5c2c')
+        self.assertEqual(canon, '2c5c8d9cQd')
+        self.assertEqual(suit_map, {'c': 'c', 'd': 'd', 'h': 'h', 's': 's'})
+
+        #every suit relabelling of a hand has the same canonical form
+        for hstr in ['Qh9s8h5s2s', 'qs9d8s5d2d', '2h5h8c9hQc']:
+            self.assertEqual(canonicalize(hstr)[0], canon)
+
+        self.assertNotEqual(canonicalize('Qd9c8c5c2c')[0], canon)
+
+    def test_class_multiplicity(self):
+        self.assertEqual(class_multiplicity('AcKcQcJcTc'), 4)
+        self.assertEqual(class_multiplicity('AcAdAhAsKc'), 4)
+        self.assertEqual(class_multiplicity('AcAdKcKd2c'), 12)
+        self.assertEqual(class_multiplicity('Qd9c8d5c2c'), 12)
+        self.assertEqual(class_multiplicity('Ac3d5h7s9c'), 24)
+
+    def test_canonical_hands_gen(self):
+        classes = list(canonical_hands_gen())
+        self.assertEqual(len(classes), 134459)
+        self.assertEqual(sum([mult for _, mult in classes]), 2598960)
+
+    def test_remap(self):
+        self.assertEqual(remap_hold('XXXXXX8dQd', 'Qc9d8c5d2d',
+                                    canonicalize('Qc9d8c5d2d')[1]),
+                         'QcXX8cXXXX')
+
+        for hstr in ['Qh9s8hAsAh', 'tc9d6h5s2c', 'AhKhQhJh9s']:
+            canon, suit_map = canonicalize(hstr)
+            direct = analyze_hand(hstr, return_bestdisc_cnts = False)
+            remapped = remap_result(analyze_hand(canon, return_bestdisc_cnts = False),
+                                    hstr, suit_map)
+            self.assertEqual(remapped, direct)
+
+            direct_d = analyze_hand(hstr)
+            remapped_d = remap_result(analyze_hand(canon), hstr, suit_map)
+            self.assertEqual(remapped_d, direct_d)
+
+    def test_save_chunks_resume(self):
+        hands = ['Qd9c8d5c2c', 'ahjcts7s4h', 'ts9c8d5c2h', 'acad8h8s2c', 'qcjckdtdth']
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        base = os.path.join(tmpdir, 'hands_')
+
+        summary = save_chunks(hands, base, chunksize = 2)
+        with open(base + 'manifest.json') as fin:
+            manifest = json.load(fin)
+        self.assertEqual(sorted(manifest['chunks']), ['0', '2', '4'])
+
+        with open(base + 'metrics.jsonl') as fin:
+            records = [json.loads(line) for line in fin]
+        self.assertEqual([rec['event'] for rec in records],
+                         ['start', 'chunk', 'chunk', 'chunk', 'summary'])
+        self.assertEqual([rec['num_hands'] for rec in records[1:4]], [2, 2, 1])
+        self.assertEqual(records[-1], json.loads(json.dumps(summary)))
+        self.assertEqual(summary['hands_done'], 5)
+        self.assertEqual(sorted([hstr for _, hstr in summary['slowest']]), sorted(hands))
+        mtimes = {ind: os.path.getmtime(base + ind + '.txt') for ind in '024'}
+
+        #corrupt one chunk, only that one should be redone
+        with open(base + '2.txt', 'w') as fout:
+            fout.write('')
+        save_chunks(hands, base, chunksize = 2)
+        self.assertEqual(os.path.getmtime(base + '0.txt'), mtimes['0'])
+        self.assertEqual(os.path.getmtime(base + '4.txt'), mtimes['4'])
+        with open(base + '2.txt') as fin:
+            self.assertEqual(fin.read().splitlines(),
+                             [analyze_hand(h, return_bestdisc_cnts = False)
+                              for h in hands[2:4]])
+
+        with self.assertRaises(Exception):
+            save_chunks(hands, base, chunksize = 3)
+
+    def test_save_chunks_canonical(self):
+        hands = ['Qd9c8d5c2c', 'Qh9s8h5s2s', 'acad8h8s2c', 'ahas8d8c2h',
+                 'tc9d6h5s2c', 'AhKhQhJh9s', 'qcjckdtdth']
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        base = os.path.join(tmpdir, 'hands_')
+        canon_base = os.path.join(tmpdir, 'canon_hands_')
+
+        save_chunks(hands, base, chunksize = 3, return_bestdisc_cnts = True,
+                    batchsize = 2)
+        save_chunks(hands, canon_base, chunksize = 3, return_bestdisc_cnts = True,
+                    batchsize = 2, canonical = True)
+        for ind in ['0', '3', '6']:
+            with open(base + ind + '.json') as fin:
+                direct = fin.read()
+            with open(canon_base + ind + '.json') as fin:
+                self.assertEqual(fin.read(), direct)
+            chunk_hands = hands[int(ind):int(ind)+3]
+            self.assertEqual(direct, json.dumps([analyze_hand(h) for h in chunk_hands]))
+
+    def test_class_members(self):
+        for hstr in ['2c5c8d9cQd', 'AcKcQcJcTc', 'AcAdKcKd2c', 'Ac3d5h7s9c']:
+            members = list(class_members(hstr))
+            self.assertEqual(len(members), class_multiplicity(hstr))
+            for member, suit_map in members:
+                self.assertEqual(canonicalize(member)[0], canonicalize(hstr)[0])
+                self.assertEqual(remap_hold(hstr, member, suit_map), member)
+
+    def test_shards(self):
+        self.assertEqual(parse_shard('3/8'), (3, 8))
+        for bad in ['8/8', '-1/8', '3', 'a/b']:
+            with self.assertRaises(ValueError):
+                parse_shard(bad)
+
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        base = os.path.join(tmpdir, 'job_')
+        with self.assertRaises(Exception):
+            merge_shards(base, os.path.join(tmpdir, 'job.vpst'))
+
+        #a lone shard of 3 is not enough to merge
+        shard_d = {'index': 1, 'count': 3, 'space': 'hands', 'space_size': 6}
+        save_chunks(['Qd9c8d5c2c', 'ahjcts7s4h'], base + 'shard1of3_',
+                    shard_info = shard_d)
+        with open(base + 'shard1of3_manifest.json') as fin:
+            self.assertEqual(json.load(fin)['shard'], shard_d)
+        with self.assertRaisesRegex(Exception, 'Missing shards'):
+            merge_shards(base, os.path.join(tmpdir, 'job.vpst'))
+
+    def test_payout_matrix(self):
+        names = ['jacks_or_better_96', 'aces_and_eights', 'triple_bonus_plus']
+        pay_matrix = payout_matrix([PAYTABLES[name] for name in names])
+        pays = dict(zip(SWEEP_WINS, pay_matrix.tolist()))
+        self.assertEqual(pays['flush'], [6, 5, 5])
+        self.assertEqual(pays['four_kindA'], [25, 80, 240])
+        self.assertEqual(pays['four_kind3'], [25, 25, 120])
+        self.assertEqual(pays['four_kind7'], [25, 50, 50])
+        self.assertEqual(pays['four_kindK'], [25, 25, 50])
+        with self.assertRaises(Exception):
+            payout_matrix([{'five_kind': 10}])
+
+    def test_sweep_hand(self):
+        names = sorted(PAYTABLES)
+        pay_matrix = payout_matrix([PAYTABLES[name] for name in names])
+        for hstr in ['2c5c8d9cQd', 'AcAdAh9cQh', '2c5s6h9dTc', '7c7d7h7s8s']:
+            masks, evs = sweep_hand(hstr, pay_matrix)
+            for name, mask, ev in zip(names, masks, evs):
+                hold_str, exp_ev = HandAnalyzer(hstr, payouts = PAYTABLES[name]).analyze(
+                    return_full_analysis = False, return_bestdisc_cnts = False)
+                self.assertEqual(mask, strategy_table.hold_mask(hstr, hold_str))
+                self.assertAlmostEqual(ev, exp_ev, places = 12)
+
+    def test_save_chunks_ndjson_compression(self):
+        hands = ['Qd9c8d5c2c', 'ahjcts7s4h', 'ts9c8d5c2h']
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+
+        base = os.path.join(tmpdir, 'counts_')
+        save_chunks(hands, base, chunksize = 2, return_bestdisc_cnts = True,
+                    ndjson = True, compression = 'gz')
+        with open_chunk(base + '0.ndjson.gz') as fin:
+            self.assertEqual([json.loads(line) for line in fin],
+                             [analyze_hand(h) for h in hands[:2]])
+        with open(base + '2.ndjson.gz', 'rb') as fin:
+            self.assertEqual(fin.read(2), b'\x1f\x8b')
+
+        txt_base = os.path.join(tmpdir, 'txt_')
+        save_chunks(hands, txt_base, chunksize = 2, compression = 'bz2')
+        for ind in ['0', '2']:
+            ndjson_records = list(read_chunk(base + ind + '.ndjson.gz'))
+            txt_records = list(read_chunk(txt_base + ind + '.txt.bz2'))
+            self.assertEqual(ndjson_records, txt_records)
+
+        with self.assertRaises(Exception):
+            save_chunks(hands, base, compression = 'zip')
+
+    def test_save_chunks_subset_engine(self):
+        hands = ['Qd9c8d5c2c', 'ahjcts7s4h', 'ts9c8d5c2h', 'AcAdAhAs8s', '7c8c9cTcJc']
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        for payouts in [None, PAYTABLES['aces_and_eights']]:
+            for counts in [False, True]:
+                files = []
+                for engine in ['hand', 'subset']:
+                    base = os.path.join(tmpdir, '{}_{}_'.format(engine, counts))
+                    save_chunks(hands, base, payouts = payouts, chunksize = 2,
+                                return_bestdisc_cnts = counts, engine = engine,
+                                resume = False)
+                    ext = '.json' if counts else '.txt'
+                    files.append([open(base + ind + ext).read() for ind in ['0', '2', '4']])
+                #same files either way
+                self.assertEqual(files[0], files[1])
+
+        with self.assertRaises(Exception):
+            save_chunks(hands, base, engine = 'subset', canonical = True)
+        with self.assertRaises(Exception):
+            save_chunks(hands, base, engine = 'pool')
+
+    def test_joker_canonical(self):
+        payouts = WILD_PAYTABLES['joker_poker']
+        canon, suit_map = canonicalize('JkQh9s8h5s')
+        self.assertEqual(canon, '5c8d9cQdJk')
+        self.assertEqual(class_multiplicity('JkQh9s8h5s'), 12)
+        members = list(class_members(canon))
+        self.assertEqual(len(members), 12)
+        for member, member_map in members:
+            self.assertEqual(member[-2:], 'Jk')
+            self.assertEqual(remap_hold(canon, member, member_map), member)
+
+        #a canonical run over Joker Poker hand indices matches a direct one
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        inds = range(strategy_table.NUM_HANDS - 2, strategy_table.NUM_JOKER_HANDS, 90000)
+        base = os.path.join(tmpdir, 'joker_')
+        save_chunks(inds, base, payouts = payouts, chunksize = 2, canonical = True)
+        expected = [analyze_hand(strategy_table.index_hand(ind), payouts = payouts,
+                                 return_bestdisc_cnts = False) for ind in inds]
+        saved = []
+        for ind in range(0, len(inds), 2):
+            with open(base + str(ind) + '.txt') as fin:
+                saved.extend(fin.read().splitlines())
+        self.assertEqual(saved, expected)
+
+    def test_save_chunks_index_range(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        inds = range(1000000, strategy_table.NUM_HANDS, 300000)
+        hands = [strategy_table.index_hand(ind) for ind in inds]
+
+        base = os.path.join(tmpdir, 'range_')
+        save_chunks(inds, base, chunksize = 2, batchsize = 1)
+        canon_base = os.path.join(tmpdir, 'canon_range_')
+        save_chunks(inds, canon_base, chunksize = 2, canonical = True)
+        for ind in ['0', '2', '4']:
+            expected = [analyze_hand(h, return_bestdisc_cnts = False)
+                        for h in hands[int(ind):int(ind)+2]]
+            for fbase in [base, canon_base]:
+                with open(fbase + ind + '.txt') as fin:
+                    self.assertEqual(fin.read().splitlines(), expected)
@@ -0,0 +1,62 @@
+from itertools import combinations
+import unittest
+import numpy as np
+import batch_analyzer as ba
+from vp_analyzer import CARD_IDS, HAND_CATEGORIES, HandAnalyzer, PAYTABLES, eval_hand
+
+
+class Test_batch_analyzer(unittest.TestCase):
+    def setUp(self):
+        self.hand_strs = ['Qd9c8d5c2c', 'AhJcTs7s4h', 'QdQcQh2s2d', 'AcKcQcJcTc',
+                          '5h4h3h2hAh', 'AcAdAhAs8s', 'Ts9c8d5c2h', '2c2d3h3s4c']
+        self.hands = np.array([[CARD_IDS[hs[ind:ind+2]]
+                                for ind in range(0, 10, 2)]
+                               for hs in self.hand_strs])
+
+    def test_analyze_batch(self):
+        for payouts in PAYTABLES.values():
+            counts, evs = ba.analyze_batch(self.hands, payouts, chunksize = 3)
+            self.assertEqual(evs.shape, (len(self.hands), 32))
+            for n, hs in enumerate(self.hand_strs):
+                hand_a = HandAnalyzer(hs, payouts)
+                results = hand_a.analyze()
+                for j, hold in enumerate(ba.HOLDS):
+                    hold_str = ''.join([card if held else 'XX'
+                                        for card, held in zip(hand_a.hand, hold)])
+                    for win in payouts:
+                        self.assertEqual(counts[win][n, j], results[hold_str][win])
+                    self.assertEqual(evs[n, j], results[hold_str]['expected_val'])
+
+                best = ba.HOLDS[ba.best_holds(evs)[n]]
+                best_str = ''.join([card if held else 'XX'
+                                    for card, held in zip(hand_a.hand, best)])
+                self.assertEqual(best_str, hand_a.best_disc(results)[0])
+
+    def test_eval_hands(self):
+        all_hands = np.array(list(combinations(range(52), 5)))
+        cats = ba.eval_hands(all_hands)
+        freqs = dict(zip(*np.unique(cats, return_counts = True)))
+        for cat, freq in [('pair_jqka', 337920), ('two_pair', 123552),
+                          ('three_kind', 54912), ('straight', 10200),
+                          ('flush', 5108), ('full_house', 3744),
+                          ('four_kindA', 48), ('straight_flush', 36),
+                          ('royal_flush', 4)]:
+            self.assertEqual(freqs[HAND_CATEGORIES.index(cat)], freq)
+
+        for hand in self.hands:
+            self.assertEqual(ba.eval_hands(hand)[0], eval_hand(hand.tolist()))
+        for payouts in PAYTABLES.values():
+            pays = ba.pay_hands(self.hands, payouts)
+            for hs, pay in zip(self.hand_strs, pays):
+                self.assertEqual(pay, HandAnalyzer(hs, payouts).pay_current_hand())
+
+    def test_rank_signatures(self):
+        #same ranks, different suits
+        sigs = ba.rank_signatures([[CARD_IDS[c] for c in ['Qd', '9c', '8d', '5c', '2c']],
+                                   [CARD_IDS[c] for c in ['Qs', '9h', '8h', '5h', '2d']]])
+        self.assertTrue((sigs[0] == sigs[1]).all())
+        self.assertEqual(len(set(sigs[0].tolist())), 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
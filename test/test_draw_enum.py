@@ -0,0 +1,37 @@
+import unittest
+import draw_enum as de
+from vp_analyzer import HAND_CATEGORIES, PAYTABLES
+
+
+class Test_draw_enum(unittest.TestCase):
+    def test_enum_counts(self):
+        counts = de.enum_counts('Qd9c8d5c2c')
+        #draws for holding 0-5 cards
+        self.assertEqual(counts[-1].sum(), 1533939)
+        self.assertEqual(counts[0].sum(), 1)
+        self.assertEqual(counts[0, HAND_CATEGORIES.index('nothing')], 1)
+        #hold Qd: QdXXXXXXXX
+        self.assertEqual(counts[15, HAND_CATEGORIES.index('pair_jqka')], 45456)
+        self.assertEqual(counts[15, HAND_CATEGORIES.index('royal_flush')], 1)
+        self.assertTrue((de.enum_counts([45, 32, 29, 16, 4]) == counts).all())
+
+    def test_category_wins(self):
+        wins = ['four_kind', 'four_kindA8', 'pair_jqka']
+        matrix = de.category_wins(wins, specials = 'A87')
+        self.assertEqual(matrix[:, 0].sum(), 10)
+        self.assertEqual(matrix[HAND_CATEGORIES.index('four_kind8'), 1], 1)
+        self.assertEqual(matrix[:, 2].sum(), 1)
+        with self.assertRaises(Exception):
+            de.category_wins(['five_kind'])
+
+    def test_check_hand(self):
+        #AhKc from 'AcAdAhKcKs' (drawing 3 to two singles with different
+        #numbers of cards left) used to overcount two_pair
+        for hand in ['AcAdAhKcKs', 'AcAdAhAs2c', 'Qd9c8d5c2c', 'ThJhQhKh2c',
+                     '2c3c4c5c6c', '8c8d8h7s7c', 'Ac2d3h4s9c']:
+            for payouts in PAYTABLES.values():
+                self.assertEqual(de.check_hand(hand, payouts), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import simulator as sim
+import strategy_table as st
+from vp_analyzer import WILD_PAYTABLES
+
+
+class Test_simulator(unittest.TestCase):
+    def setUp(self):
+        #fake table holding every hand pat
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.fname = os.path.join(self.tmpdir, 'pat.vpst')
+        st.write_arrays(self.fname, np.full(st.NUM_HANDS, 0b11111, dtype = np.uint8),
+                        np.zeros(st.NUM_HANDS))
+
+    def test_draw_cards(self):
+        rng = np.random.default_rng(0)
+        dealt = st.index_ids_array(rng.integers(st.NUM_HANDS, size = 10000))
+        draws = sim.draw_cards(rng, dealt)
+        cards = np.sort(np.hstack([dealt, draws]), axis = 1)
+        self.assertTrue((cards[:, 1:] != cards[:, :-1]).all())
+        self.assertTrue(((0 <= draws) & (draws < 52)).all())
+
+    def test_simulate(self):
+        result = sim.simulate(200, 500, table = self.fname, seed = 3, batchsize = 1 << 14)
+        self.assertEqual(result['results'].shape, (200,))
+        self.assertEqual(sum(result['categories'].values()), 200 * 500)
+        #pat hands: 1,302,540 of 2,598,960 are nothing
+        self.assertAlmostEqual(result['categories']['nothing'] / (200 * 500), 0.50118, delta = 0.01)
+        self.assertEqual(result['categories']['royal_flush'], 0)
+        self.assertAlmostEqual(result['rtp'], 1 + result['results'].sum() / (200 * 500))
+        self.assertTrue((result['hits'] <= 500).all())
+        self.assertTrue((result['max_drawdowns'] >= np.maximum(-result['results'], 0)).all())
+
+        #reproducible with any number of processes
+        again = sim.simulate(200, 500, table = self.fname, seed = 3, batchsize = 1 << 14,
+                             procs = 2)
+        for key in ['results', 'max_drawdowns', 'hits']:
+            self.assertTrue((result[key] == again[key]).all())
+        self.assertEqual(result['categories'], again['categories'])
+
+        #no table, every hand analyzed
+        live = sim.simulate(2, 10, seed = 3)
+        self.assertEqual(sum(live['categories'].values()), 20)
+        with self.assertRaises(Exception):
+            sim.simulate(2, 10, payouts = WILD_PAYTABLES['deuces_wild'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import strategy_list as sl
+from vp_analyzer import CARD_IDS, HandAnalyzer, PAYTABLES
+
+
+class Test_strategy_list(unittest.TestCase):
+    def setUp(self):
+        self.lines = ['Royal flush', '4 to a royal flush', 'Two pair', 'High pair',
+                      '3 to a royal flush', 'Low pair', 'Discard everything']
+        rng = np.random.default_rng(24)
+        self.hands = np.array([rng.choice(52, 5, replace = False) for _ in range(400)])
+
+    def test_hold_class(self):
+        self.assertEqual(sl.hold_class(''), 'Discard everything')
+        self.assertEqual(sl.hold_class('TJQKA', suited = True), 'Royal flush')
+        self.assertEqual(sl.hold_class('A2345', suited = True), 'Straight flush')
+        self.assertEqual(sl.hold_class('A2345'), 'Straight')
+        self.assertEqual(sl.hold_class('AKQJ', suited = True), '4 to a royal flush')
+        self.assertEqual(sl.hold_class('QQQ22'), 'Full house')
+        self.assertEqual(sl.hold_class('JJ'), 'High pair')
+        self.assertEqual(sl.hold_class('88K', specials = 'A78'), 'Low pair (8) + 1 kicker')
+        self.assertEqual(sl.hold_class('AAA', specials = 'A78'), 'Three of a kind (A)')
+        self.assertEqual(sl.hold_class('9876'), '4 to an outside straight (0 high)')
+        self.assertEqual(sl.hold_class('JQKA'), '4 to an inside straight (4 high)')
+        self.assertEqual(sl.hold_class('986', suited = True), '3 to a straight flush (0 high, 1 gap)')
+        self.assertEqual(sl.hold_class('K962', suited = True), '4 to a flush (1 high)')
+        self.assertEqual(sl.hold_class('QJ', suited = True), 'QJ suited')
+        self.assertEqual(sl.hold_class('KJ8'), '3 unsuited (2 high)')
+        self.assertEqual(sl.hold_class('A', suited = True), 'Single A')
+
+        #class keys name the same classes
+        keys = sl.hold_keys([CARD_IDS[card] for card in ('Ah', 'Kh', 'Qh', 'Jh', '2c')])
+        self.assertEqual(sl.key_class(keys[0, 1]), '4 to a royal flush')
+        self.assertEqual(sl.key_class(keys[0, 31]), 'Discard everything')
+
+    def test_match(self):
+        strategy = sl.StrategyList(self.lines)
+        self.assertEqual(strategy.match('AhKhQhJh2c'), 'AhKhQhJhXX')
+        self.assertEqual(strategy.match('3c3dAhThJs'), '3c3dXXXXXX')
+        #of two holds of one class, the higher ranks
+        self.assertEqual(strategy.match('2c2d8h8s4c'), '2c2d8h8sXX')
+        self.assertEqual(strategy.match('2c2d8h8sKc'), '2c2d8h8sXX')
+        self.assertEqual(strategy.match('QdQcKcKd4c'), 'QdQcKcKdXX')
+        self.assertEqual(strategy.match('9c8d5c3h2d'), 'XXXXXXXXXX')
+
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fname = os.path.join(tmpdir, 'aces8s.txt')
+        sl.StrategyList(self.lines, payouts = PAYTABLES['aces_and_eights']).save(fname)
+        loaded = sl.StrategyList.load(fname)
+        self.assertEqual(loaded.lines, self.lines)
+        self.assertEqual(loaded.payouts, PAYTABLES['aces_and_eights'])
+        self.assertEqual(sorted(loaded.specials), ['7', '8', 'A'])
+
+    def test_generate_strategy(self):
+        payouts = PAYTABLES['aces_and_eights']
+        strategy = sl.generate_strategy(payouts, hands = self.hands)
+        self.assertEqual(strategy.lines[-1], 'Discard everything')
+        result = sl.check_strategy(strategy, hands = self.hands, num_worst = 3)
+        self.assertTrue(0 <= result['loss'] < 0.01)
+        self.assertAlmostEqual(result['rtp'] + result['loss'], result['optimal_rtp'])
+        for hstr, hold, best, loss in result['worst']:
+            self.assertGreater(loss, 0)
+            self.assertEqual(best, HandAnalyzer(hstr, payouts = payouts).analyze(
+                return_full_analysis = False, return_bestdisc_cnts = False)[0])
+        #the hold played is of the first class in the list of those in the hand
+        specials = strategy.specials
+        for hand, keys in zip(self.hands[:50].tolist(), sl.hold_keys(self.hands[:50])):
+            pos = [strategy.lines.index(sl.key_class(key, specials))
+                   if sl.key_class(key, specials) in strategy.lines else len(strategy.lines)
+                   for key in keys.tolist()]
+            self.assertEqual(pos[strategy.match_ids(hand)], min(pos))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+from itertools import combinations
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import strategy_table as st
+from vp_analyzer import CARD_IDS, WILD_PAYTABLES
+
+
+class Test_strategy_table(unittest.TestCase):
+    def test_hand_index(self):
+        self.assertEqual(st.hand_index('AcAdAhAs2c'), 0)
+        self.assertEqual(st.hand_index('KsKhKdKcQs'), st.NUM_HANDS - 1)
+        self.assertEqual(st.hand_index('qd9c8d5c2c'), st.hand_index('2c5c8d9cQd'))
+
+        all_ids = np.array(list(combinations(range(52), 5)), dtype = np.int64)
+        inds = st.hand_index_array(all_ids[:, ::-1])
+        self.assertTrue((np.sort(inds) == np.arange(st.NUM_HANDS)).all())
+        self.assertTrue((st.index_ids_array(inds) == all_ids).all())
+
+        for hstr in ['AcAdAhAs2c', '2c5c8d9cQd', 'ThJhQhKhKs', '3c7d9hJsKs']:
+            self.assertEqual(st.index_hand(st.hand_index(hstr)), hstr)
+
+        #Joker Poker hands follow the 52 card hands
+        self.assertEqual(st.hand_index('AcAdAhAsJk'), st.NUM_HANDS)
+        self.assertEqual(st.hand_index('jkKsKhKdKc'), st.NUM_JOKER_HANDS - 1)
+        for hstr in ['AcAdAhAsJk', '2c5c8dQdJk', 'KcKdKhKsJk']:
+            self.assertEqual(st.index_hand(st.hand_index(hstr)), hstr)
+        self.assertEqual(st.hold_str_from_mask('JkQd9c8d5c', 0b10001), 'JkXXXXXX5c')
+
+    def test_hold_mask(self):
+        self.assertEqual(st.hold_mask('Qd9c8d5c2c', 'QdXX8dXXXX'), 0b10100)
+        self.assertEqual(st.hold_mask('Qd9c8d5c2c', 'X'*10), 0)
+        self.assertEqual(st.hold_str_from_mask('Qd9c8d5c2c', 0b10100), 'QdXX8dXXXX')
+        self.assertEqual(st.hold_str_from_mask('qd9c8d5c2c', 0b11111), 'Qd9c8d5c2c')
+
+    def test_write_load_table(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fname = os.path.join(tmpdir, 'table.vpst')
+
+        rng = np.random.default_rng(0)
+        holds = rng.integers(0, 32, st.NUM_HANDS).astype(np.uint8)
+        evs = rng.random(st.NUM_HANDS)
+        payouts = {'pair_jqka': 1, 'royal_flush': 800}
+        st.write_arrays(fname, holds, evs, payouts = payouts, name = 'test')
+
+        header, holds_mm, evs_mm = st.load_table(fname)
+        self.assertEqual(header['name'], 'test')
+        self.assertEqual(header['payouts'], payouts)
+        self.assertEqual(header['ev_offset'] % 64, 0)
+        self.assertTrue((holds_mm == holds).all())
+        self.assertTrue((evs_mm == evs).all())
+
+        with self.assertRaises(Exception):
+            st.write_table(fname, [('Qd9c8d5c2c', 'QdXXXXXXXX', 0.47)])
+
+    def test_write_load_joker_table(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fname = os.path.join(tmpdir, 'jp.vpst')
+
+        rng = np.random.default_rng(1)
+        holds = rng.integers(0, 32, st.NUM_JOKER_HANDS).astype(np.uint8)
+        evs = rng.random(st.NUM_JOKER_HANDS)
+        payouts = WILD_PAYTABLES['joker_poker']
+        st.write_arrays(fname, holds, evs, payouts = payouts, name = 'jp')
+
+        header, holds_mm, evs_mm = st.load_table(fname)
+        self.assertEqual(header['num_hands'], st.NUM_JOKER_HANDS)
+        self.assertEqual(header['hold_offset'], header['ev_offset'] + 8 * st.NUM_JOKER_HANDS)
+        self.assertTrue((holds_mm == holds).all())
+        self.assertTrue((evs_mm == evs).all())
+        self.assertEqual(os.path.getsize(fname), header['hold_offset'] + st.NUM_JOKER_HANDS)
+
+    def test_strategy_table_lookup(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+
+        live = st.StrategyTable(table_dir = tmpdir)
+        self.assertFalse(live.has_table)
+        hold_str, ev = live.lookup('qd9c8d5c2c')
+        self.assertEqual(hold_str, 'QdXXXXXXXX')
+        self.assertEqual(round(ev, 5), round(0.4741961707734, 5))
+
+        #fake table with a single known row, and every other hand holding all
+        holds = np.full(st.NUM_HANDS, 0b11111, dtype = np.uint8)
+        evs = np.zeros(st.NUM_HANDS)
+        ind = st.hand_index('qd9c8d5c2c')
+        holds[ind] = st.hold_mask('qd9c8d5c2c', 'QdXXXXXXXX')
+        evs[ind] = ev
+        st.write_arrays(os.path.join(tmpdir, 'job.vpst'), holds, evs)
+
+        self.assertIsNone(st.find_table({'pair_jqka': 2}, tmpdir))
+        table = st.StrategyTable(table_dir = tmpdir)
+        self.assertTrue(table.has_table)
+        #found in the working directory by default, unless table_dir is None
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmpdir)
+        self.assertTrue(st.StrategyTable().has_table)
+        self.assertFalse(st.StrategyTable(table_dir = None).has_table)
+        self.assertEqual(table.lookup('2c5c8d9cQd'), ('XXXXXXXXQd', ev))
+        self.assertEqual(table.lookup_ids(st.hand_ids('Qd9c8d5c2c')), (0b10000, ev))
+
+        hands = np.array([[CARD_IDS[c] for c in ['Qd', '9c', '8d', '5c', '2c']],
+                          [0, 4, 8, 12, 16]])
+        for strat in [table, live]:
+            masks, many_evs = strat.lookup_many(hands[:1])
+            self.assertEqual(masks.tolist(), [0b00001])
+            self.assertEqual(round(many_evs[0], 10), round(ev, 10))
+            masks, many_evs = strat.lookup_indices([ind])
+            self.assertEqual(masks.tolist(), [0b10000])
+            self.assertEqual(round(many_evs[0], 10), round(ev, 10))
+        masks, many_evs = table.lookup_many(hands)
+        self.assertEqual(masks.tolist(), [0b00001, 0b11111])
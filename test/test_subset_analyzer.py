@@ -0,0 +1,43 @@
+from math import comb
+import unittest
+import numpy as np
+import batch_analyzer as ba
+import subset_analyzer as sa
+from vp_analyzer import CARD_IDS, HAND_CATEGORIES, PAYTABLES, WILD_PAYTABLES
+
+
+class Test_subset_analyzer(unittest.TestCase):
+    def setUp(self):
+        self.hand_strs = ['Qd9c8d5c2c', 'AhJcTs7s4h', 'QdQcQh2s2d', 'AcKcQcJcTc',
+                          '5h4h3h2hAh', 'AcAdAhAs8s', 'Ts9c8d5c2h', '2c2d3h3s4c']
+        self.hands = np.array([[CARD_IDS[hs[ind:ind+2]]
+                                for ind in range(0, 10, 2)]
+                               for hs in self.hand_strs])
+
+    def test_subset_tables(self):
+        tables = sa.subset_tables()
+        self.assertEqual(tables[0].sum(), comb(52, 5))
+        self.assertEqual(tables[0][0, HAND_CATEGORIES.index('royal_flush')], 4)
+        for size in range(1, 5):
+            self.assertEqual(tables[size].shape, (comb(52, size), len(HAND_CATEGORIES)))
+            #every set of size cards is in comb(52 - size, 5 - size) final hands
+            self.assertTrue((tables[size].sum(axis = 1) == comb(52 - size, 5 - size)).all())
+
+    def test_analyze_hands(self):
+        for payouts in PAYTABLES.values():
+            counts, evs = sa.analyze_hands(self.hands, payouts, chunksize = 3)
+            batch_counts, batch_evs = ba.analyze_batch(self.hands, payouts)
+            for win in payouts:
+                self.assertTrue((counts[win] == batch_counts[win]).all())
+            self.assertTrue((evs == batch_evs).all())
+
+        #QdXXXXXXXX of 'Qd9c8d5c2c'
+        counts, _ = sa.analyze_hands(self.hands[:1])
+        self.assertEqual(counts['pair_jqka'][0, 15], 45456)
+        self.assertEqual(counts['royal_flush'][0, 15], 1)
+        with self.assertRaises(Exception):
+            sa.analyze_hands(self.hands, WILD_PAYTABLES['deuces_wild'])
+
+
+if __name__ == '__main__':
+    unittest.main()
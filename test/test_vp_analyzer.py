@@ -1,7 +1,12 @@
 from collections import Counter
-from scipy.misc import comb
+from itertools import combinations, product
+import math
 import unittest
-from vp_analyzer import HandAnalyzer, DiscardValue
+from vp_analyzer import (DEFAULT_PAYOUTS, DEUCES_WILD_CATEGORIES, DeckState,
+                         DeucesWildValue, DiscardValue, HandAnalyzer, HoldState,
+                         JOKER_ID, JOKER_POKER_CATEGORIES, JokerPokerValue,
+                         KICKER_WAYS, RankCache, WILD_PAYTABLES, comb,
+                         eval_deuces_hand)
 
 
 class Test_vp_analyzer(unittest.TestCase):
@@ -24,6 +29,75 @@ class Test_vp_analyzer(unittest.TestCase):
 
     #TODO: test count_wins (currently tested indirectly via HandAnalyzer.analyze)
 
+    def test_count_wins_four_kind_ranks(self):
+        ranks = 'A23456789TJQK'
+        for hand, hold in [('qd9c8d5c2c', [True] + [False]*4),
+                           ('ACADAH9CQH', [True]*3 + [False]*2),
+                           ('tc9d6h5s2c', [False]*5)]:
+            dv = DiscardValue(held_d=HandAnalyzer(hand).hold(hold))
+            by_rank = dv.count_wins(wins=['four_kind' + r for r in ranks])
+            self.assertEqual(sum(by_rank.values()), dv.four_kind())
+            self.assertEqual(by_rank['four_kindA'], dv.four_kindA())
+
+    def test_best_hold_search(self):
+        #pruned search agrees with best_disc over the full analysis
+        hands = ['ts9c8d5c2h', 'qd9c8d5c2c', 'acadahasqh', 'ahkhqhjhth', '2c2d2h2s3c',
+                 'tc9d6h5s2c', 'ac2d3h4s5c', '7c7d8h8s7h', 'jcqdkhas2c', '9c9d4h4s4c']
+        for payouts in [None, self.aces8s_d, self.tripbonusplus_d]:
+            for hand in hands:
+                ha = HandAnalyzer(hand, payouts = payouts)
+                plays = ha.analyze()
+                best = HandAnalyzer.best_disc(plays)
+                self.assertEqual(ha.analyze(return_full_analysis = False,
+                                            return_bestdisc_cnts = False), best)
+                self.assertEqual(ha.analyze(return_full_analysis = False),
+                                 {best[0]: plays[best[0]]})
+
+        #without a rank_cache every hold is counted
+        orig_cache, DiscardValue.rank_cache = DiscardValue.rank_cache, None
+        try:
+            self.assertEqual(self.h2.analyze(return_full_analysis = False,
+                                             return_bestdisc_cnts = False),
+                             HandAnalyzer.best_disc(self.h2.analyze()))
+        finally:
+            DiscardValue.rank_cache = orig_cache
+
+    def test_count_matrix(self):
+        wins = ['pair_jqka', 'four_kind']
+        holds, counts, denoms = self.h2.count_matrix(wins)
+        self.assertEqual(len(holds), 32)
+        ind = holds.index('QdXXXXXXXX')
+        self.assertEqual(counts[ind], [45456, 52])
+        self.assertEqual(denoms[ind], comb(47, 4))
+        self.assertEqual(counts[0], [0, 0])
+        self.assertEqual(denoms[0], 1)
+
+
+    def test_rank_cache(self):
+        cache = RankCache(maxsize = 2)
+        orig_cache, DiscardValue.rank_cache = DiscardValue.rank_cache, cache
+        try:
+            wins = list(self.aces8s_d.keys())
+            holdq = DiscardValue(held_d = self.h2.hold([True] + [False]*4))
+            cnts = holdq.count_wins(wins = wins, specials = 'A78')
+            self.assertEqual(cache.stats()['misses'], len(wins) - 3)
+            self.assertEqual(cache.stats()['hits'], 0)
+            #same ranks held/discarded, different suits: QcXXXXXXXX from 'qc9d8c5d2d'
+            holdq_cd = DiscardValue(hand_str = 'qc9d8c5d2d', hold_str = 'qcXXXXXXXX')
+            self.assertEqual(holdq_cd.count_wins(wins = wins, specials = 'A78'), cnts)
+            self.assertEqual(cache.stats()['hits'], len(wins) - 3)
+
+            DiscardValue.rank_cache = None
+            self.assertEqual(holdq.count_wins(wins = wins, specials = 'A78'), cnts)
+            DiscardValue.rank_cache = cache
+            for hold in ([False]*5, [True]*5):
+                DiscardValue(held_d = self.h2.hold(hold)).count_wins()
+            self.assertEqual(cache.stats()['size'], 2)
+            cache.clear()
+            self.assertEqual(cache.stats()['hits'] + cache.stats()['size'], 0)
+        finally:
+            DiscardValue.rank_cache = orig_cache
+
 
     def test_hold(self):
         h1 = HandAnalyzer('ahjcts7s4h')
@@ -32,6 +106,18 @@ class Test_vp_analyzer(unittest.TestCase):
         hold_d = h1.hold([True]*2 + [False]*3)
         self.assertEqual(hold_d, hold_d_h1AJ)
 
+    def test_hold_ids(self):
+        #'Ah' = 0*4+2, 'Jc' = 10*4+0, 'Ts' = 9*4+3, '7s' = 6*4+3, '4h' = 3*4+2
+        held_ids, disc_ids = self.h1.hold_ids([True]*2 + [False]*3)
+        self.assertEqual((held_ids, disc_ids), ([2, 40], [39, 27, 14]))
+        self.assertEqual(self.h1.hand_mask, sum([1 << c for c in [2, 40, 39, 27, 14]]))
+
+        dv = DiscardValue(held_ids = held_ids, disc_ids = disc_ids)
+        dv_d = DiscardValue(held_d = self.h1.hold([True]*2 + [False]*3))
+        self.assertEqual(dv.held_d, dv_d.held_d)
+        self.assertEqual(dv.count_wins(), dv_d.count_wins())
+        self.assertEqual(dv.held_mask, (1 << 2) | (1 << 40))
+
 
     def test_analyze(self):
         #based on results from: https://www.videopokertrainer.org/calculator/
@@ -102,6 +188,12 @@ class Test_vp_analyzer(unittest.TestCase):
             foursA8 = HandAnalyzer(fks, payouts = self.aces8s_d)
             self.assertEqual(foursA8.pay_current_hand(), pay)
 
+        tbp_hands = ['7c7h7d8s7s', '3c3d7h3h3s', 'As7sAhAdAc', 'Ac2d5d4d3d',
+                     'jc2cjd2djs', 'TsTdAs7c4h', 'AcJc8s4dJd']
+        for hand, pay in zip(tbp_hands, [50, 120, 240, 4, 9, 0, 1]):
+            tbp = HandAnalyzer(hand, payouts = self.tripbonusplus_d)
+            self.assertEqual(tbp.pay_current_hand(), pay)
+
 
         normal_wins = [('ackcqcjctc', 800), ('ac5c3c2c4c', 50),
                        ('jc2cjd2djs', 9), ('7hKh9h4h2h', 6), ('Ac2d5d4d3d', 4),
@@ -394,3 +486,154 @@ class Test_vp_analyzer(unittest.TestCase):
         junk6 = HandAnalyzer('tc9d6h5s2c', payouts = self.tripbonusplus_d)
         junk6dv = DiscardValue(held_d=junk6.hold([False]*5))
         self.assertEqual(junk6dv.four_kind234(), 86)
+
+    def test_count_ways2kick(self):
+        dv = DiscardValue(held_d = HandAnalyzer('Qd9c8d5c2c').hold([True]*3 + [False]*2))
+        for grps in [[0, 1, 2, 0, 7], [3, 0, 0, 2, 8], [0, 2, 2, 2, 2]]:
+            #cards left of each rank, kickers are of distinct ranks
+            avails = [avail for avail, cnt in enumerate(grps) for _ in range(cnt) if avail]
+            for num_kickers in range(1, 4):
+                expected = 0
+                for ranks in combinations(range(len(avails)), num_kickers):
+                    ways = 1
+                    for r in ranks:
+                        ways *= avails[r]
+                    expected += ways
+                KICKER_WAYS.clear()
+                self.assertEqual(dv._count_ways2kick(grps, num_kickers), expected)
+                #memoized, by the counts of ranks with cards left
+                self.assertEqual(KICKER_WAYS[(tuple(grps[1:]), num_kickers)], expected)
+                self.assertEqual(dv._count_ways2kick([5] + grps[1:], num_kickers), expected)
+
+    def test_shared_intermediates(self):
+        #counts reuse the per hold intermediates, repeat counts must not drift
+        for hand in ['AsKsQsJs9d', 'Td9d8d7d7c', 'QhQsJcJd2s']:
+            for hold in product([True, False], repeat = 5):
+                held_d = HandAnalyzer(hand).hold(hold)
+                wins = list(DEFAULT_PAYOUTS)
+                dv = DiscardValue(held_d = held_d)
+                first = dv.count_wins(wins = wins)
+                self.assertEqual(dv.count_wins(wins = wins), first)
+                self.assertEqual(DiscardValue(held_d = held_d).flush(), first['flush'])
+
+    def test_deck_state(self):
+        deck = DeckState(self.h2.card_ids)
+        for hold in product([True, False], repeat = 5):
+            held_ids, disc_ids = self.h2.hold_ids(hold)
+            dv = DiscardValue(held_ids = held_ids, disc_ids = disc_ids)
+            hold_state = deck.hold(hold)
+            for attr in HoldState.__slots__:
+                if attr not in ('draws', 'suit_cnts'):
+                    self.assertEqual(getattr(hold_state, attr), getattr(dv, attr))
+            self.assertEqual(DiscardValue(hold = hold_state).count_wins(), dv.count_wins())
+            #the draw pile counts are shared by the holds of the hand
+            self.assertIs(hold_state.draws, deck.draws)
+        self.assertEqual(deck.suit_cnts, [3, 2, 0, 0])
+
+    def test_comb(self):
+        for n in range(54):
+            for k in range(54):
+                self.assertEqual(comb(n, k), math.comb(n, k))
+        self.assertEqual(comb(-1, 2), 0)
+        self.assertEqual(comb(3, -1), 0)
+        self.assertIsInstance(comb(47, 5), int)
+
+        #counts and denominators are exact ints
+        plays = HandAnalyzer('Qd9c8d5c2c').analyze()
+        for cnts in plays.values():
+            for win, cnt in cnts.items():
+                if win != 'expected_val':
+                    self.assertIsInstance(cnt, int)
+
+    def test_eval_deuces_hand(self):
+        hands = [('AhKhQhJhTh', 'natural_royal'), ('2c2d2h2s9c', 'four_deuces'),
+                 ('AhKh2cJhTh', 'wild_royal'), ('2c2d9h9s9c', 'five_kind'),
+                 ('2c2d2h4s7s', 'straight_flush'), ('2c2d2h4s9s', 'four_kind'),
+                 ('2c2d2h4s7d', 'four_kind'), ('9c9d2h5s5c', 'full_house'),
+                 ('2c4c6c8cTc', 'flush'), ('Ac2d3h4s5c', 'straight'),
+                 ('2c2dKhTs8c', 'three_kind'), ('3c5d7h9sJc', 'nothing'),
+                 ('5c5d7h7sJc', 'nothing')]
+        for hand, cat in hands:
+            ids = HandAnalyzer(hand).card_ids
+            self.assertEqual(DEUCES_WILD_CATEGORIES[eval_deuces_hand(ids)], cat)
+
+    def test_deuces_wild_counts(self):
+        #count_wins against enumerating every draw
+        for hand in ['2c2dAhKhQh', '2c9d9h5s5c', '3c4c5c6c8d', '2sTsJcQdKh']:
+            card_ids = HandAnalyzer(hand).card_ids
+            deck = [cid for cid in range(52) if cid not in card_ids]
+            for held_ids in combinations(card_ids, 3):
+                disc_ids = [cid for cid in card_ids if cid not in held_ids]
+                dv = DeucesWildValue(held_ids = held_ids, disc_ids = disc_ids)
+                cnts = Counter([DEUCES_WILD_CATEGORIES[eval_deuces_hand(held_ids + draw)]
+                                for draw in combinations(deck, 2)])
+                for win, cnt in dv.count_wins().items():
+                    self.assertEqual(cnt, cnts[win], (hand, held_ids, win))
+
+        #four deuces and any of the other 43 cards, a royal in any suit
+        dv = DeucesWildValue(held_ids = [], disc_ids = HandAnalyzer('3c4c5c6c8d').card_ids)
+        wins = dv.count_wins()
+        self.assertEqual(wins['four_deuces'], 43)
+        self.assertEqual(wins['natural_royal'], 4)
+        self.assertEqual(sum(wins.values()) <= comb(47, 5), True)
+
+    def test_deuces_wild_analyze(self):
+        payouts = WILD_PAYTABLES['deuces_wild']
+        #four deuces pay the same whatever is drawn, so discard the fifth card
+        fours = HandAnalyzer('2c2d2h2sAc', payouts = payouts)
+        self.assertEqual(fours.pay_current_hand(), 200)
+        self.assertEqual(fours.analyze(return_full_analysis = False,
+                                       return_bestdisc_cnts = False),
+                         ('2c2d2h2sXX', 200))
+        for hand in ['2c2dAhKhQh', '2c9d9h5s5c', '3c4c5c6c8d', 'ts9c8d5c2h', '7h8h9hKcKd']:
+            ha = HandAnalyzer(hand, payouts = payouts)
+            plays = ha.analyze()
+            best = HandAnalyzer.best_disc(plays)
+            self.assertEqual(ha.analyze(return_full_analysis = False,
+                                        return_bestdisc_cnts = False), best)
+        self.assertEqual(HandAnalyzer('2cAhKhQhJh', payouts = payouts).pay_current_hand(), 25)
+
+    def test_eval_joker_hand(self):
+        payouts = WILD_PAYTABLES['joker_poker']
+        hands = [('AhKhQhJhTh', 'natural_royal'), ('9c9d9h9sJk', 'five_kind'),
+                 ('AhKhJkJhTh', 'joker_royal'), ('JkTs9s8s7s', 'straight_flush'),
+                 ('9c9d9hJk2s', 'four_kind'), ('9c9d5h5sJk', 'full_house'),
+                 ('2c4c6c8cJk', 'flush'), ('AcJk3h4s5c', 'straight'),
+                 ('Jk9d9h2s5c', 'three_kind'), ('9c9d5h5s2c', 'two_pair'),
+                 ('KcKd5h8s2c', 'pair_ka'), ('JkAd5h8s2c', 'pair_ka'),
+                 ('QcQd5h8s2c', 'nothing'), ('JkQd5h8s2c', 'nothing')]
+        for hand, cat in hands:
+            ha = HandAnalyzer(hand, payouts = payouts)
+            self.assertEqual(JOKER_POKER_CATEGORIES[JokerPokerValue.eval_final(ha.card_ids)], cat)
+            self.assertEqual(ha.pay_current_hand(), payouts.get(cat, 0))
+
+    def test_joker_poker_counts(self):
+        #count_wins against enumerating every draw from the 48 cards left
+        payouts = WILD_PAYTABLES['joker_poker']
+        for hand in ['JkAhKhQh9c', 'Kc9d9h5sJk', '3c4c5c6c8d', 'AsTsJcQdKh']:
+            card_ids = HandAnalyzer(hand, payouts = payouts).card_ids
+            deck = [cid for cid in range(JOKER_ID + 1) if cid not in card_ids]
+            for held_ids in combinations(card_ids, 3):
+                disc_ids = [cid for cid in card_ids if cid not in held_ids]
+                jv = JokerPokerValue(held_ids = held_ids, disc_ids = disc_ids)
+                self.assertEqual(jv.exp_val_denom, comb(48, 2))
+                cnts = Counter([JOKER_POKER_CATEGORIES[JokerPokerValue.eval_final(held_ids + draw)]
+                                for draw in combinations(deck, 2)])
+                for win, cnt in jv.count_wins().items():
+                    self.assertEqual(cnt, cnts[win], (hand, held_ids, win))
+
+    def test_joker_poker_analyze(self):
+        payouts = WILD_PAYTABLES['joker_poker']
+        ha = HandAnalyzer('jkAhKhQhJh', payouts = payouts)
+        self.assertEqual(ha.hand[0], 'Jk')
+        self.assertEqual(ha.card_ids[0], JOKER_ID)
+        self.assertEqual(ha.pay_current_hand(), 100)
+        self.assertEqual(ha.analyze(return_full_analysis = False,
+                                    return_bestdisc_cnts = False), ('JkAhKhQhJh', 100))
+        for hand in ['JkAhKhQh9c', 'Kc9d9h5sJk', '3c4c5c6c8d', 'ts9c8d5c2h', 'Jk8h9hKcKd']:
+            ha = HandAnalyzer(hand, payouts = payouts)
+            best = HandAnalyzer.best_disc(ha.analyze())
+            self.assertEqual(ha.analyze(return_full_analysis = False,
+                                        return_bestdisc_cnts = False), best)
+        #no joker in the 52 card games
+        self.assertRaises(Exception, HandAnalyzer, 'JkAhKhQhJh')
@@ -1,11 +1,274 @@
-from collections import Counter
-from itertools import combinations_with_replacement, product
-from scipy.misc import comb
+from collections import Counter, OrderedDict
+from itertools import combinations, combinations_with_replacement, compress, product
 
 # GLOBALS
 RANKS = 'A23456789TJQK'
 SUITS = 'cdhs'
 STRAIGHTS = [list(RANKS+'A')[ind:ind+5] for ind in range(10)]
+#Payout for "9-6 Jacks or Better Video Poker"
+DEFAULT_PAYOUTS = {'pair_jqka': 1, 'two_pair': 2, 'three_kind': 3,
+                   'straight': 4, 'flush': 6, 'full_house': 9,
+                   'four_kind': 25, 'straight_flush': 50,
+                   'royal_flush': 800}
+#Named payout tables, see README.md
+PAYTABLES = {'jacks_or_better_96': DEFAULT_PAYOUTS,
+             'aces_and_eights': {'pair_jqka': 1, 'two_pair': 2, 'three_kind': 3,
+                                 'straight': 4, 'flush': 5, 'full_house': 8,
+                                 'four_kind': 25, 'four_kind7': 50,
+                                 'four_kindA8': 80, 'straight_flush': 50,
+                                 'royal_flush': 800},
+             'triple_bonus_plus': {'pair_jqka': 1, 'two_pair': 1, 'three_kind': 3,
+                                   'straight': 4, 'flush': 5, 'full_house': 9,
+                                   'four_kind': 50, 'four_kind234': 120,
+                                   'four_kindA': 240, 'straight_flush': 100,
+                                   'royal_flush': 800}}
+#Named payout tables of wild card games, HandAnalyzer picks the game from the
+#winning hands in the payouts (see is_deuces_wild, is_joker_poker)
+WILD_PAYTABLES = {'deuces_wild': {'natural_royal': 800, 'four_deuces': 200,
+                                  'wild_royal': 25, 'five_kind': 15,
+                                  'straight_flush': 9, 'four_kind': 5,
+                                  'full_house': 3, 'flush': 2, 'straight': 2,
+                                  'three_kind': 1},
+                  #Kings or Better Joker Poker, 20-7-5 table
+                  'joker_poker': {'natural_royal': 800, 'five_kind': 200,
+                                  'joker_royal': 100, 'straight_flush': 50,
+                                  'four_kind': 20, 'full_house': 7, 'flush': 5,
+                                  'straight': 3, 'three_kind': 2, 'two_pair': 1,
+                                  'pair_ka': 1}}
+
+#Integer card model. A card is an id in range(52), in deck order:
+#'Ac' = 0, 'Ad' = 1, ... 'Ks' = 51, so rank = id // 4 and suit = id % 4 index
+#RANKS and SUITS. Sets of cards are 52-bit masks with bit id set for each card.
+CARD_IDS = {r + s: ind*len(SUITS) + sind
+            for ind, r in enumerate(RANKS) for sind, s in enumerate(SUITS)}
+ID_CARDS = sorted(CARD_IDS, key = CARD_IDS.get)
+#Joker Poker adds a joker, written 'Jk' in hands, as card id 52 (after 'Ks').
+#It has a rank and suit of its own, JOKER_RANK and len(SUITS), in the tables
+#below, and is only dealt with Joker Poker payouts (see JokerPokerValue)
+JOKER = 'Jk'
+JOKER_ID = len(CARD_IDS)
+JOKER_RANK = len(RANKS)
+ID_CARD_TUPLES = [(card[0], card[1]) for card in ID_CARDS + [JOKER]]
+CARD_RANKS = [cid // len(SUITS) for cid in range(52)] + [JOKER_RANK]
+CARD_SUITS = [cid % len(SUITS) for cid in range(52)] + [len(SUITS)]
+RANK_IDS = {r: ind for ind, r in enumerate(RANKS)}
+HIGH_RANKS = frozenset(RANK_IDS[r] for r in 'JQKA')
+STRAIGHT_RANKS = [tuple(RANK_IDS[r] for r in strt) for strt in STRAIGHTS]
+#sorted rank ids of each straight, the royal straight last
+_SORTED_STRAIGHTS = [tuple(sorted(strt)) for strt in STRAIGHT_RANKS]
+#STRAIGHT_FLUSH_MASKS[i][s]: cards of (non-royal) straight i in suit s
+STRAIGHT_FLUSH_MASKS = [[sum(1 << (r*len(SUITS) + s) for r in strt)
+                         for s in range(len(SUITS))]
+                        for strt in STRAIGHT_RANKS[:-1]]
+ROYAL_MASKS = [sum(1 << (r*len(SUITS) + s) for r in STRAIGHT_RANKS[-1])
+               for s in range(len(SUITS))]
+#wins that depend on the suits of the held/discarded cards, see RankCache
+SUITED_WINS = frozenset(['royal_flush', 'straight_flush', 'flush'])
+#final hand categories, see eval_hand. Fours of a kind are split by rank for
+#the bonus four_kind payouts
+HAND_CATEGORIES = (['nothing', 'pair_low', 'pair_jqka', 'two_pair', 'three_kind',
+                    'straight', 'flush', 'full_house'] +
+                   ['four_kind' + r for r in RANKS] +
+                   ['straight_flush', 'royal_flush'])
+#CHOOSE[n][k]: binomial coefficient n choose k as an exact int, for n and k up
+#to the 53 cards of the largest deck (Joker Poker), see comb. Built row by row
+#with Pascal's rule, k > n are 0.
+MAX_DECK = 53
+CHOOSE = [[1] + [0]*MAX_DECK]
+for _n in range(MAX_DECK):
+    CHOOSE.append([1] + [CHOOSE[-1][k - 1] + CHOOSE[-1][k] for k in range(1, MAX_DECK + 1)])
+del _n
+#a prime per rank, the product over a hand's cards identifies its rank multiset
+RANK_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+CARD_PRIMES = [RANK_PRIMES[r] for r in CARD_RANKS[:JOKER_ID]]
+#Deuces Wild, see DeucesWildValue. The deuces are wild, the other (natural)
+#cards count as usual.
+DEUCE = RANK_IDS['2']
+NATURAL_RANKS = [r for r in range(len(RANKS)) if r != DEUCE]
+#final hand categories, lowest first
+DEUCES_WILD_CATEGORIES = ['nothing', 'three_kind', 'straight', 'flush', 'full_house',
+                          'four_kind', 'straight_flush', 'five_kind', 'wild_royal',
+                          'four_deuces', 'natural_royal']
+#Deuces Wild hands counted by the ranks of the cards alone, less any flushes
+DEUCES_WILD_RANK_WINS = ['four_deuces', 'five_kind', 'four_kind', 'full_house',
+                         'straight', 'three_kind']
+#winning hands only paid in Deuces Wild
+DEUCES_WILD_ONLY_WINS = frozenset(['four_deuces', 'wild_royal'])
+#Joker Poker, see JokerPokerValue. The joker is wild, all 52 other cards are
+#natural. Final hand categories, lowest first: a pair pays if it is kings or
+#aces, a joker and a king or ace are a pair_ka
+JOKER_POKER_CATEGORIES = ['nothing', 'pair_ka', 'two_pair', 'three_kind', 'straight',
+                          'flush', 'full_house', 'four_kind', 'straight_flush',
+                          'joker_royal', 'five_kind', 'natural_royal']
+#Joker Poker hands counted by the ranks of the cards alone, less any flushes
+JOKER_POKER_RANK_WINS = ['five_kind', 'four_kind', 'full_house', 'straight',
+                         'three_kind', 'two_pair', 'pair_ka']
+#winning hands only paid in Joker Poker
+JOKER_POKER_ONLY_WINS = frozenset(['joker_royal', 'pair_ka'])
+KING_ACE_RANK_MASK = (1 << RANK_IDS['K']) | (1 << RANK_IDS['A'])
+#RANK_CHOOSE[n][k]: ways to pick k of the n cards left of a rank
+RANK_CHOOSE = [CHOOSE[n][:n + 1] for n in range(len(SUITS) + 1)]
+#SUIT_CHOOSE[n][k]: ways to pick k of the n natural cards left of a suit
+SUIT_CHOOSE = [CHOOSE[n][:6] for n in range(len(RANKS) + 1)]
+#rank masks (bit r set for rank id r) of each straight
+STRAIGHT_RANK_MASKS = [sum([1 << r for r in strt]) for strt in STRAIGHT_RANKS]
+ROYAL_RANK_MASK = STRAIGHT_RANK_MASKS[-1]
+#WILD_STRAIGHT_SETS[m]: (rank mask, rank ids) of each set of m natural ranks
+#that fit in a straight, the deuces fill in the rest of it.
+#JOKER_STRAIGHT_SETS: the same for Joker Poker, where every rank is natural
+WILD_STRAIGHT_SETS, JOKER_STRAIGHT_SETS = [
+    [[(mask, ranks) for mask, ranks in [(sum([1 << r for r in ranks]), ranks)
+                                        for ranks in combinations(natural_ranks, num)]
+      if any([not mask & ~strt for strt in STRAIGHT_RANK_MASKS])]
+     for num in range(6)]
+    for natural_ranks in (NATURAL_RANKS, range(len(RANKS)))]
+#memo of DiscardValue._count_ways2kick, (counts of ranks with 1-4 cards left,
+#number of kickers) to ways to draw the kickers. At most a few thousand keys.
+KICKER_WAYS = {}
+#relative slack on the EV bounds of HandAnalyzer's pruned best hold search,
+#far above float rounding differences between a bound and the exact EV
+EV_BOUND_TOL = 1e-9
+
+
+def comb(n, k):
+    """
+    Binomial coefficient n choose k as an exact int, looked up in CHOOSE.
+    0 unless 0 <= k <= n (e.g. for a negative count of cards left).
+    """
+    if n < 0 or k < 0:
+        return 0
+    return CHOOSE[n][k]
+
+
+def card_id(card):
+    """
+    Card id of a 2 char card string or (rank, suit) tuple, case insensitive.
+    The joker ('Jk') is JOKER_ID.
+    """
+    card = card[0].upper() + card[1].lower()
+    return JOKER_ID if card == JOKER else CARD_IDS[card]
+
+
+def cards_mask(ids):
+    """52-bit mask of a sequence of card ids."""
+    mask = 0
+    for cid in ids:
+        mask |= 1 << cid
+    return mask
+
+
+def royal_flush_cnt(held_mask, disc_mask):
+    """Ways to draw a royal flush, given masks of the held and discarded cards."""
+    if held_mask:
+        for royal in ROYAL_MASKS:
+            #all held cards are royals of one suit, none of it discarded
+            if not held_mask & ~royal:
+                return 0 if disc_mask & royal else 1
+        return 0
+    else:
+        return sum([1 for royal in ROYAL_MASKS if not disc_mask & royal])
+
+
+def straight_flush_cnt(held_mask, disc_mask):
+    """Ways to draw a (non-royal) straight flush, see royal_flush_cnt."""
+    ways_cnt = 0
+    for strt_flushes in STRAIGHT_FLUSH_MASKS:
+        for strt_flush in strt_flushes:
+            #held cards all in the straight flush, no discards from it
+            if not (held_mask & ~strt_flush or disc_mask & strt_flush):
+                ways_cnt += 1
+
+    return ways_cnt
+
+
+def _hand_category(ranks, flush, cnts):
+    """
+    Helper for the eval_hand tables, category of sorted rank ids ranks, with
+    cnts = Counter(ranks).most_common().
+    """
+    straight = ranks in _SORTED_STRAIGHTS
+    if flush:
+        if ranks == _SORTED_STRAIGHTS[-1]:
+            return 'royal_flush'
+        return 'straight_flush' if straight else 'flush'
+    elif cnts[0][1] == 4:
+        return 'four_kind' + RANKS[cnts[0][0]]
+    elif cnts[0][1] == 3:
+        return 'full_house' if cnts[1][1] == 2 else 'three_kind'
+    elif cnts[0][1] == 2:
+        if cnts[1][1] == 2:
+            return 'two_pair'
+        return 'pair_jqka' if cnts[0][0] in HIGH_RANKS else 'pair_low'
+    return 'straight' if straight else 'nothing'
+
+
+def _category_tables():
+    """
+    Helper, build dicts of the product of RANK_PRIMES of a hand's ranks to the
+    hand's category index, for any hand and for flushes.
+    """
+    rank_cats, flush_cats = {}, {}
+    for ranks in combinations_with_replacement(range(len(RANKS)), 5):
+        cnts = Counter(ranks).most_common()
+        if cnts[0][1] > len(SUITS):
+            continue
+        key = 1
+        for r in ranks:
+            key *= RANK_PRIMES[r]
+        rank_cats[key] = HAND_CATEGORIES.index(_hand_category(ranks, False, cnts))
+        if len(cnts) == 5:
+            flush_cats[key] = HAND_CATEGORIES.index(_hand_category(ranks, True, cnts))
+    return rank_cats, flush_cats
+
+RANK_PATTERN_CATEGORY, FLUSH_PATTERN_CATEGORY = _category_tables()
+
+
+def eval_hand(ids):
+    """
+    Category of a final hand of 5 card ids, as an index into HAND_CATEGORIES.
+    A product of primes (perfect hash of the rank multiset) looked up in one of
+    two precomputed tables, depending on whether the hand is a flush.
+    """
+    c0, c1, c2, c3, c4 = ids
+    key = CARD_PRIMES[c0] * CARD_PRIMES[c1] * CARD_PRIMES[c2] * CARD_PRIMES[c3] * CARD_PRIMES[c4]
+    suit = CARD_SUITS[c0]
+    if suit == CARD_SUITS[c1] == CARD_SUITS[c2] == CARD_SUITS[c3] == CARD_SUITS[c4]:
+        return FLUSH_PATTERN_CATEGORY[key]
+    return RANK_PATTERN_CATEGORY[key]
+
+
+def is_deuces_wild(payouts):
+    """True if payouts pays any of the Deuces Wild only hands."""
+    return any([win in DEUCES_WILD_ONLY_WINS for win in payouts])
+
+
+def is_joker_poker(payouts):
+    """True if payouts pays any of the Joker Poker only hands."""
+    return any([win in JOKER_POKER_ONLY_WINS for win in payouts])
+
+
+def eval_deuces_hand(ids):
+    """
+    Deuces Wild category of a final hand of 5 card ids, as an index into
+    DEUCES_WILD_CATEGORIES (see DeucesWildValue).
+    """
+    return DeucesWildValue.eval_final(ids)
+
+
+def category_pays(payouts):
+    """
+    List of the payout of each of HAND_CATEGORIES under payouts. A four of a
+    kind pays the first bonus 'four_kind' + ranks key with its rank, if any.
+    """
+    specials = [win for win in payouts
+                if win.startswith('four_kind') and win != 'four_kind']
+    pays = []
+    for cat in HAND_CATEGORIES:
+        if cat.startswith('four_kind'):
+            bonus = [win for win in specials if cat[-1] in win[len('four_kind'):]]
+            cat = bonus[0] if bonus else 'four_kind'
+        pays.append(payouts.get(cat, 0))
+    return pays
 
 
 class HandAnalyzer(object):
@@ -21,15 +284,23 @@ class HandAnalyzer(object):
                'straight': 4, 'flush': 6, 'full_house': 9, 'four_kind': 25,
                'straight_flush': 50, 'royal_flush': 800}
 
-    To Do: add wild card functionality for versions like Deuces Wild, Jokers.
+    Payout tables with any of the Deuces Wild only hands (DEUCES_WILD_ONLY_WINS,
+    e.g. WILD_PAYTABLES['deuces_wild']) are analyzed as Deuces Wild, counting
+    with DeucesWildValue instead of DiscardValue. Likewise, payout tables with
+    any of the Joker Poker only hands (JOKER_POKER_ONLY_WINS, e.g.
+    WILD_PAYTABLES['joker_poker']) are analyzed as Joker Poker, with
+    JokerPokerValue, and the hand may include the joker ('Jk').
 
     INPUT:
     hand: (str) Ten character string of rank/suit for 5 cards.
             rank chars: a23456789tjqk, suit chars: cdhs. Case Insensitive.
+            The joker is 'jk' (Joker Poker only).
     payouts: (dict) Amount paid for a given winning hand. Accepts any subset of
             the following keys: 'pair_jqka', 'two_pair', 'three_kind',
             'straight', 'flush', 'full_house', 'four_kind', 'straight_flush'
-            'royal_flush', 'four_kind7', 'four_kindA8'
+            'royal_flush', 'four_kind7', 'four_kindA8', or the Deuces Wild
+            or Joker Poker hands (see DEUCES_WILD_CATEGORIES,
+            JOKER_POKER_CATEGORIES)
     OUTPUT:
     None
     """
@@ -37,18 +308,12 @@ class HandAnalyzer(object):
     def __init__(self, hand, payouts = None):
         self.__specials = '' #special 4kinds ranks see: DiscardValue._four_kind_special()
         if payouts is None:
-            #Payout for "9-6 Jacks or Better Video Poker"
-            self.payouts = {'pair_jqka': 1, 'two_pair': 2, 'three_kind': 3,
-                            'straight': 4, 'flush': 6, 'full_house': 9,
-                            'four_kind': 25, 'straight_flush': 50,
-                            'royal_flush': 800}
+            self.payouts = DEFAULT_PAYOUTS.copy()
         else:
             #Bonus four_kind: (A8, 7 in Aces and Eights), (A, 234, in Triple Bonus Plus)
-            bonuses = ['A8', '7', 'A', '234']
-            for bonus in bonuses:
-                fourk_bonus = 'four_kind' + bonus
-                if fourk_bonus in payouts:
-                    self.__specials += bonus
+            for win in payouts:
+                if win.startswith('four_kind') and win != 'four_kind':
+                    self.__specials += win[len('four_kind'):]
             self.payouts = payouts
 
         #rewrite hand string as list of 5 cards of 2 chars
@@ -56,8 +321,22 @@ class HandAnalyzer(object):
         for ind in range(0, 10, 2):
             self.hand.append(hand[ind:ind+1].upper() + hand[ind+1:ind+2].lower())
 
-        self.__h = [(card[0], card[1]) for card in self.hand]
-        #self.__draws = Counter(self.__ranks*4) - Counter([c[0] for c in self.__h])
+        self.card_ids = [card_id(card) for card in self.hand]
+        self.hand_mask = cards_mask(self.card_ids)
+        self.__category_pays = None #see pay_current_hand
+        self.__rank_ev_key = None #see _ev_bound
+        #counts the wins of a hold, see _deck_state
+        if is_joker_poker(self.payouts):
+            self.__value_class = JokerPokerValue
+        elif is_deuces_wild(self.payouts):
+            self.__value_class = DeucesWildValue
+        else:
+            self.__value_class = DiscardValue
+        self.__wild = self.__value_class is not DiscardValue
+        if JOKER_ID in self.card_ids and self.__value_class is not JokerPokerValue:
+            raise Exception('The joker is only dealt in Joker Poker, got: {}'.format(hand))
+        #draw pile shared by the DiscardValue of each hold, see _deck_state
+        self.__deck = None if self.__wild else DeckState(self.card_ids)
 
 
     def hold(self, held = [True]*5):
@@ -65,13 +344,23 @@ class HandAnalyzer(object):
         Given a list of 5 bools, one for each card (True means hold the card),
         return a dict of card tuples with keys 'h' for hold and 'd' for discard.
         """
-        held_d = {'h':[], 'd':[]}
-        for card, held_bool in zip(self.__h, held):
+        held_ids, disc_ids = self.hold_ids(held)
+        return {'h': [ID_CARD_TUPLES[c] for c in held_ids],
+                'd': [ID_CARD_TUPLES[c] for c in disc_ids]}
+
+
+    def hold_ids(self, held = [True]*5):
+        """
+        Integer version of .hold(), return lists of the held and discarded
+        card ids (see CARD_IDS).
+        """
+        held_ids, disc_ids = [], []
+        for cid, held_bool in zip(self.card_ids, held):
             if held_bool:
-                held_d['h'].append(card)
+                held_ids.append(cid)
             else:
-                held_d['d'].append(card)
-        return held_d
+                disc_ids.append(cid)
+        return held_ids, disc_ids
 
 
     def analyze(self, return_full_analysis = True, return_bestdisc_cnts = True):
@@ -90,6 +379,8 @@ class HandAnalyzer(object):
             (count, total number of results) for each winning hand.
                              == False: Only return the discard strategy with the
             highest expected value (prefer more discards in case of ties).
+            Holds that can't beat the best are not counted, see
+            _best_hold_search.
 
             In both cases the discard strategy is represented as a 10 character
             string, where the discarded cards are represented by 'XX'.
@@ -102,22 +393,17 @@ class HandAnalyzer(object):
             work that analyzes large numbers of hands.
         """
 
-        win_props = {}
-
         count_wins_kwargs = {'wins': self.payouts.keys()}
-        if self.__specials != []:
+        if not self.__wild:
             count_wins_kwargs['specials'] = self.__specials
 
-        for hold_l in product([True, False], repeat=5):
-            deck_state = DiscardValue(held_d=self.hold(held = hold_l))
-            ways_to_win = deck_state.count_wins(**count_wins_kwargs)
-            expected_val = 0
-            for win, cnt in ways_to_win.items():
-                expected_val += self.payouts[win] * cnt / deck_state.exp_val_denom
-
-            ways_to_win['expected_val'] = expected_val
-            hand = ''.join([card if held else 'XX' for card, held in zip(self.hand, hold_l)])
-            win_props[hand] = ways_to_win
+        if not return_full_analysis and self.__value_class.rank_cache is not None:
+            win_props = self._best_hold_search(count_wins_kwargs)
+        else:
+            win_props = {}
+            for hold_l in product([True, False], repeat=5):
+                hand, ways_to_win = self._hold_value(hold_l, count_wins_kwargs)
+                win_props[hand] = ways_to_win
 
         if return_full_analysis:
             return win_props
@@ -129,6 +415,150 @@ class HandAnalyzer(object):
                 return besthold_tup
 
 
+    def _deck_state(self, hold_l):
+        """
+        DiscardValue, or the wild card game's WildCardValue, of a hold. The
+        DiscardValue is built from the hand's DeckState.
+        """
+        if self.__deck is None:
+            held_ids, disc_ids = self.hold_ids(held = hold_l)
+            return self.__value_class(held_ids = held_ids, disc_ids = disc_ids)
+        return DiscardValue(hold = self.__deck.hold(hold_l))
+
+
+    def _hold_value(self, hold_l, count_wins_kwargs):
+        """
+        Helper for analyze, the discard string and win counts dict (with its
+        'expected_val') of one hold/discard strategy.
+        """
+        deck_state = self._deck_state(hold_l)
+        ways_to_win = deck_state.count_wins(**count_wins_kwargs)
+        expected_val = 0
+        for win, cnt in ways_to_win.items():
+            expected_val += self.payouts[win] * cnt / deck_state.exp_val_denom
+
+        ways_to_win['expected_val'] = expected_val
+        hand = ''.join([card if held else 'XX' for card, held in zip(self.hand, hold_l)])
+        return hand, ways_to_win
+
+
+    def _best_hold_search(self, count_wins_kwargs):
+        """
+        Helper for analyze, branch and bound search for the best hold/discard
+        strategy. Holds are visited in order of decreasing EV upper bound (see
+        _ev_bound) and counted in full until the next bound is below the best
+        expected value found, no hold left can beat (or tie) it.
+
+        OUTPUT: (dict) analyze's win_props for the counted holds only, in the
+            same order, so best_disc breaks ties as it does for all 32.
+        """
+        holds = list(product([True, False], repeat=5))
+        bounds = [self._ev_bound(hold_l, count_wins_kwargs) for hold_l in holds]
+        counted = {}
+        best_ev = None
+        for ind in sorted(range(len(holds)), key = lambda i: -bounds[i]):
+            if (best_ev is not None and
+                    bounds[ind] < best_ev - EV_BOUND_TOL * max(1., best_ev)):
+                break
+            counted[ind] = self._hold_value(holds[ind], count_wins_kwargs)
+            if best_ev is None or counted[ind][1]['expected_val'] > best_ev:
+                best_ev = counted[ind][1]['expected_val']
+
+        return {hand: ways_to_win for _, (hand, ways_to_win) in sorted(counted.items())}
+
+
+    def _ev_bound(self, hold_l, count_wins_kwargs):
+        """
+        Helper for _best_hold_search, upper bound on the expected value of a
+        hold/discard strategy without counting its wins: the suit independent
+        part of the EV is looked up per rank signature in the rank_cache of
+        DiscardValue (or the WildCardValue, see _rank_ev), the flush part is
+        computed from card masks. Equal to the EV up to float rounding.
+
+        In the wild card games, holds with natural cards of one suit (or none)
+        could still make any of the flushes, their bound is infinite (always
+        counted).
+        """
+        held_ids, disc_ids = self.hold_ids(held = hold_l)
+        if self.__wild:
+            wild_rank = self.__value_class.WILD_RANK
+            nat_suits = set([CARD_SUITS[c] for c in held_ids if CARD_RANKS[c] != wild_rank])
+            if len(nat_suits) <= 1:
+                return float('inf')
+        rank_sig = (tuple(sorted([CARD_RANKS[c] for c in held_ids])),
+                    tuple(sorted([CARD_RANKS[c] for c in disc_ids])))
+        if self.__rank_ev_key is None:
+            self.__rank_ev_key = ('expected_val', tuple(sorted(self.payouts.items())))
+        rank_ev = self.__value_class.rank_cache.get(
+            rank_sig, self.__rank_ev_key,
+            lambda: self._rank_ev(hold_l, count_wins_kwargs))
+
+        held_suits = set([CARD_SUITS[c] for c in held_ids])
+        if self.__wild or len(held_suits) > 1:
+            return rank_ev
+
+        #the flushes, less the straight flushes counted as straights by _rank_ev
+        pays = self.payouts
+        flush_pay = pays.get('flush', 0)
+        straight_pay = pays.get('straight', 0)
+        held_mask, disc_mask = cards_mask(held_ids), cards_mask(disc_ids)
+        suit_pays = ((pays.get('royal_flush', 0) - straight_pay - flush_pay) *
+                     royal_flush_cnt(held_mask, disc_mask) +
+                     (pays.get('straight_flush', 0) - straight_pay - flush_pay) *
+                     straight_flush_cnt(held_mask, disc_mask))
+        undrawable_suit_cnt = self.__deck.suit_cnts
+        for suit in (held_suits or range(len(SUITS))):
+            suit_pays += flush_pay * comb(13 - undrawable_suit_cnt[suit], len(disc_ids))
+
+        return rank_ev + suit_pays / comb(47, len(disc_ids))
+
+
+    def _rank_ev(self, hold_l, count_wins_kwargs):
+        """
+        Helper for _ev_bound, expected value of the wins that depend only on
+        ranks, with straights of any suits (flushes included).
+        """
+        deck_state = self._deck_state(hold_l)
+        if self.__wild:
+            ways_to_win = {win: deck_state.rank_count(win) for win in self.payouts
+                           if win in self.__value_class.RANK_WINS}
+        else:
+            rank_wins = [win for win in self.payouts if win not in SUITED_WINS]
+            ways_to_win = deck_state.count_wins(**dict(count_wins_kwargs, wins = rank_wins))
+            if 'straight' in ways_to_win:
+                ways_to_win['straight'] += deck_state.royal_flush() + deck_state.straight_flush()
+        expected_val = 0
+        for win, cnt in ways_to_win.items():
+            expected_val += self.payouts[win] * cnt / deck_state.exp_val_denom
+        return expected_val
+
+
+    def count_matrix(self, wins):
+        """
+        Count the ways of making each hand in wins for each of the 32
+        hold/discard strategies, without applying a payout table. The counts
+        don't depend on the payouts, so one count matrix can price any number
+        of payout tables (see all_hands_analysis.sweep_paytables).
+
+        INPUT:
+        wins: (list of str) winning hands to count, see DiscardValue.count_wins
+
+        OUTPUT: (tuple) list of the 32 discard strategy strings (in the order
+            used by .analyze()), list of 32 lists of (int) counts, one per elem
+            of wins, and list of the 32 total numbers of possible draws (the
+            expected value denominators).
+        """
+        hold_strs, counts, denoms = [], [], []
+        for hold_l in product([True, False], repeat=5):
+            deck_state = self._deck_state(hold_l)
+            ways_to_win = deck_state.count_wins(wins = wins)
+            hold_strs.append(''.join([card if held else 'XX'
+                                      for card, held in zip(self.hand, hold_l)]))
+            counts.append([int(ways_to_win[win]) for win in wins])
+            denoms.append(int(deck_state.exp_val_denom))
+        return hold_strs, counts, denoms
+
+
     @staticmethod
     def best_disc(results):
         """
@@ -162,72 +592,143 @@ class HandAnalyzer(object):
         Check to see if current hand is a winning hand. If so, return the
         associated payout, otherwise return 0.
         """
-        pays = self.payouts.copy()
-        groups = ['pair_jqka', 'two_pair', 'three_kind', 'full_house',
-                  'four_kind', 'four_kind7', 'four_kindA8']
-        straight_hands = ['straight', 'straight_flush', 'royal_flush']
-        flushes = ['flush', 'straight_flush', 'royal_flush']
-
-        held_r =[]
-        suits = set()
-        for r, s in self.__h:
-            held_r.append(r)
-            suits.add(s)
-
-        held_r_cnts = Counter(held_r).most_common()
-        num_suits = len(suits)
-
-        if held_r_cnts[0][1] > 1:
-            #at least a pair, so no straight_hands, no flushes
-            for strtflu in straight_hands + flushes:
-                pays[strtflu] = 0
-            if held_r_cnts[0][1] == 2:
-                for group in groups[2:]:
-                    pays[group] = 0
-                # check for two_pair
-                if held_r_cnts[1][1] == 1:
-                     pays['two_pair'] = 0
-                # check JoB
-                if held_r_cnts[0][0] not in 'JQKA':
-                    pays['pair_jqka'] = 0
-            #check full_house
-            elif held_r_cnts[0][1] == 3:
-                for group in groups[4:]:
-                    pays[group] = 0
-                if held_r_cnts[1][1] == 1:
-                    pays['full_house'] = 0
+        if self.__wild:
+            categories = self.__value_class.CATEGORIES
+            return self.payouts.get(categories[self.__value_class.eval_final(self.card_ids)], 0)
+        if self.__category_pays is None:
+            self.__category_pays = category_pays(self.payouts)
+        return self.__category_pays[eval_hand(self.card_ids)]
 
-            else:
-                #check special fours of a kind
-                if held_r_cnts[0][0] not in 'A8':
-                    pays['four_kindA8'] = 0
-                if held_r_cnts[0][0] != '7':
-                    pays['four_kind7'] = 0
+
+class RankCache(object):
+    """
+    Bounded LRU cache of the win counts that depend only on the ranks of the
+    held and discarded cards (every category except the flushes), shared by
+    all DiscardValue objects. Keys are rank signatures: (sorted held rank ids,
+    sorted discarded rank ids); there are 142,428 of these over all hands and
+    holds, each holding a dict of counts by win.
+
+    hits and misses count lookups of single win counts.
+
+    INPUT:
+    maxsize: (int) Max number of rank signatures kept, least recently used
+        are dropped first.
+    """
+    def __init__(self, maxsize = 1 << 16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def get(self, key, win, count_func):
+        """Count of win for rank signature key, count_func() if not cached."""
+        entry = self.__entries.get(key)
+        if entry is None:
+            entry = self.__entries[key] = {}
+            if len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last = False)
         else:
-            #no pairs or higher
-            for group in groups:
-                pays[group] = 0
+            self.__entries.move_to_end(key)
+
+        if win in entry:
+            self.hits += 1
+            return entry[win]
+        self.misses += 1
+        cnt = entry[win] = count_func()
+        return cnt
+
+    def clear(self):
+        """Empty the cache and reset the stats."""
+        self.__entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """dict of hits, misses, hit_rate, size and maxsize"""
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.,
+                'size': len(self.__entries), 'maxsize': self.maxsize}
+
+
+class HoldState(object):
+    """
+    Cards of one hold/discard strategy of a hand, with the draw pile counts
+    DiscardValue starts from, see DeckState.hold. The attributes are those of
+    DiscardValue of the same names, draws (count of cards available to draw by
+    rank) and suit_cnts (count of dealt cards by suit) are shared by all the
+    holds of a hand, don't modify them.
+    """
+    __slots__ = ('held_ids', 'disc_ids', 'held_mask', 'disc_mask', 'held_r',
+                 'held_s', 'disc_r', 'disc_s', 'draws', 'suit_cnts',
+                 'held_r_cnts', 'nonheld_ranks', 'nonheld_rank_grps',
+                 'exp_val_denom')
 
-        # check for flush
-        if num_suits > 1:
-            for flush in flushes:
-                pays[flush] = 0
 
-        #check straights
-        acelow_order_d = {r:i for i, r in enumerate(RANKS)}
-        ordered_hand = ''.join(sorted(held_r, key= lambda x: acelow_order_d[x]))
-        strt_set = set([''.join(x) for x in STRAIGHTS])
-        #add royal straight to accommodate ace low ordering
-        royals = 'ATJQK'
-        strt_set.add(royals)
-        if ordered_hand not in strt_set:
-            for strt in straight_hands:
-                pays[strt] = 0
-        elif ordered_hand != royals:
-            pays['royal_flush'] = 0
+class DeckState(object):
+    """
+    Draw pile of a dealt hand, shared by its 32 hold/discard strategies. The
+    cards left to draw don't depend on the hold, only which of the dealt ranks
+    are held does, so each HoldState starts from the counts here and only
+    takes out its held ranks.
 
+    INPUT:
+    card_ids: (list of int) card ids of the dealt hand (see CARD_IDS), in the
+        order hold bools refer to
 
-        return max(pays.values())
+    OUTPUT: None
+    """
+    __slots__ = ('card_ids', 'masks', 'ranks', 'suits', 'draws', 'suit_cnts',
+                 'draw_grps')
+
+    def __init__(self, card_ids):
+        self.card_ids = tuple(card_ids)
+        self.masks = [1 << c for c in self.card_ids]
+        self.ranks = [CARD_RANKS[c] for c in self.card_ids]
+        self.suits = [CARD_SUITS[c] for c in self.card_ids]
+
+        #count of cards available to draw by rank, count of dealt cards by suit
+        self.draws = [len(SUITS)]*len(RANKS)
+        self.suit_cnts = [0]*len(SUITS)
+        for r, s in zip(self.ranks, self.suits):
+            self.draws[r] -= 1
+            self.suit_cnts[s] += 1
+        self.draw_grps = DiscardValue._rank_grps(self.draws)
+
+
+    def hold(self, held = [True]*5):
+        """
+        HoldState of holding the cards marked True in held (one bool per card).
+        """
+        hold = HoldState()
+        disc = [not held_bool for held_bool in held]
+        hold.held_ids = tuple(compress(self.card_ids, held))
+        hold.disc_ids = tuple(compress(self.card_ids, disc))
+        hold.held_mask = sum(compress(self.masks, held))
+        hold.disc_mask = sum(compress(self.masks, disc))
+        hold.held_r = tuple(compress(self.ranks, held))
+        hold.held_s = tuple(compress(self.suits, held))
+        hold.disc_r = tuple(compress(self.ranks, disc))
+        hold.disc_s = tuple(compress(self.suits, disc))
+        hold.draws = self.draws
+        hold.suit_cnts = self.suit_cnts
+
+        #(rank, count) of held ranks, most common first (ties in held order)
+        held_cnts = {}
+        for r in hold.held_r:
+            held_cnts[r] = held_cnts.get(r, 0) + 1
+        hold.held_r_cnts = sorted(held_cnts.items(), key = lambda x: -x[1])
+
+        #take the held ranks out of the draw pile counts
+        hold.nonheld_ranks = self.draws[:]
+        hold.nonheld_rank_grps = self.draw_grps[:]
+        for r in held_cnts:
+            hold.nonheld_rank_grps[self.draws[r]] -= 1
+            hold.nonheld_rank_grps[0] += 1
+            hold.nonheld_ranks[r] = 0
+
+        hold.exp_val_denom = comb(47, 5 - len(hold.held_r))
+        return hold
 
 
 class DiscardValue(object):
@@ -243,6 +744,10 @@ class DiscardValue(object):
     All other methods, except count_wins, are helper functions for these poker
     hand methods.
 
+    Internally cards are integer ids (see CARD_IDS): held_r, held_s, disc_r and
+    disc_s are tuples of rank and suit indices into RANKS and SUITS, held_mask
+    and disc_mask are 52-bit masks. held_d, hand_str and hold_str are adapters
+    onto this.
 
     INPUT:
     held_d: (dict) Hold/Discard with keys 'h' and 'd' of the form output from
@@ -253,68 +758,125 @@ class DiscardValue(object):
               of the form for instantiating HandAnalyzer, e.g.: 'Ts9c8d5c2h'
     hold_str: (str) Same form as hand_str, except discarded cards represented
                  as 'XX', e.g.: 'TsXXXX5c2h'
-        NOTE: DiscardValue object must be instantiated with held_d alone,
-        or hold_str AND discard_str together. (held_d has priority
-        if others are not None)
+    held_ids, disc_ids: (lists of int) held and discarded card ids, of the form
+              output from HandAnalyzer.hold_ids
+    hold: (HoldState) a hold of a DeckState, whose draw pile counts are used
+              as they are, see HandAnalyzer._deck_state
+        NOTE: DiscardValue object must be instantiated with hold, held_ids (and
+        disc_ids), held_d alone, or hold_str AND discard_str together. (in that
+        order of priority if more than one is not None)
     specials: (list) Card ranks with bonuses for four of a kind, e.g.:
               ['A', '7', '8']
 
+    count_wins looks up the suit independent counts in the rank_cache class
+    attribute (a RankCache) first, set it to None to always count.
+
     OUTPUT: None
     """
+    rank_cache = RankCache()
+    __slots__ = ('__specials', '__rank_sig', '__royal_cnt', '__strt_flush_cnt',
+                 '__held_r_avail', '__jqka_grps', 'held_ids', 'disc_ids',
+                 'held_mask', 'disc_mask', 'held_r', 'held_s', 'disc_r', 'disc_s',
+                 '__draws', '__undrawable_suit_cnt', 'held_r_cnts', 'draw_cnt',
+                 'nonheld_ranks', 'nonheld_rank_grps', 'exp_val_denom')
+
     def __init__(self, held_d = None, hand_str = None, hold_str = None,
-                 specials = None):
-        if held_d is not None:
-            #TODO: enforce rank uppercase, suit lowercase in card tuples
-            self.held_d = held_d
+                 specials = None, held_ids = None, disc_ids = None, hold = None):
+        if hold is None:
+            held_ids, disc_ids = self._hold_ids(held_d, hand_str, hold_str,
+                                                held_ids, disc_ids)
+            hold = DeckState(list(held_ids) + list(disc_ids)).hold(
+                [True]*len(held_ids) + [False]*len(disc_ids))
+
+        self.__specials = specials
+        self.__rank_sig = None #see _cached_count
+        #intermediates shared by several of the win counters of this hold,
+        #computed on first use
+        self.__royal_cnt = None #see royal_flush
+        self.__strt_flush_cnt = None #see straight_flush
+        self.__held_r_avail = None #see _held_avail
+        self.__jqka_grps = None #see _draw_for_ranks
+
+        self.held_ids = hold.held_ids
+        self.disc_ids = hold.disc_ids
+        self.held_mask = hold.held_mask
+        self.disc_mask = hold.disc_mask
+        self.held_r = hold.held_r
+        self.held_s = hold.held_s
+        self.disc_r = hold.disc_r
+        self.disc_s = hold.disc_s
+
+        #count of cards available to draw, indexed by rank, and of held and
+        #discarded cards, indexed by suit (shared by the holds of a hand)
+        self.__draws = hold.draws
+        self.__undrawable_suit_cnt = hold.suit_cnts
+
+        #(rank, count) of held ranks, most common first (ties in held order)
+        self.held_r_cnts = hold.held_r_cnts
+        self.draw_cnt = len(self.disc_r)
+
+        #count of cards available to draw, held ranks zeroed
+        self.nonheld_ranks = hold.nonheld_ranks
+
+        # number of ranks with 0-4 available cards, indexed by availability.
+        # For example, discarding all 5 cards in a junk hand has:
+        # nonheld_rank_grps == [0, 0, 0, 5, 8]
+        # for 8 ranks have 4 cards each to draw, and 5 ranks have 3 cards to draw.
+        self.nonheld_rank_grps = hold.nonheld_rank_grps
+
+        # count of all possible draws, i.e. the denominator for calculating
+        # probability of drawing a particular hand.
+        self.exp_val_denom = hold.exp_val_denom
+
+
+    @staticmethod
+    def _hold_ids(held_d, hand_str, hold_str, held_ids, disc_ids):
+        """Helper for __init__, held and discarded card ids from its inputs."""
+        if held_ids is not None:
+            disc_ids = [] if disc_ids is None else disc_ids
+        elif held_d is not None:
+            held_ids = [card_id(card) for card in held_d['h']]
+            disc_ids = [card_id(card) for card in held_d['d']]
         elif (hand_str is not None) and (hold_str is not None):
             ha_obj = HandAnalyzer(hand_str)
             hold_l = [hold_str[ind:ind+2].upper() != 'XX' for ind in range(0,10,2)]
-            self.held_d = ha_obj.hold(hold_l)
+            held_ids, disc_ids = ha_obj.hold_ids(hold_l)
         else:
             exp = 'If held_d is None, then specify hand_str AND hold_str. {} is None'
             kwzip = zip([hand_str, hold_str], ['hand_str', 'hold_str'])
             nones = ' '.join([kws if kw is None else '' for kw, kws in kwzip])
             raise Exception(exp.format(nones))
+        return held_ids, disc_ids
 
-        self.__specials = specials
-
-        self.held_r, self.held_s, self.disc_r, self.disc_s = self.pivot_held_d()
-        #NOTE to self: regex find: (held_r[^\w_])  , replace: self.$1
 
-        seen_ranks = Counter(list(self.held_r) + list(self.disc_r))
-        self.__draws = Counter(RANKS*4) - seen_ranks
-        self.held_r_cnts = Counter(self.held_r).most_common()
-        self.draw_cnt = len(self.disc_r)
-
-        self.nonheld_ranks = self.__draws.copy()
-        for r in self.held_r:
-            self.nonheld_ranks[r] = 0
-
-        # counter of number of ranks with 0-4 available cards. For example,
-        # discarding all 5 cards in a junk hand has:
-        # nonheld_rank_grps == Counter({4: 8, 3: 5})
-        # for 8 ranks have 4 cards each to draw, and 5 ranks have 3 cards to draw.
-        self.nonheld_rank_grps = Counter(self.nonheld_ranks.values())
-
-        # count of all possible draws, i.e. the denominator for calculating
-        # probability of drawing a particular hand.
-        self.exp_val_denom = comb(47, 5 - len(self.held_r))
+    @property
+    def held_d(self):
+        """Hold/Discard dict of card tuples, as output from HandAnalyzer.hold"""
+        return {'h': [ID_CARD_TUPLES[c] for c in self.held_ids],
+                'd': [ID_CARD_TUPLES[c] for c in self.disc_ids]}
 
 
     def draws(self):
         """Returns the count of each card rank available to be drawn."""
-        return self.__draws
+        return Counter({RANKS[r]: avail for r, avail in enumerate(self.__draws)
+                        if avail > 0})
 
 
     def pivot_held_d(self):
-        """Helper function to reorganize hold/discard info."""
-        ranks_suits = []
-        for key in ['h', 'd']:
-            if self.held_d[key] != []:
-                ranks_suits.extend(list(zip(*self.held_d[key])))
-            else:
-                ranks_suits.extend([(), ()])
-        return ranks_suits
+        """Helper function to reorganize hold/discard info as rank/suit chars."""
+        return [tuple([RANKS[r] for r in self.held_r]),
+                tuple([SUITS[s] for s in self.held_s]),
+                tuple([RANKS[r] for r in self.disc_r]),
+                tuple([SUITS[s] for s in self.disc_s])]
+
+
+    @staticmethod
+    def _rank_grps(avail_by_rank):
+        """Number of ranks with 0-4 available cards, indexed by availability."""
+        grps = [0]*(len(SUITS) + 1)
+        for avail in avail_by_rank:
+            grps[avail] += 1
+        return grps
 
     def count_wins(self, wins = None, specials = None):
         """
@@ -326,6 +888,8 @@ class DiscardValue(object):
         wins: (list of str) Each elem corresponds to a poker hand method, e.g.:
                 ['royal_flush', 'pair_jqka', 'four_kindA8']
                 If wins is None: include all Jack or Better hands
+                Any 'four_kind' + rank chars (e.g. 'four_kindK') counts fours
+                of a kind of those ranks only.
         specials: (list of str) any ranks chars that get a bonus on 4 of a kind.
             e.g. 'A', '8', '7' for Aces and Eights payout table. Remove these
             from the nominal four_kind count and call a method for each bonus.
@@ -353,59 +917,62 @@ class DiscardValue(object):
         wins_d = {}
         for win in wins:
             if (specials is not None) and (win == 'four_kind'):
-                wins_d[win] = win_counters[win](specials = specials)
+                count_func = lambda: self.four_kind(specials = specials)
+                cache_win = (win, ''.join(specials))
+            elif win == 'straight':
+                #the straight flushes to take out of the straight count need suits
+                wins_d[win] = (self._cached_count(win, self._straight_ranks) -
+                               self.royal_flush() - self.straight_flush())
+                continue
+            elif win in win_counters:
+                count_func = win_counters[win]
+                cache_win = win
+            elif win.startswith('four_kind') and set(win[len('four_kind'):]) <= set(RANKS):
+                #bonus four of a kind for any group of ranks, e.g. 'four_kindJQK'
+                count_func = lambda: self._four_kind_special(win[len('four_kind'):])
+                cache_win = win
+            else:
+                raise Exception('Unknown winning hand: {}'.format(win))
+
+            if win in SUITED_WINS:
+                wins_d[win] = count_func()
             else:
-                wins_d[win] = win_counters[win]()
+                wins_d[win] = self._cached_count(cache_win, count_func)
 
         return wins_d
 
 
-    def royal_flush(self):
-        holding_2to9 = set(self.held_r).intersection(set('23456789')) != set()
-        if holding_2to9 or (len(set(self.held_s)) > 1):
-            return 0
+    def _cached_count(self, win, count_func):
+        """Helper for count_wins, look up a suit independent count in rank_cache."""
+        if self.rank_cache is None:
+            return count_func()
+        if self.__rank_sig is None:
+            self.__rank_sig = (tuple(sorted(self.held_r)), tuple(sorted(self.disc_r)))
+        return self.rank_cache.get(self.__rank_sig, win, count_func)
 
-        discarded_royal_suits = set()
-        for card in self.held_d['d']:
-            if (card[0] in 'AKQJT'):
-                #check if held and discarded royal of same suit
-                #already checked for multiple held suits, hence self.held_s[0]
-                if (len(self.held_s) > 0) and (card[1] == self.held_s[0]):
-                    return 0
-                discarded_royal_suits.add(card[1])
 
-        if len(set(self.held_s)) == 1:
-            return 1
-        else:
-            return 4 - len(discarded_royal_suits)
+    def royal_flush(self):
+        #also taken out of flush and straight, count once
+        if self.__royal_cnt is None:
+            self.__royal_cnt = royal_flush_cnt(self.held_mask, self.disc_mask)
+        return self.__royal_cnt
 
     def straight_flush(self):
-        ways_cnt = 0
-
-        if len(set(self.held_s)) > 1:
-            return 0
+        if self.__strt_flush_cnt is None:
+            self.__strt_flush_cnt = straight_flush_cnt(self.held_mask, self.disc_mask)
+        return self.__strt_flush_cnt
 
-        #TODO: use defaultdict?, use global for ranks string
-        undrawable_suits = {r: set() for r in RANKS}
-        for hd in self.held_d:
-            for r, s in self.held_d[hd]:
-                if hd == 'd':
-                    undrawable_suits[r].add(s)
-                elif hd == 'h':
-                    # 3 of 4 suits become undrawable when 1 is held
-                    converse = {x for x in SUITS}.difference(s)
-                    undrawable_suits[r].update(converse)
-                else:
-                    raise Exception('held_d has unexpected key: {}'.format(hd))
-        po_strts, _ = self._potential_straights(include_royals = False)
-        for strt in po_strts:
-            if strt is not None:
-                strt_miss_suits = set()
-                for r in strt:
-                    strt_miss_suits.update(undrawable_suits[r])
-                ways_cnt += 4 - len(strt_miss_suits)
 
-        return ways_cnt
+    def _held_avail(self):
+        """
+        Helper, dict of held rank: count of cards of that rank left to draw.
+        Shared by two_pair and full_house, don't modify it.
+        """
+        if self.__held_r_avail is None:
+            self.__held_r_avail = {}
+            for r in self.held_r:
+                self.__held_r_avail[r] = self.__draws[r]
+        return self.__held_r_avail
 
 
     def flush(self):
@@ -417,16 +984,13 @@ class DiscardValue(object):
         ways_cnt -= self.royal_flush()
         ways_cnt -= self.straight_flush()
 
-        #use defaultdict
-        undrawable_suit_cnt = {s:0 for s in SUITS}
-        for suit in list(self.held_s) + list(self.disc_s):
-            undrawable_suit_cnt[suit] += 1
+        undrawable_suit_cnt = self.__undrawable_suit_cnt
 
         if num_suits == 1:
-            ways_cnt += comb(13 - undrawable_suit_cnt[self.held_s[0]], len(self.disc_r))
+            ways_cnt += comb(13 - undrawable_suit_cnt[self.held_s[0]], self.draw_cnt)
         else: #no saved cards
-            for suit, udc in undrawable_suit_cnt.items():
-                ways_cnt += comb(13 - udc, len(self.disc_r))
+            for udc in undrawable_suit_cnt:
+                ways_cnt += comb(13 - udc, self.draw_cnt)
 
         return ways_cnt
 
@@ -445,8 +1009,7 @@ class DiscardValue(object):
             return draws
         elif self.held_r_cnts[0][1] == 2:
             #check for holding low pair
-            lows = '23456789T'
-            low_pair_bool = self.held_r_cnts[0][0] in lows
+            low_pair_bool = self.held_r_cnts[0][0] not in HIGH_RANKS
             #check for holding two pair
             two_pair_bool = (len(self.held_r_cnts) > 1) and (self.held_r_cnts[1][1] == 2)
             if low_pair_bool or two_pair_bool:
@@ -459,11 +1022,8 @@ class DiscardValue(object):
 
 
     def two_pair(self):
-        held_r_avail = {}
-        for r in self.held_r:
-            held_r_avail[r] = self.__draws[r]
-
-        held_r_avail_grps = Counter(held_r_avail.values())
+        held_r_avail = self._held_avail()
+        held_r_avail_grps = self._rank_grps(held_r_avail.values())
 
         # nothing held
         if self.held_r_cnts == []:
@@ -477,9 +1037,12 @@ class DiscardValue(object):
                 #pair up held singleton, draw a pair
                 #TODO: possibly replace this block with a call to draw_for_ranks?
                 held_draws = list(held_r_avail.values())[0] # ok since only holding 1
-                for avail, rcnt in self.nonheld_rank_grps.items():
+                for avail in range(2, len(self.nonheld_rank_grps)):
+                    rcnt = self.nonheld_rank_grps[avail]
+                    if rcnt == 0:
+                        continue
                     rways = rcnt * comb(avail, 2)
-                    new_nhrg = self.nonheld_rank_grps.copy()
+                    new_nhrg = self.nonheld_rank_grps[:]
                     new_nhrg[avail] -= 1
                     kick_ways = self._count_ways2kick(nonheld_rank_grps = new_nhrg,
                                                      num_kickers = 1)
@@ -487,19 +1050,22 @@ class DiscardValue(object):
 
                 return ways_cnt
             elif self.draw_cnt == 3: # maybe change this block to draw_cnt in [3,2]
-
-                for havail, hrcnt in held_r_avail_grps.items():
-                    #pair up a held card
+                #draw a pair, or a match for both held singles
+                drawways = self._draw_for_ranks(gsize=2, draw_cnt=2,
+                                               draw_only=True,
+                                               second_pair=False)
+                kick_ways = self._count_ways2kick(num_kickers=1)
+                hrways2 = 1
+                for havail, hrcnt in enumerate(held_r_avail_grps):
+                    if hrcnt == 0:
+                        continue
+                    #pair up a held card, then draw a pair
                     hrways = comb(hrcnt, 1) * comb(havail, 1)
-                    #then draw a pair
-                    drawways = self._draw_for_ranks(gsize=2, draw_cnt=2,
-                                                   draw_only=True,
-                                                   second_pair=False)
                     ways_cnt += hrways * drawways
-                    #draw a match for both held singles
-                    hrways2 = comb(havail, 1) ** hrcnt
-                    kick_ways = self._count_ways2kick(num_kickers=1)
-                    ways_cnt += hrways2 * kick_ways
+                    #matches for both held singles (a product over the groups)
+                    hrways2 *= comb(havail, 1) ** hrcnt
+                #draw a match for both held singles
+                ways_cnt += hrways2 * kick_ways
                 return ways_cnt
             elif self.draw_cnt == 2:
                 #draw a match for 2 of the 3 held singles
@@ -542,14 +1108,15 @@ class DiscardValue(object):
             exp = 'Expecting to draw 2, 4, or 5 cards, draw_cnt = {}'
             raise Exception(exp.format(draw_cnt))
 
-        cwr = combinations_with_replacement(nonheld_rank_grps, 2)
+        avails = [avail for avail in range(choose_in_r, len(nonheld_rank_grps))
+                  if nonheld_rank_grps[avail] > 0]
         ways_cnt = 0
-        for avail1, avail2 in cwr:
+        for avail1, avail2 in combinations_with_replacement(avails, 2):
             if avail1 == avail2:
                 rways = comb(nonheld_rank_grps[avail1], 2)
                 rways *= comb(avail1, choose_in_r) ** 2
                 if draw_cnt == 5:
-                    new_nhrg = nonheld_rank_grps.copy()
+                    new_nhrg = nonheld_rank_grps[:]
                     new_nhrg[avail1] -= 2
                     kick_ways = self._count_ways2kick(nonheld_rank_grps = new_nhrg,
                                                      num_kickers = 1)
@@ -561,7 +1128,7 @@ class DiscardValue(object):
                 for av in (avail1, avail2):
                     mixpair *= nonheld_rank_grps[av] * comb(av, choose_in_r)
                 if draw_cnt == 5:
-                    new_nhrg = nonheld_rank_grps.copy()
+                    new_nhrg = nonheld_rank_grps[:]
                     new_nhrg[avail1] -= 1
                     new_nhrg[avail2] -= 1
                     kick_ways = self._count_ways2kick(nonheld_rank_grps = new_nhrg,
@@ -606,23 +1173,21 @@ class DiscardValue(object):
 
 
     def full_house(self):
-        held_r_avail = {}
-        for r in self.held_r:
-            held_r_avail[r] = self.__draws[r]
-
-        held_r_avail_grps = Counter(held_r_avail.values())
+        held_r_avail = self._held_avail()
 
         ways_cnt = 0
         # nothing held
         if self.held_r_cnts == []:
-            for avail, rcnt in self.nonheld_rank_grps.items():
-
+            for avail in range(3, len(self.nonheld_rank_grps)):
+                rcnt = self.nonheld_rank_grps[avail]
+                if rcnt == 0:
+                    continue
                 rtrips = rcnt * comb(avail, 3)
-                new_nhrg = self.nonheld_rank_grps.copy()
+                new_nhrg = self.nonheld_rank_grps[:]
                 new_nhrg[avail] -= 1
 
                 pair_ways = 0
-                for pavail, prcnt in new_nhrg.items():
+                for pavail, prcnt in enumerate(new_nhrg):
                     pair_ways += prcnt * comb(pavail, 2)
 
                 ways_cnt += rtrips * pair_ways
@@ -748,18 +1313,28 @@ class DiscardValue(object):
         """
         ways_cnt = 0
         for special_card in special_cards:
-            kickers = len(self.disc_r) - self.__draws[special_card]
-            if (kickers < 0) or (special_card in self.disc_r):
+            r = RANK_IDS[special_card]
+            kickers = self.draw_cnt - self.__draws[r]
+            if (kickers < 0) or (r in self.disc_r):
                 continue
             elif kickers == 0:
                 ways_cnt += 1
             else:
                 #47 draw cards to start, drawing 5 draw the 4 specials and 1 kicker
-                ways_cnt += 47 - self.__draws[special_card]
+                ways_cnt += 47 - self.__draws[r]
         return ways_cnt
 
 
     def straight(self):
+        #subtract royal and straight flush from the count
+        return self._straight_ranks() - self.royal_flush() - self.straight_flush()
+
+
+    def _straight_ranks(self):
+        """
+        Helper for straight, count straights of any suits, including straight
+        and royal flushes. Depends only on the ranks held and discarded.
+        """
 
         def prod_list(lst):
             accum = 1
@@ -768,11 +1343,8 @@ class DiscardValue(object):
             return accum
 
         ways_cnt = 0
-        #subtract royal and straight flush from the count
-        ways_cnt -= self.royal_flush()
-        ways_cnt -= self.straight_flush()
         if self.held_r_cnts == []:
-            for s in STRAIGHTS:
+            for s in STRAIGHT_RANKS:
                 ways_cnt += prod_list([self.__draws[r] for r in s])
             return ways_cnt
         elif self.held_r_cnts[0][1] != 1:
@@ -790,19 +1362,18 @@ class DiscardValue(object):
     def _potential_straights(self, include_royals = True):
         """
         Helper func for hands with straights.
-        Switches the strings in list of strings representing straights
-        e.g. 'A2345', '789TJ' to None if holding a card that is not in
-        the given straight. Also sets the draws for that rank to 1.
+        Switches the tuples of rank ids in the list of straights
+        (STRAIGHT_RANKS, e.g. A2345, 789TJ) to None if holding a card that is
+        not in the given straight. Also sets the draws for that rank to 1.
         Returns these.
         """
         if include_royals:
-            strts_cop = STRAIGHTS[:]
-            enum_strts = list(enumerate(STRAIGHTS))
+            strts_cop = STRAIGHT_RANKS[:]
         else:
-            strts_cop = STRAIGHTS[:-1]
-            enum_strts = list(enumerate(STRAIGHTS[:-1]))
+            strts_cop = STRAIGHT_RANKS[:-1]
+        enum_strts = list(enumerate(strts_cop))
 
-        draws_cop = self.__draws.copy()
+        draws_cop = self.__draws[:]
         for r in self.held_r:
             draws_cop[r] = 1
             for ind, strt in enum_strts:
@@ -838,50 +1409,42 @@ class DiscardValue(object):
         #override the original draw count if necessary
         draw_cnt = self.draw_cnt if draw_cnt is None else draw_cnt
 
-        #dealing with two_pair stuff
-        if second_pair:
-            rmv_held_pair = Counter({Counter(self.held_r).most_common(1)[0]: 2})
-            nonheld_ranks_mod = self.__draws - rmv_held_pair
-            for r in self.held_r:
-                nonheld_ranks_mod[r] = 0
-            nonheld_rank_grps_mod = Counter(nonheld_ranks_mod.values())
-        else:
-            nonheld_ranks_mod = self.nonheld_ranks
-            nonheld_rank_grps_mod = self.nonheld_rank_grps
+        #held ranks (including a held pair when counting a second_pair) are
+        #already zeroed in nonheld_ranks, so the rank groups need no changes
+        nonheld_rank_grps = self.nonheld_rank_grps
         #remove everything but JQKA if only considering those pairs
         if pairing_jqka:
-            nonheld_jqka = self.nonheld_ranks - Counter('23456789T'*4)
-            nonheld_jqka_grps = Counter(nonheld_jqka.values())
-            draw_grp_iter = nonheld_jqka_grps.items()
+            if self.__jqka_grps is None:
+                self.__jqka_grps = self._rank_grps([self.nonheld_ranks[r] for r in HIGH_RANKS])
+            draw_grps = self.__jqka_grps
         else:
-            draw_grp_iter = nonheld_rank_grps_mod.items()
+            draw_grps = nonheld_rank_grps
 
         ways_cnt = 0
 
         #add up ways of making group with all draw cards
-        if not cnt_held_only:
-            for avail, rcnt in draw_grp_iter:
-                # count ranks that we can select 3 cards from.
-                if gsize <= draw_cnt:
-                    rways = rcnt * comb(avail, gsize)
-                    kickers = draw_cnt - gsize
-                    if kickers > 0:
-                        new_nhrg = nonheld_rank_grps_mod.copy()
-                        new_nhrg[avail] -= 1
-                        kick_ways = self._count_ways2kick(nonheld_rank_grps = new_nhrg,
-                                                         num_kickers = kickers)
-                    else:
-                        kick_ways = 1
-                    #print(rcnt, avail, kick_ways, rways)
-                    ways_cnt += rways * kick_ways
-                else:
+        if (not cnt_held_only) and (gsize <= draw_cnt):
+            kickers = draw_cnt - gsize
+            for avail in range(gsize, len(draw_grps)):
+                # count ranks that we can select gsize cards from.
+                rcnt = draw_grps[avail]
+                if rcnt == 0:
                     continue
+                rways = rcnt * comb(avail, gsize)
+                if kickers > 0:
+                    new_nhrg = nonheld_rank_grps[:]
+                    new_nhrg[avail] -= 1
+                    kick_ways = self._count_ways2kick(nonheld_rank_grps = new_nhrg,
+                                                     num_kickers = kickers)
+                else:
+                    kick_ways = 1
+                ways_cnt += rways * kick_ways
 
         #add up ways of adding to the held cards
         if not draw_only:
-            for r, hcnt in Counter(self.held_r).items():
+            for r, hcnt in self.held_r_cnts:
                 #skip if only pairing up JQKA
-                pair_jqka_cond = pairing_jqka and (r not in 'JQKA')
+                pair_jqka_cond = pairing_jqka and (r not in HIGH_RANKS)
                 second_pair_cond = second_pair and (hcnt == 2)
                 if pair_jqka_cond or second_pair_cond:
                     continue
@@ -891,16 +1454,10 @@ class DiscardValue(object):
                     hways = comb(self.__draws[r], needed)
                     kickers = draw_cnt - needed
                     if kickers > 0:
-                        if not second_pair:
-                            kick_ways = self._count_ways2kick(num_kickers = kickers,
-                                        nonheld_rank_grps = nonheld_rank_grps_mod)
-                        else:
-                            sp_nhrg = nonheld_rank_grps_mod - Counter({nonheld_ranks_mod[r]:1})
-                            kick_ways = self._count_ways2kick(nonheld_rank_grps = sp_nhrg,
-                                                             num_kickers = kickers)
+                        kick_ways = self._count_ways2kick(num_kickers = kickers,
+                                    nonheld_rank_grps = nonheld_rank_grps)
                     else:
                         kick_ways = 1
-                    #print(hcnt, kickers, kick_ways, hways)
 
                     ways_cnt += hways * kick_ways
                 else:
@@ -916,8 +1473,8 @@ class DiscardValue(object):
         completed it.
         """
         # possible combinations, if num_kickers = 2 and there are 8 ranks with 4
-        # cards to draw one elem will be (4, 4), so run counter on this to get things
-        # to work properly. then comb(8, 2)*comb(4, 1)**2
+        # cards to draw one elem will be (4, 4), so count the repeats in this to
+        # get things to work properly. then comb(8, 2)*comb(4, 1)**2
 
         # some methods like full_house, two_pair need to use a modified version
         # of nonheld_rank_grps, so even though it is an instance attribute,
@@ -925,14 +1482,427 @@ class DiscardValue(object):
         if nonheld_rank_grps is None:
             nonheld_rank_grps = self.nonheld_rank_grps
 
+        # the count only depends on the number of ranks with 1-4 cards left and
+        # num_kickers, a small space shared by all hands, so memoize it
+        key = (tuple(nonheld_rank_grps[1:]), num_kickers)
+        kick_cnt = KICKER_WAYS.get(key)
+        if kick_cnt is not None:
+            return kick_cnt
+
+        avails = [avail for avail in range(1, len(nonheld_rank_grps))
+                  if nonheld_rank_grps[avail] > 0]
         kick_cnt = 0
-        for suit_cnt_tup in combinations_with_replacement(nonheld_rank_grps, num_kickers):
+        for suit_cnt_tup in combinations_with_replacement(avails, num_kickers):
             multiplier = 1
-            for suit_cnt_key, cnt in Counter(suit_cnt_tup).items():
+            for suit_cnt_key in set(suit_cnt_tup):
+                cnt = suit_cnt_tup.count(suit_cnt_key)
                 num_ranks = nonheld_rank_grps[suit_cnt_key]
                 multiplier *= comb(num_ranks, cnt) * suit_cnt_key ** cnt
             kick_cnt += multiplier
+        KICKER_WAYS[key] = kick_cnt
         return kick_cnt
 
+
+class WildCardValue(object):
+    """
+    Wild card counterpart of DiscardValue: given the held and discarded cards,
+    count the ways of drawing each winning hand of a wild card game. The wild
+    cards count as any card, the other (natural) cards count as usual. A final
+    hand is paid as its highest category (see CATEGORIES), so e.g. three wilds
+    and two suited cards that fit in a straight are a straight_flush, not a
+    four_kind. Subclasses set the game, see DeucesWildValue and JokerPokerValue.
+
+    Counts are closed form sums over the number of wilds drawn. The naturals of
+    the final hands are grouped by their pattern of rank counts (e.g. (2, 1)
+    for a pair and a single), which only depends on the ranks held and
+    discarded, so the suit independent parts of the counts are cached by rank
+    signature in rank_cache, as in DiscardValue. Flushes and straight flushes
+    are counted from the natural cards left to draw in each suit, and taken
+    out of the lower categories they would otherwise be counted in.
+
+    INPUT:
+    held_ids, disc_ids: (lists of int) held and discarded card ids, of the form
+              output from HandAnalyzer.hold_ids
+
+    OUTPUT: None
+    """
+    rank_cache = None
+    #final hand categories, lowest first, and those counted by rank alone
+    CATEGORIES = []
+    RANK_WINS = []
+    #rank (see CARD_RANKS) of the wild cards, the natural ranks, and the cards
+    #in the deck
+    WILD_RANK = None
+    NATURAL_RANKS = []
+    DECK_SIZE = 52
+    #see WILD_STRAIGHT_SETS
+    STRAIGHT_SETS = []
+    #category name of a royal flush with wilds
+    WILD_ROYAL = 'wild_royal'
+    #rank mask of the pairs paid by a pair_ka (a pair of these ranks)
+    PAIR_RANK_MASK = 0
+
+    def __init__(self, held_ids, disc_ids):
+        self.__rank_sig = None #see _cached_count
+        self.__patterns = None #see _natural_patterns
+        self.__suited = None #see _suited_counts
+
+        self.held_ids = tuple(held_ids)
+        self.disc_ids = tuple(disc_ids)
+        self.held_mask = cards_mask(self.held_ids)
+        self.disc_mask = cards_mask(self.disc_ids)
+        self.held_r = tuple([CARD_RANKS[c] for c in self.held_ids])
+        self.disc_r = tuple([CARD_RANKS[c] for c in self.disc_ids])
+        self.draw_cnt = len(self.disc_ids)
+
+        #count of cards available to draw, indexed by rank (the joker's last)
+        self.__draws = [len(SUITS)]*len(RANKS) + [1]
+        for r in self.held_r + self.disc_r:
+            self.__draws[r] -= 1
+
+        #held naturals: count by rank, rank mask
+        self.held_nat_cnts = [0]*(len(RANKS) + 1)
+        for r in self.held_r:
+            if r != self.WILD_RANK:
+                self.held_nat_cnts[r] += 1
+        self.held_nat_mask = sum([1 << r for r in self.NATURAL_RANKS if self.held_nat_cnts[r]])
+        held_wilds = self.held_r.count(self.WILD_RANK)
+
+        #(wilds in the final hand, naturals drawn, ways to draw the wilds) for
+        #each number of wilds drawn
+        wild_draws = self.__draws[self.WILD_RANK]
+        self.wild_splits = [(held_wilds + drawn, self.draw_cnt - drawn, wild_ways)
+                            for drawn, wild_ways in
+                            enumerate(RANK_CHOOSE[wild_draws][:self.draw_cnt + 1])]
+
+        # count of all possible draws, i.e. the denominator for calculating
+        # probability of drawing a particular hand.
+        self.exp_val_denom = comb(self.DECK_SIZE - 5, self.draw_cnt)
+
+
+    @classmethod
+    def eval_final(cls, ids):
+        """
+        Category of a final hand of 5 card ids, as an index into CATEGORIES.
+        """
+        wilds = len([c for c in ids if CARD_RANKS[c] == cls.WILD_RANK])
+        naturals = [c for c in ids if CARD_RANKS[c] != cls.WILD_RANK]
+        rank_cnts = Counter([CARD_RANKS[c] for c in naturals])
+        cnts = sorted(rank_cnts.values(), reverse = True) or [0]
+        rank_mask = sum([1 << r for r in rank_cnts])
+        #ranks that make a pair, with a wild if there is one
+        pair_mask = sum([1 << r for r, cnt in rank_cnts.items() if cnt + wilds >= 2])
+        suited = len(set([CARD_SUITS[c] for c in naturals])) <= 1
+        distinct = len(rank_cnts) == len(naturals)
+        fits = distinct and any([not rank_mask & ~strt for strt in STRAIGHT_RANK_MASKS])
+        royal = distinct and not rank_mask & ~ROYAL_RANK_MASK
+
+        if wilds == 0 and suited and royal:
+            cat = 'natural_royal'
+        elif wilds == 4:
+            cat = 'four_deuces'
+        elif suited and royal:
+            cat = cls.WILD_ROYAL
+        elif cnts[0] + wilds == 5:
+            cat = 'five_kind'
+        elif suited and fits:
+            cat = 'straight_flush'
+        elif cnts[0] + wilds == 4:
+            cat = 'four_kind'
+        elif cnts in ([3, 2], [2, 2]):
+            cat = 'full_house'
+        elif suited:
+            cat = 'flush'
+        elif fits:
+            cat = 'straight'
+        elif cnts[0] + wilds == 3:
+            cat = 'three_kind'
+        elif cnts == [2, 2, 1]:
+            cat = 'two_pair'
+        elif cnts[0] + wilds == 2 and pair_mask & cls.PAIR_RANK_MASK:
+            cat = 'pair_ka'
+        else:
+            cat = 'nothing'
+        return cls.CATEGORIES.index(cat) if cat in cls.CATEGORIES else 0
+
+
+    def count_wins(self, wins = None):
+        """
+        Call each poker hand method specified as a string in wins and return
+        the output from these in a dict, see DiscardValue.count_wins.
+
+        INPUT:
+        wins: (list of str) winning hands of the game (see CATEGORIES).
+                If wins is None: include all winning hands
+
+        OUTPUT: (dict) e.g.: {'four_deuces': 1, 'five_kind': 68}
+        """
+        if wins is None:
+            wins = self.CATEGORIES[:0:-1]
+        wins_d = {}
+        for win in wins:
+            if win not in self.CATEGORIES[1:]:
+                raise Exception('Unknown winning hand: {}'.format(win))
+            wins_d[win] = getattr(self, win)()
+
+        return wins_d
+
+
+    def _cached_count(self, win, count_func):
+        """Helper, look up a suit independent count in rank_cache."""
+        if self.rank_cache is None:
+            return count_func()
+        if self.__rank_sig is None:
+            self.__rank_sig = (tuple(sorted(self.held_r)), tuple(sorted(self.disc_r)))
+        return self.rank_cache.get(self.__rank_sig, win, count_func)
+
+
+    def _natural_patterns(self):
+        """
+        Helper, ways to draw the naturals of the final hands, by number of
+        naturals in the final hand: list of dicts of (rank count pattern, high)
+        to ways to draw it, where the pattern is the counts of the ranks
+        present, most first, and high the most cards of any rank in
+        PAIR_RANK_MASK. Built up one rank at a time.
+        """
+        if self.__patterns is None:
+            patterns = {((), 0): 1}
+            for r in self.NATURAL_RANKS:
+                held, avail = self.held_nat_cnts[r], self.__draws[r]
+                if held == avail == 0:
+                    continue
+                pair_rank = self.PAIR_RANK_MASK >> r & 1
+                next_patterns = {}
+                for (pattern, high), ways in patterns.items():
+                    room = 5 - sum(pattern) - held
+                    if room < 0:
+                        continue
+                    for drawn, drawn_ways in enumerate(RANK_CHOOSE[avail][:room + 1]):
+                        cnt = held + drawn
+                        if cnt:
+                            key = (tuple(sorted(pattern + (cnt,), reverse = True)),
+                                   max(high, cnt) if pair_rank else high)
+                        else:
+                            key = (pattern, high)
+                        next_patterns[key] = next_patterns.get(key, 0) + ways * drawn_ways
+                patterns = next_patterns
+
+            self.__patterns = [{} for _ in range(6)]
+            for key, ways in patterns.items():
+                self.__patterns[sum(key[0])][key] = ways
+        return self.__patterns
+
+
+    def _pattern_count(self, is_win):
+        """
+        Helper, ways to draw a final hand whose naturals' rank count pattern,
+        number of wilds and high count (see _natural_patterns) pass
+        is_win(pattern, wilds, high).
+        """
+        patterns = self._natural_patterns()
+        ways_cnt = 0
+        for wilds, _, wild_ways in self.wild_splits:
+            for (pattern, high), ways in patterns[5 - wilds].items():
+                if is_win(pattern, wilds, high):
+                    ways_cnt += wild_ways * ways
+        return ways_cnt
+
+
+    def _wild_straights(self, wilds_range, pair_ranks = False):
+        """
+        Helper, ways to draw a final hand with a number of wilds in wilds_range
+        whose naturals are distinct ranks that fit in a straight, of any suits.
+        With pair_ranks, only those with a rank in PAIR_RANK_MASK.
+        """
+        if max(self.held_nat_cnts) > 1:
+            return 0
+        ways_cnt = 0
+        for wilds, _, wild_ways in self.wild_splits:
+            if wilds not in wilds_range:
+                continue
+            for ranks_mask, ranks in self.STRAIGHT_SETS[5 - wilds]:
+                if self.held_nat_mask & ~ranks_mask:
+                    continue
+                if pair_ranks and not ranks_mask & self.PAIR_RANK_MASK:
+                    continue
+                ways = wild_ways
+                for r in ranks:
+                    if self.held_nat_cnts[r] == 0:
+                        ways *= self.__draws[r]
+                ways_cnt += ways
+        return ways_cnt
+
+
+    def _suited_counts(self):
+        """
+        Helper, list indexed by the number of wilds in the final hand of lists
+        of the ways to draw a final hand whose naturals are all of one suit:
+        [any ranks, ranks that fit in a straight, ranks that fit in the royal
+        straight, any ranks with one in PAIR_RANK_MASK, ranks that fit in a
+        straight with one in PAIR_RANK_MASK].
+        """
+        if self.__suited is None:
+            self.__suited = [[0, 0, 0, 0, 0] for _ in range(len(SUITS) + 1)]
+            held_suits = set([CARD_SUITS[c] for c in self.held_ids
+                              if CARD_RANKS[c] != self.WILD_RANK])
+            if len(held_suits) > 1:
+                return self.__suited
+
+            dealt = self.held_mask | self.disc_mask
+            royal_held = not self.held_nat_mask & ~ROYAL_RANK_MASK
+            pair_held = self.held_nat_mask & self.PAIR_RANK_MASK
+            for suit in (held_suits or range(len(SUITS))):
+                #natural ranks left to draw in the suit
+                avail = sum([1 << r for r in self.NATURAL_RANKS
+                             if not dealt >> (r*len(SUITS) + suit) & 1])
+                held_avail = self.held_nat_mask | avail
+                for wilds, nat_draws, wild_ways in self.wild_splits:
+                    cnts = self.__suited[wilds]
+                    cnts[0] += wild_ways * SUIT_CHOOSE[bin(avail).count('1')][nat_draws]
+                    for ranks_mask, _ in self.STRAIGHT_SETS[5 - wilds]:
+                        if not (self.held_nat_mask & ~ranks_mask or ranks_mask & ~held_avail):
+                            cnts[1] += wild_ways
+                            if pair_held or ranks_mask & self.PAIR_RANK_MASK:
+                                cnts[4] += wild_ways
+                    if royal_held:
+                        royal_avail = bin(avail & ROYAL_RANK_MASK).count('1')
+                        cnts[2] += wild_ways * SUIT_CHOOSE[royal_avail][nat_draws]
+                    if self.PAIR_RANK_MASK:
+                        #less those without any of the pair ranks
+                        cnts[3] += wild_ways * SUIT_CHOOSE[bin(avail).count('1')][nat_draws]
+                        if not pair_held:
+                            low_avail = bin(avail & ~self.PAIR_RANK_MASK).count('1')
+                            cnts[3] -= wild_ways * SUIT_CHOOSE[low_avail][nat_draws]
+        return self.__suited
+
+
+    def _suited_sum(self, ind, wilds_range):
+        """Helper, sum of _suited_counts()[wilds][ind] over wilds in wilds_range."""
+        suited = self._suited_counts()
+        return sum([suited[wilds][ind] for wilds in wilds_range])
+
+
+    def natural_royal(self):
+        return self._suited_sum(2, [0])
+
+    def wild_royal(self):
+        return self._suited_sum(2, [1, 2, 3])
+
+    def five_kind(self):
+        return self.rank_count('five_kind')
+
+    def straight_flush(self):
+        return self._suited_sum(1, range(4)) - self._suited_sum(2, range(4))
+
+    def four_kind(self):
+        #less three wilds and two cards of a straight flush or wild royal
+        return self.rank_count('four_kind') - self._suited_sum(1, [3])
+
+    def full_house(self):
+        return self.rank_count('full_house')
+
+    def flush(self):
+        return self._suited_sum(0, range(3)) - self._suited_sum(1, range(3))
+
+    def straight(self):
+        return self.rank_count('straight') - self._suited_sum(1, range(3))
+
+    def three_kind(self):
+        #less two wilds and three cards of a flush (straights are taken out
+        #in _three_kind_ranks)
+        return (self.rank_count('three_kind') -
+                self._suited_sum(0, [2]) + self._suited_sum(1, [2]))
+
+
+    def rank_count(self, win):
+        """
+        Suit independent part of the count of win (one of RANK_WINS), before
+        the flushes and straight flushes are taken out of it. Cached by rank
+        signature in rank_cache.
+        """
+        return self._cached_count(win, getattr(self, '_{}_ranks'.format(win)))
+
+    def _five_kind_ranks(self):
+        return self._pattern_count(lambda pattern, wilds, high: wilds < 4 and
+                                   pattern[0] + wilds == 5)
+
+    def _four_kind_ranks(self):
+        return self._pattern_count(lambda pattern, wilds, high: wilds < 4 and
+                                   pattern[0] + wilds == 4)
+
+    def _full_house_ranks(self):
+        #a natural full house, or two pair and a wild
+        return self._pattern_count(lambda pattern, wilds, high:
+                                   pattern in [(3, 2), (2, 2)])
+
+    def _straight_ranks(self):
+        return self._wild_straights(range(3))
+
+    def _three_kind_ranks(self):
+        #less two wilds and three cards of a straight of any suits
+        return (self._pattern_count(lambda pattern, wilds, high: wilds < 3 and
+                                    pattern[0] + wilds == 3 and
+                                    pattern not in [(3, 2), (2, 2)]) -
+                self._wild_straights([2]))
+
+
+class DeucesWildValue(WildCardValue):
+    """
+    Deuces Wild counts, see WildCardValue: the four deuces are wild, in a 52
+    card deck. Categories are DEUCES_WILD_CATEGORIES.
+    """
+    rank_cache = RankCache()
+    CATEGORIES = DEUCES_WILD_CATEGORIES
+    RANK_WINS = DEUCES_WILD_RANK_WINS
+    WILD_RANK = DEUCE
+    NATURAL_RANKS = NATURAL_RANKS
+    STRAIGHT_SETS = WILD_STRAIGHT_SETS
+
+    def four_deuces(self):
+        return self.rank_count('four_deuces')
+
+    def _four_deuces_ranks(self):
+        return self._pattern_count(lambda pattern, wilds, high: wilds == 4)
+
+
+class JokerPokerValue(WildCardValue):
+    """
+    Kings or Better Joker Poker counts, see WildCardValue: a joker (JOKER_ID)
+    is added to the 52 card deck and is wild, so there are 48 cards left to
+    draw from. Categories are JOKER_POKER_CATEGORIES, the lowest paid hand is a
+    pair of kings or aces (pair_ka).
+    """
+    rank_cache = RankCache()
+    CATEGORIES = JOKER_POKER_CATEGORIES
+    RANK_WINS = JOKER_POKER_RANK_WINS
+    WILD_RANK = JOKER_RANK
+    NATURAL_RANKS = list(range(len(RANKS)))
+    DECK_SIZE = 53
+    STRAIGHT_SETS = JOKER_STRAIGHT_SETS
+    WILD_ROYAL = 'joker_royal'
+    PAIR_RANK_MASK = KING_ACE_RANK_MASK
+
+    def joker_royal(self):
+        return self.wild_royal()
+
+    def two_pair(self):
+        return self.rank_count('two_pair')
+
+    def pair_ka(self):
+        #less the joker and four cards of a flush with a king or ace
+        return (self.rank_count('pair_ka') -
+                self._suited_sum(3, [1]) + self._suited_sum(4, [1]))
+
+    def _two_pair_ranks(self):
+        return self._pattern_count(lambda pattern, wilds, high: pattern == (2, 2, 1))
+
+    def _pair_ka_ranks(self):
+        #a pair of kings or aces, or the joker and a king or ace, less the
+        #joker and four cards of a straight with a king or ace
+        return (self._pattern_count(lambda pattern, wilds, high:
+                                    (pattern == (2, 1, 1, 1) and high == 2) or
+                                    (pattern == (1, 1, 1, 1) and wilds == 1 and high)) -
+                self._wild_straights([1], pair_ranks = True))
+
 if __name__ == '__main__':
     print(HandAnalyzer('qd9c8d5c2c').analyze(return_full_analysis=False, return_bestdisc_cnts = True))